@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter, SimpleRouter
 
 from ecommerce.products.api.views import (
     AttributeViewSet,
+    AutocompleteViewSet,
     BrandViewSet,
     CategoryViewSet,
     ProductImageViewSet,
@@ -23,6 +24,7 @@ router.register("products", ProductViewSet)
 router.register("product_lines", ProductLineViewSet)
 router.register("product_image", ProductImageViewSet)
 router.register("attributes", AttributeViewSet)
+router.register("autocomplete", AutocompleteViewSet, basename="autocomplete")
 
 app_name = "api"
 urlpatterns = router.urls
@@ -60,6 +60,17 @@ DATABASES = {
     ),
 }
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Read replicas of the default database, e.g. postgres://replica/ecommerce. The
+# reads of the safe requests are sent to them.
+REPLICA_DATABASES = []
+for index, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), 1):
+    REPLICA_DATABASES.append(f"replica{index}")
+    DATABASES[f"replica{index}"] = {
+        **env.db_url_config(url),
+        "TEST": {"MIRROR": "default"},
+    }
+# https://docs.djangoproject.com/en/dev/ref/settings/#database-routers
+DATABASE_ROUTERS = ["ecommerce.utils.routers.ReplicaRouter"]
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -84,6 +95,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     "django.contrib.humanize",
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -151,6 +163,9 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "ecommerce.utils.middleware.MetricsMiddleware",
+    "ecommerce.utils.middleware.QueryInspectionMiddleware",
+    "ecommerce.utils.middleware.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -160,6 +175,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "ecommerce.utils.middleware.ProfilingMiddleware",
 ]
 
 # STATIC
@@ -297,7 +313,16 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_RENDERER_CLASSES": (
+        "ecommerce.utils.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "ecommerce.utils.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    "DEFAULT_PAGINATION_CLASS": "ecommerce.utils.pagination.KeysetCursorPagination",
     "PAGE_SIZE": 25,
 }
 # dj-rest-auth - https://dj-rest-auth.readthedocs.io/en/latest/configuration.html
@@ -336,3 +361,41 @@ GRAPPELLI_ADMIN_TITLE = "E-Commerce Admin"
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Seconds a cached catalog payload is kept. Entries are invalidated on every write
+# through a per-model version key, so this only bounds the memory they take.
+CATALOG_CACHE_TIMEOUT = env.int("DJANGO_CATALOG_CACHE_TIMEOUT", default=60 * 15)
+# Backend the surrogate keys of the catalog responses are purged from the CDN
+# with, when the rows they render change.
+CDN_PURGER = {
+    "BACKEND": env("DJANGO_CDN_PURGER", default="ecommerce.utils.cdn.NullPurger"),
+    "OPTIONS": {},
+}
+# Seconds the CDN keeps a catalog response, unless its surrogate keys are purged.
+CDN_MAX_AGE = env.int("DJANGO_CDN_MAX_AGE", default=60 * 60 * 24)
+# Requests running more database queries than this have their SQL logged.
+METRICS_QUERY_THRESHOLD = env.int("DJANGO_METRICS_QUERY_THRESHOLD", default=None)
+# Bearer token the scraper of /metrics must send, the endpoint is open without it.
+METRICS_TOKEN = env("DJANGO_METRICS_TOKEN", default=None)
+# Requests running a statement more than this many times, e.g. by an N+1 lookup,
+# and the statements slower than this many milliseconds, are logged.
+REPEATED_QUERY_THRESHOLD = env.int("DJANGO_REPEATED_QUERY_THRESHOLD", default=None)
+SLOW_QUERY_THRESHOLD = env.int("DJANGO_SLOW_QUERY_THRESHOLD", default=None)
+# Raise the repeated statements of a request instead of logging them.
+QUERY_INSPECTION_RAISE = env.bool("DJANGO_QUERY_INSPECTION_RAISE", default=False)
+# Let staff users profile their requests with the profile query parameter or the
+# X-Profile header. The profiles are written to the directory, when set, instead
+# of being returned.
+PROFILING_ENABLED = env.bool("DJANGO_PROFILING_ENABLED", default=False)
+PROFILING_DIR = env("DJANGO_PROFILING_DIR", default=None)
+# Seconds the clients read from the primary database after a write, rather than
+# from a replica, longer than the replication lag.
+PRIMARY_PIN_TIMEOUT = env.int("DJANGO_PRIMARY_PIN_TIMEOUT", default=10)
+# Seconds the autocomplete index waits, after a catalog change, before it is
+# rebuilt in the background, so a burst of writes rebuilds it once. Unset, it is
+# rebuilt by the request seeing the change.
+AUTOCOMPLETE_REBUILD_DELAY = env.float("DJANGO_AUTOCOMPLETE_REBUILD_DELAY", default=1.0)
+# Products with the most stock kept in the autocomplete index of each process, the
+# others are searched in the database.
+AUTOCOMPLETE_INDEXED_PRODUCTS = env.int(
+    "DJANGO_AUTOCOMPLETE_INDEXED_PRODUCTS", default=5000
+)
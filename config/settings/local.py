@@ -52,3 +52,6 @@ INSTALLED_APPS += ["django_extensions"]  # noqa F405
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+REPEATED_QUERY_THRESHOLD = env.int("DJANGO_REPEATED_QUERY_THRESHOLD", default=5)
+SLOW_QUERY_THRESHOLD = env.int("DJANGO_SLOW_QUERY_THRESHOLD", default=100)
+PROFILING_ENABLED = env.bool("DJANGO_PROFILING_ENABLED", default=True)
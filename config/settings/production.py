@@ -10,7 +10,8 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["example.com"])
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)  # noqa F405
+for database in DATABASES.values():  # noqa F405
+    database["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -182,3 +183,23 @@ SPECTACULAR_SETTINGS["SERVERS"] = [  # noqa F405
 ]
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Purge the catalog responses from the Fastly service in front of the API, when
+# one is configured.
+FASTLY_SERVICE_ID = env("FASTLY_SERVICE_ID", default=None)
+CDN_PURGER = {
+    "BACKEND": env(
+        "DJANGO_CDN_PURGER",
+        default="ecommerce.utils.cdn.FastlyPurger"
+        if FASTLY_SERVICE_ID
+        else "ecommerce.utils.cdn.NullPurger",
+    ),
+    "OPTIONS": {},
+}
+if CDN_PURGER["BACKEND"] == "ecommerce.utils.cdn.FastlyPurger":
+    CDN_PURGER["OPTIONS"] = {
+        "service_id": FASTLY_SERVICE_ID,
+        "token": env("FASTLY_API_TOKEN", default=""),
+    }
+# The /metrics endpoint is reachable from the internet, set a token so that only
+# the scraper reads it.
+METRICS_TOKEN = env("DJANGO_METRICS_TOKEN", default=None)
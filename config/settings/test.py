@@ -15,6 +15,26 @@ SECRET_KEY = env(
 # https://docs.djangoproject.com/en/dev/ref/settings/#test-runner
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
+# DATABASES
+# ------------------------------------------------------------------------------
+# A replica reading the test database, for the tests of the replica routing, which
+# add it to the REPLICA_DATABASES.
+DATABASES["replica"] = {  # noqa F405
+    **DATABASES["default"],  # noqa F405
+    "ATOMIC_REQUESTS": False,
+    "TEST": {"MIRROR": "default"},
+}
+
+# CACHES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#caches
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "",
+    }
+}
+
 # PASSWORDS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
@@ -25,6 +45,21 @@ PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-backend
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 
+# CDN
+# ------------------------------------------------------------------------------
+CDN_PURGER = {"BACKEND": "ecommerce.utils.cdn.LocalPurger"}
+
+# AUTOCOMPLETE
+# ------------------------------------------------------------------------------
+# Rebuild the index in the request, the rows of a test are not seen by a thread.
+AUTOCOMPLETE_REBUILD_DELAY = None
+
+# QUERY INSPECTION
+# ------------------------------------------------------------------------------
+# Fail the requests of the tests repeating a statement, as N+1 lookups do.
+REPEATED_QUERY_THRESHOLD = 3
+QUERY_INSPECTION_RAISE = True
+
 # DEBUGGING FOR TEMPLATES
 # ------------------------------------------------------------------------------
 TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore # noqa F405
@@ -8,6 +8,7 @@ from django.views import defaults as default_views
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 from ecommerce.users.api.views import GoogleLogin
+from ecommerce.utils.metrics import metrics_view
 
 urlpatterns = [path("grappelli/", include("grappelli.urls"))]
 urlpatterns += i18n_patterns(path(settings.ADMIN_URL, admin.site.urls))
@@ -30,6 +31,8 @@ urlpatterns += [
         SpectacularSwaggerView.as_view(url_name="api-schema"),
         name="api-docs",
     ),
+    # Prometheus metrics of the process
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 if settings.ACCOUNT_ALLOW_REGISTRATION:
@@ -1,7 +1,9 @@
 import pytest
+from django.core.cache import cache
 from pytest_factoryboy import register
 from rest_framework.test import APIClient, APIRequestFactory
 
+from ecommerce.products.models import Category
 from ecommerce.products.tests.factories import (
     AttributeFactory,
     BrandFactory,
@@ -13,6 +15,7 @@ from ecommerce.products.tests.factories import (
 )
 from ecommerce.users.models import User
 from ecommerce.users.tests.factories import UserFactory
+from ecommerce.utils.cdn import LocalPurger, get_purger
 
 register(BrandFactory)
 register(CategoryFactory)
@@ -32,6 +35,24 @@ def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Start every test with an empty cache.
+    """
+    cache.clear()
+
+
+@pytest.fixture
+def purger() -> LocalPurger:
+    """
+    The local CDN purger, without the keys purged by the previous tests.
+    """
+    purger = get_purger()
+    purger.batches.clear()
+    return purger
+
+
 @pytest.fixture
 @pytest.mark.django_db
 def user(user_factory) -> User:
@@ -50,6 +71,30 @@ def admin_user(user_factory) -> User:
     return user_factory(username="testadminuser", is_staff=True, is_superuser=True)
 
 
+@pytest.fixture
+@pytest.mark.django_db
+def category_tree(category_factory, admin_user) -> dict[str, Category]:
+    """
+    A category tree, keyed by slug::
+
+        root
+        ├── root_1
+        │   └── root_1_1
+        └── root_2
+    """
+
+    def build(slug):
+        return category_factory.build(
+            name=slug, slug=slug, created_by=admin_user, updated_by=admin_user
+        )
+
+    root = Category.add_root(instance=build("root"))
+    root_1 = root.add_child(instance=build("root_1"))
+    root_1_1 = root_1.add_child(instance=build("root_1_1"))
+    root_2 = Category.objects.get(pk=root.pk).add_child(instance=build("root_2"))
+    return {c.slug: c for c in [root, root_1, root_1_1, root_2]}
+
+
 @pytest.fixture
 @pytest.mark.django_db
 def api_rf() -> APIRequestFactory:
@@ -0,0 +1,408 @@
+import io
+import json
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.forms.models import model_to_dict
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from config.api_router import router
+from ecommerce.products.models import Product
+from ecommerce.products.tests.factories import (
+    AttributeFactory,
+    BrandFactory,
+    ProductFactory,
+    ProductLineFactory,
+)
+from ecommerce.users.models import User
+from ecommerce.utils.queries import IGNORED_PREFIXES
+
+SIZES = [100, 1000, 10000]
+REQUESTS = 50
+WARMUP = 5
+# Requests traced for their allocations, apart from the timed ones.
+ALLOCATION_REQUESTS = 5
+# Datasets up to this many products are built through the factories, the
+# larger ones in bulk.
+FACTORY_LIMIT = 1000
+TOLERANCE = 0.25
+SEED = 42
+FORMAT_VERSION = 1
+# Query parameters of the list actions needing some.
+LIST_PARAMS = {"autocomplete": {"q": "prod"}}
+
+
+def create_image() -> bytes:
+    content = io.BytesIO()
+    Image.new("RGB", (64, 64), "#336699").save(content, "PNG")
+    return content.getvalue()
+
+
+def brand_payload(index: int, **context) -> dict:
+    return model_to_dict(BrandFactory.build(slug=f"benchmark-{index}"))
+
+
+def attribute_payload(index: int, **context) -> dict:
+    return model_to_dict(AttributeFactory.build(slug=f"benchmark-{index}"))
+
+
+def product_payload(index: int, product: Product, **context) -> dict:
+    data = model_to_dict(
+        ProductFactory.build(
+            slug=f"benchmark-{index}",
+            owner=None,
+            category=product.category,
+            brand=product.brand,
+        )
+    )
+    return {key: value for key, value in data.items() if value is not None}
+
+
+def product_line_payload(index: int, product: Product, **context) -> dict:
+    line = ProductLineFactory.build(product=product, sku=f"BENCHMARK-{index}")
+    return {key: value for key, value in model_to_dict(line).items() if value}
+
+
+def product_image_payload(index: int, product: Product, image: bytes, **context):
+    upload = SimpleUploadedFile(f"benchmark-{index}.png", image, "image/png")
+    return {"product": product.pk, "image": upload, "alt_text": f"Image {index}"}
+
+
+# Payloads of the create actions, built from the factories, by router basename.
+CREATE_PAYLOADS = {
+    "brand": (brand_payload, "json"),
+    "attribute": (attribute_payload, "json"),
+    "product": (product_payload, "json"),
+    "productline": (product_line_payload, "json"),
+    "productimage": (product_image_payload, "multipart"),
+}
+
+
+class QueryCounter:
+    """
+    Count the statements run while installed as a database ``execute_wrapper``,
+    but for the savepoints the writes are rolled back with.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(IGNORED_PREFIXES):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+class Command(BaseCommand):
+    """Benchmark the API endpoints."""
+
+    help = (
+        "Seed datasets of several sizes, measure the latency percentiles, the "
+        "queries and the allocations of the list, detail and create actions of "
+        "every endpoint of the API router, and compare them with a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            default=SIZES,
+            type=int,
+            help="Numbers of products of the datasets.",
+        )
+        parser.add_argument(
+            "--endpoints",
+            nargs="+",
+            default=None,
+            help="Prefixes of the router endpoints benchmarked, all by default.",
+        )
+        parser.add_argument(
+            "--requests",
+            default=REQUESTS,
+            type=int,
+            help="Number of timed requests per action and dataset.",
+        )
+        parser.add_argument(
+            "--seed",
+            default=SEED,
+            type=int,
+            help="Seed the datasets are generated with.",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="JSON file the results are written to.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=None,
+            help="JSON file of earlier results to compare with.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            default=TOLERANCE,
+            type=float,
+            help="Relative increase of the p95 latency and of the allocations "
+            "allowed over the baseline. Any increase of the queries is a regression.",
+        )
+        parser.add_argument(
+            "--cached",
+            action="store_true",
+            help="Serve the responses from the catalog cache, as in production. "
+            "By default every request is rendered, so regressions are not hidden.",
+        )
+        parser.add_argument(
+            "--in-place",
+            action="store_true",
+            help="Replace the catalog of the current database with the datasets, "
+            "instead of benchmarking in a throwaway database.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the throwaway database between runs.",
+        )
+
+    def handle(self, *args: tuple, **options: dict[str, Any]):
+        """
+        Handle the command to benchmark the API endpoints.
+        """
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+
+        media_root = tempfile.TemporaryDirectory()
+        overrides = {
+            "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+            "MEDIA_ROOT": media_root.name,
+        }
+        if not options["cached"]:
+            # Entries stored with a timeout of 0 expire right away.
+            overrides["CATALOG_CACHE_TIMEOUT"] = 0
+
+        old_config = None
+        if not options["in_place"]:
+            for alias in connections:
+                settings_dict = connections[alias].settings_dict
+                settings_dict["TEST"]["NAME"] = f"benchmark_{settings_dict['NAME']}"
+            old_config = setup_databases(
+                verbosity=0, interactive=False, keepdb=options["keepdb"]
+            )
+        try:
+            with override_settings(**overrides):
+                results = self.run_benchmarks(**options)
+            version = ".".join(map(str, connection.get_database_version()))
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            media_root.cleanup()
+
+        report = {
+            "version": FORMAT_VERSION,
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": f"{connection.display_name} {version}",
+                "requests": options["requests"],
+                "seed": options["seed"],
+                "cached": options["cached"],
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+                file.write("\n")
+
+        if baseline is not None:
+            self.compare(report, baseline, options["tolerance"])
+
+    def run_benchmarks(self, **options: dict[str, Any]) -> list[dict]:
+        results = []
+        self.stdout.write(
+            f"{'benchmark':<28} {'p50':>9} {'p95':>9} {'p99':>9} "
+            f"{'queries':>7} {'alloc':>9}"
+        )
+        for size in options["sizes"]:
+            self.seed(size, options["seed"])
+            cases = self.get_cases(options["endpoints"])
+            for result in self.run_dataset(size, cases, options["requests"]):
+                results.append(result)
+                self.stdout.write(
+                    f"{result['name']:<28} {result['p50_ms']:>7.2f}ms "
+                    f"{result['p95_ms']:>7.2f}ms {result['p99_ms']:>7.2f}ms "
+                    f"{result['queries']:>7} {result['allocated_kib']:>6.0f}KiB"
+                )
+        return results
+
+    def seed(self, size: int, seed: int):
+        """
+        Replace the catalog with ``size`` products, through the factories of
+        ``populate_db`` or in bulk for the large datasets.
+        """
+        others = max(size // 10, 5)
+        call_command(
+            "populate_db",
+            users=others,
+            brands=others,
+            products=size,
+            bulk=size > FACTORY_LIMIT,
+            seed=seed,
+            stdout=io.StringIO(),
+        )
+        cache.clear()
+
+    def get_cases(self, endpoints: list[str] | None = None):
+        """
+        Yield the name, the user, the method and the url of every list, detail
+        and create action of the router, with a function building the arguments
+        of its requests.
+        """
+        admin = User.objects.get(username="admin")
+        product = Product.objects.select_related("owner").order_by("slug").first()
+        context = {"product": product, "image": create_image()}
+
+        for prefix, viewset, basename in router.registry:
+            if endpoints and prefix not in endpoints:
+                continue
+            if hasattr(viewset, "list"):
+                url = reverse(f"api:{basename}-list")
+                params = LIST_PARAMS.get(basename, {})
+
+                def arguments(index, params=params):
+                    return {"data": params}
+
+                yield f"{prefix}.list", admin, "get", url, arguments
+
+            if hasattr(viewset, "retrieve"):
+                lookup_field = viewset.lookup_field
+                value = (
+                    viewset.queryset.order_by(lookup_field)
+                    .values_list(lookup_field, flat=True)
+                    .first()
+                )
+                url = reverse(f"api:{basename}-detail", args=[value])
+                yield f"{prefix}.detail", admin, "get", url, lambda i: {}
+
+            if hasattr(viewset, "create") and basename in CREATE_PAYLOADS:
+                builder, format = CREATE_PAYLOADS[basename]
+                url = reverse(f"api:{basename}-list")
+                # Lines and images are only added to products by their owner.
+                user = product.owner if basename.startswith("product") else admin
+
+                def arguments(index, builder=builder, format=format):
+                    return {"data": builder(index, **context), "format": format}
+
+                yield f"{prefix}.create", user, "post", url, arguments
+
+    def run_dataset(self, size: int, cases, requests: int):
+        for name, user, method, url, arguments in cases:
+            client = APIClient()
+            client.force_authenticate(user)
+            send = getattr(client, method)
+
+            def request(kwargs):
+                if method == "get":
+                    response = send(url, **kwargs)
+                else:
+                    # Writes are rolled back, so every request sees the same data.
+                    with transaction.atomic():
+                        response = send(url, **kwargs)
+                        transaction.set_rollback(True)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f"{name} answered {response.status_code}: "
+                        f"{response.content[:500]!r}"
+                    )
+
+            for index in range(WARMUP):
+                request(arguments(index))
+
+            durations, queries = [], []
+            for index in range(requests):
+                kwargs = arguments(index)
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    start = time.perf_counter()
+                    request(kwargs)
+                    durations.append((time.perf_counter() - start) * 1000)
+                queries.append(counter.count)
+
+            allocations = []
+            for index in range(ALLOCATION_REQUESTS):
+                kwargs = arguments(index)
+                tracemalloc.start()
+                try:
+                    request(kwargs)
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                allocations.append(peak / 1024)
+
+            endpoint, action = name.split(".")
+            yield {
+                "name": f"{name}@{size}",
+                "endpoint": endpoint,
+                "action": action,
+                "size": size,
+                "p50_ms": round(percentile(durations, 50), 3),
+                "p95_ms": round(percentile(durations, 95), 3),
+                "p99_ms": round(percentile(durations, 99), 3),
+                "queries": round(statistics.median(queries)),
+                "allocated_kib": round(statistics.median(allocations), 1),
+            }
+
+    def compare(self, report: dict, baseline: dict, tolerance: float):
+        """
+        Compare the results with the baseline ones of the same name, and fail when
+        one of them regressed.
+        """
+        previous = {result["name"]: result for result in baseline["results"]}
+        regressions = []
+        for result in report["results"]:
+            before = previous.get(result["name"])
+            if before is None:
+                continue
+            if result["queries"] > before["queries"]:
+                regressions.append(
+                    f"{result['name']}: {before['queries']} -> "
+                    f"{result['queries']} queries"
+                )
+            for key, unit in [("p95_ms", "ms"), ("allocated_kib", "KiB")]:
+                if result[key] > before[key] * (1 + tolerance):
+                    regressions.append(
+                        f"{result['name']}: {key} {before[key]:.2f}{unit} -> "
+                        f"{result[key]:.2f}{unit}"
+                    )
+
+        for regression in regressions:
+            self.stderr.write(f"Regressed: {regression}")
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regressions against {len(previous)} baseline "
+                "benchmarks."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"No regressions against {len(previous)} benchmarks.")
+        )
@@ -0,0 +1,97 @@
+import io
+import json
+import timeit
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from ecommerce.products.api.serializers import ProductDetailSerializer
+from ecommerce.products.models import Product
+from ecommerce.utils.parsers import ORJSONParser
+from ecommerce.utils.renderers import ORJSONRenderer
+from ecommerce.utils.serializer import get_query_plan
+
+RENDERERS = {"json": JSONRenderer(), "orjson": ORJSONRenderer()}
+PARSERS = {"json": JSONParser(), "orjson": ORJSONParser()}
+
+
+class Command(BaseCommand):
+    """Benchmark the JSON renderers."""
+
+    help = (
+        "Compare the default DRF JSON renderer and parser with the orjson ones, "
+        "on product detail payloads of the catalog in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            default=25,
+            type=int,
+            help="Number of products in a payload.",
+        )
+        parser.add_argument(
+            "--repeat",
+            default=200,
+            type=int,
+            help="Number of times each payload is rendered and parsed.",
+        )
+
+    def handle(self, *args: tuple, **options: dict[str, Any]):
+        """
+        Handle the command to benchmark the JSON renderers.
+        """
+        payloads = {
+            "detail": self.get_payload(1)[0],
+            "page": self.get_payload(options["products"]),
+        }
+        repeat = options["repeat"]
+
+        self.stdout.write(f"{'payload':<8} {'step':<7} {'json':>10} {'orjson':>10}")
+        for name, payload in payloads.items():
+            contents = {
+                key: renderer.render(payload) for key, renderer in RENDERERS.items()
+            }
+            if json.loads(contents["json"]) != json.loads(contents["orjson"]):
+                raise CommandError(f"The renderers disagree on the {name} payload.")
+
+            render = {
+                key: self.measure(lambda: renderer.render(payload), repeat)
+                for key, renderer in RENDERERS.items()
+            }
+            parse = {
+                key: self.measure(
+                    lambda: parser.parse(io.BytesIO(contents["json"])), repeat
+                )
+                for key, parser in PARSERS.items()
+            }
+            size = len(contents["orjson"]) / 1024
+            for step, timings in [("render", render), ("parse", parse)]:
+                speedup = timings["json"] / timings["orjson"]
+                self.stdout.write(
+                    f"{name:<8} {step:<7} {timings['json']:>8.3f}ms "
+                    f"{timings['orjson']:>8.3f}ms  x{speedup:.1f} ({size:.0f} KiB)"
+                )
+
+    def get_payload(self, size: int) -> list[dict]:
+        select_related, prefetch_related = get_query_plan(ProductDetailSerializer)
+        products = Product.objects.filter(is_active=True).order_by("-created_at")
+        products = products.select_related(*select_related)
+        products = list(products.prefetch_related(*prefetch_related)[:size])
+        if len(products) < size:
+            raise CommandError(f"{size} active products needed, run populate_db.")
+
+        request = Request(RequestFactory().get("/api/products/"))
+        context = {"request": request}
+        return ProductDetailSerializer(products, many=True, context=context).data
+
+    def measure(self, function, repeat: int) -> float:
+        """
+        Return the best time of ``function``, in milliseconds, over 5 rounds.
+        """
+        rounds = timeit.repeat(function, number=repeat, repeat=5)
+        return min(rounds) / repeat * 1000
@@ -0,0 +1,321 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ecommerce.products.api.filters import TRUE_VALUES
+from ecommerce.products.models import (
+    Attribute,
+    Brand,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductLine,
+)
+from ecommerce.users.models import User
+from ecommerce.utils.cache import invalidate_model_cache
+from ecommerce.utils.cdn import purge_models
+
+BATCH_SIZE = 2000
+MAX_PRICE = Decimal("1e8")
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class RejectedRecord(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """Import a catalog feed."""
+
+    help = (
+        "Import products and product lines from a CSV or NDJSON feed, in the "
+        "format of the catalog export. Products are upserted by slug and product "
+        "lines by sku. Every batch is committed on its own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--format",
+            choices=sorted(set(FORMATS.values())),
+            help="Format of the feed. Guessed from the file extension by default.",
+        )
+        parser.add_argument(
+            "--owner",
+            default="admin",
+            help="Username owning the created products and recorded as editor.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            default=BATCH_SIZE,
+            type=int,
+            help="Number of products written per batch.",
+        )
+        parser.add_argument(
+            "--rejects",
+            type=Path,
+            help="Write the rejected records to this NDJSON file.",
+        )
+
+    def handle(self, *args: tuple, **options: dict[str, Any]):
+        """
+        Handle the command to import a catalog feed.
+        """
+        path = options["path"]
+        feed_format = options["format"] or FORMATS.get(path.suffix.lower())
+        if feed_format is None:
+            raise CommandError(f"Cannot guess the format of {path}, use --format.")
+        try:
+            self.user = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['owner']} does not exist.")
+
+        # Lookup maps, so every record is resolved without a query.
+        self.brands = dict(Brand.objects.values_list("slug", "id"))
+        self.categories = dict(Category.objects.values_list("slug", "id"))
+        self.attributes = dict(Attribute.objects.values_list("slug", "id"))
+
+        self.rejects = (
+            options["rejects"].open("w", encoding="utf-8")
+            if options["rejects"]
+            else None
+        )
+        self.counts = {"products": 0, "product lines": 0, "rejects": 0}
+        self.started = time.monotonic()
+        try:
+            with path.open(newline="", encoding="utf-8") as feed:
+                records = (
+                    self.read_csv(feed) if feed_format == "csv" else self.read(feed)
+                )
+                self.import_records(records, options["batch_size"])
+        finally:
+            if self.rejects:
+                self.rejects.close()
+
+        invalidate_model_cache(Product)
+        invalidate_model_cache(ProductLine)
+        invalidate_model_cache(ProductAttribute)
+        purge_models([Product, ProductLine, ProductAttribute])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {self.counts['products']} products and "
+                f"{self.counts['product lines']} product lines, "
+                f"{self.counts['rejects']} rejected."
+            )
+        )
+
+    def read(self, feed):
+        """
+        Yield the products of an NDJSON feed, one document per line.
+        """
+        for number, line in enumerate(feed, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                yield number, RejectedRecord(f"Invalid JSON: {exc}.")
+
+    def read_csv(self, feed):
+        """
+        Yield the products of a CSV feed, one row per product line.
+        """
+        for number, row in enumerate(csv.DictReader(feed), start=2):
+            attributes = {}
+            for pair in filter(None, (row.get("attributes") or "").split(";")):
+                slug, _, value = pair.partition("=")
+                attributes[slug] = value
+            line = {
+                "sku": row.get("sku"),
+                "price": row.get("price"),
+                "stock_quantity": row.get("stock_quantity"),
+                "is_active": row.get("line_is_active"),
+                "attributes": attributes,
+            }
+            yield number, {**row, "product_lines": [line] if line["sku"] else []}
+
+    def import_records(self, records, batch_size: int):
+        products, lines = {}, {}
+        for number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                product = self.build_product(record)
+            except RejectedRecord as exc:
+                self.reject(number, record, exc)
+                continue
+
+            products[product.slug] = product
+            for data in record.get("product_lines") or []:
+                try:
+                    line, attributes = self.build_line(data)
+                except RejectedRecord as exc:
+                    self.reject(number, data, exc)
+                    continue
+                lines[line.sku] = (product.slug, line, attributes)
+
+            if len(products) >= batch_size:
+                self.write_batch(products, lines)
+                products, lines = {}, {}
+
+        if products:
+            self.write_batch(products, lines)
+
+    def build_product(self, data) -> Product:
+        if not isinstance(data, dict):
+            raise RejectedRecord("Expected an object.")
+        for field in ["slug", "name", "brand"]:
+            if not data.get(field):
+                raise RejectedRecord(f"Missing {field}.")
+        self.check_length(Product, data, ["slug", "name"])
+        brand_id = self.brands.get(data["brand"])
+        if brand_id is None:
+            raise RejectedRecord(f"Unknown brand {data['brand']}.")
+        category_id = None
+        if data.get("category"):
+            category_id = self.categories.get(data["category"])
+            if category_id is None:
+                raise RejectedRecord(f"Unknown category {data['category']}.")
+
+        return Product(
+            slug=data["slug"],
+            name=data["name"],
+            description=data.get("description") or "",
+            is_active=self.parse_bool(data.get("is_active", True)),
+            brand_id=brand_id,
+            category_id=category_id,
+            owner=self.user,
+            created_by=self.user,
+            updated_by=self.user,
+        )
+
+    def build_line(self, data) -> tuple[ProductLine, dict | None]:
+        if not isinstance(data, dict) or not data.get("sku"):
+            raise RejectedRecord("Missing sku.")
+        self.check_length(ProductLine, data, ["sku"])
+        try:
+            price = Decimal(str(data.get("price")))
+            stock_quantity = int(data.get("stock_quantity") or 0)
+        except (InvalidOperation, TypeError, ValueError):
+            raise RejectedRecord("Invalid price or stock quantity.")
+        if not price.is_finite() or not 0 <= price < MAX_PRICE or stock_quantity < 0:
+            raise RejectedRecord("Price or stock quantity out of range.")
+
+        attributes = data.get("attributes")
+        if attributes is not None:
+            if not isinstance(attributes, dict):
+                raise RejectedRecord("Expected attributes as an object.")
+            unknown = set(attributes) - set(self.attributes)
+            if unknown:
+                raise RejectedRecord(
+                    f"Unknown attributes {', '.join(sorted(unknown))}."
+                )
+
+        line = ProductLine(
+            sku=data["sku"],
+            price=price.quantize(Decimal("0.01")),
+            stock_quantity=stock_quantity,
+            is_active=self.parse_bool(data.get("is_active", True)),
+            created_by=self.user,
+            updated_by=self.user,
+        )
+        return line, attributes
+
+    def check_length(self, model, data: dict, fields: list[str]):
+        for field in fields:
+            max_length = model._meta.get_field(field).max_length
+            if len(str(data[field])) > max_length:
+                raise RejectedRecord(f"{field} longer than {max_length} characters.")
+
+    def parse_bool(self, value) -> bool:
+        if isinstance(value, bool):
+            return value
+        return str(value).lower() in TRUE_VALUES
+
+    @transaction.atomic
+    def write_batch(self, products: dict[str, Product], lines: dict[str, tuple]):
+        """
+        Upsert a batch of products and product lines.
+
+        ``bulk_create`` does not return the ids of the rows updated on conflict, so
+        they are read back by slug and sku, with one query each.
+        """
+        Product.objects.bulk_create(
+            products.values(),
+            update_conflicts=True,
+            unique_fields=["slug"],
+            update_fields=[
+                "name",
+                "description",
+                "is_active",
+                "brand",
+                "category",
+                "updated_by",
+                "updated_at",
+            ],
+        )
+        product_ids = dict(
+            Product.objects.filter(slug__in=products).values_list("slug", "id")
+        )
+
+        for slug, line, _ in lines.values():
+            line.product_id = product_ids[slug]
+        ProductLine.objects.bulk_create(
+            [line for _, line, _ in lines.values()],
+            update_conflicts=True,
+            unique_fields=["sku"],
+            update_fields=[
+                "price",
+                "stock_quantity",
+                "is_active",
+                "product",
+                "updated_by",
+                "updated_at",
+            ],
+        )
+        line_ids = dict(
+            ProductLine.objects.filter(sku__in=lines).values_list("sku", "id")
+        )
+
+        # The attributes given for a line replace the ones it had.
+        attributes = {
+            line_ids[sku]: line_attributes
+            for sku, (_, _, line_attributes) in lines.items()
+            if line_attributes is not None
+        }
+        ProductAttribute.objects.filter(product_line_id__in=attributes).delete()
+        ProductAttribute.objects.bulk_create(
+            ProductAttribute(
+                product_line_id=line_id,
+                attribute_id=self.attributes[slug],
+                value=str(value)[:100],
+                created_by=self.user,
+                updated_by=self.user,
+            )
+            for line_id, line_attributes in attributes.items()
+            for slug, value in line_attributes.items()
+        )
+
+        self.counts["products"] += len(products)
+        self.counts["product lines"] += len(lines)
+        self.write_throughput()
+
+    def reject(self, number: int, record, error: Exception):
+        self.counts["rejects"] += 1
+        if self.rejects:
+            data = {"line": number, "error": str(error), "record": record}
+            if isinstance(record, Exception):
+                data["record"] = None
+            self.rejects.write(json.dumps(data, default=str) + "\n")
+
+    def write_throughput(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.counts["product lines"] / elapsed if elapsed else 0
+        counts = ", ".join(f"{count} {name}" for name, count in self.counts.items())
+        self.stdout.write(f"  {counts} in {elapsed:.1f}s ({rate:.0f} lines/s)")
@@ -0,0 +1,401 @@
+import asyncio
+import json
+import logging
+import random
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ecommerce.products.models import Category, Product, ProductLine
+from ecommerce.users.models import User
+from ecommerce.utils.loadtest import (
+    ASGITransport,
+    HTTPTransport,
+    Scenario,
+    Step,
+    run_load,
+)
+
+USERS = 20
+DURATION = 30
+# Seconds of load before the recording starts, e.g. while the caches fill.
+WARMUP = 5
+MIX = ["browse=2", "read=5", "seller=1", "reserve=2"]
+# Number of products, product lines and categories the virtual users pick from.
+SAMPLE_SIZE = 1000
+PRODUCT_ORDERINGS = ["min_price", "-min_price", "max_price", "-max_price"]
+
+
+@dataclass
+class Catalog:
+    """
+    Slugs and skus the virtual users request, sampled from the database.
+    """
+
+    products: list[str]
+    skus: list[str]
+    categories: list[str]
+    words: list[str]
+
+    def product_list(self, rng: random.Random) -> Step:
+        params = rng.choice(
+            [
+                {},
+                {"category": rng.choice(self.categories)},
+                {"q": rng.choice(self.words)},
+                {"ordering": rng.choice(PRODUCT_ORDERINGS)},
+                {"in_stock": "true"},
+            ]
+        )
+        name = "products.list" + "".join(f"?{key}" for key in params)
+        path = "/api/products/"
+        return Step(name, "GET", f"{path}?{urlencode(params)}" if params else path)
+
+    def product_detail(self, rng: random.Random) -> Step:
+        slug = rng.choice(self.products)
+        return Step("products.detail", "GET", f"/api/products/{slug}/")
+
+    def product_line_detail(self, rng: random.Random) -> Step:
+        sku = rng.choice(self.skus)
+        return Step("product_lines.detail", "GET", f"/api/product_lines/{sku}/")
+
+    def category_tree(self, rng: random.Random) -> Step:
+        return Step("categories.tree", "GET", "/api/categories/tree/")
+
+    def autocomplete(self, rng: random.Random) -> Step:
+        prefix = rng.choice(self.words)[:3]
+        return Step("autocomplete.list", "GET", f"/api/autocomplete/?q={prefix}")
+
+
+def browse(catalog: Catalog):
+    """
+    Anonymous visitors, refused by the catalog endpoints, which need a login.
+    """
+    steps = [catalog.product_list, catalog.product_detail, catalog.category_tree]
+
+    def next_step(rng):
+        step = rng.choice(steps)(rng)
+        step.expected = (200, 403)
+        return step
+
+    return next_step
+
+
+def read(catalog: Catalog):
+    """
+    Logged in shoppers, mostly listing and opening products.
+    """
+    steps = [
+        catalog.product_list,
+        catalog.product_detail,
+        catalog.product_line_detail,
+        catalog.category_tree,
+        catalog.autocomplete,
+    ]
+    weights = [4, 3, 1, 1, 1]
+
+    def next_step(rng):
+        return rng.choices(steps, weights)[0](rng)
+
+    return next_step
+
+
+def seller(catalog: Catalog, products: list[str]):
+    """
+    Sellers opening their products and editing their descriptions.
+    """
+
+    def next_step(rng):
+        path = f"/api/products/{rng.choice(products)}/"
+        if rng.random() < 0.5:
+            return Step("products.detail (own)", "GET", path)
+        description = f"Load test description {rng.randrange(10**6)}."
+        return Step("products.update", "PATCH", path, {"description": description})
+
+    return next_step
+
+
+def reserve(catalog: Catalog):
+    """
+    Shoppers checking the stock of product lines and reserving one unit.
+    """
+
+    def next_step(rng):
+        if rng.random() < 0.5:
+            return catalog.product_line_detail(rng)
+        sku = rng.choice(catalog.skus)
+        path = f"/api/product_lines/{sku}/reserve/"
+        # Lines running out of stock are refused with a 409.
+        return Step("product_lines.reserve", "POST", path, {"quantity": 1}, (200, 409))
+
+    return next_step
+
+
+# Step generators of the scenarios, by name.
+SCENARIOS = {"browse": browse, "read": read, "seller": seller, "reserve": reserve}
+
+
+class Command(BaseCommand):
+    """Run a load test against the ASGI application."""
+
+    help = (
+        "Drive concurrent virtual users, anonymous visitors, shoppers, sellers and "
+        "stock reservations, at the ASGI application in the process or at a "
+        "server, and report the throughput, error rates and latencies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            default=USERS,
+            type=int,
+            help="Number of concurrent virtual users.",
+        )
+        parser.add_argument(
+            "--mix",
+            nargs="+",
+            default=MIX,
+            help="Weights of the scenarios among the virtual users, as name=weight, "
+            "with the browse, read, seller and reserve scenarios.",
+        )
+        parser.add_argument(
+            "--duration",
+            default=DURATION,
+            type=float,
+            help="Seconds the load is sustained, after the virtual users logged in.",
+        )
+        parser.add_argument(
+            "--warmup",
+            default=WARMUP,
+            type=float,
+            help="Seconds of load, after the logins, not recorded.",
+        )
+        parser.add_argument(
+            "--think-time",
+            default=0,
+            type=float,
+            help="Mean seconds a virtual user waits between its requests.",
+        )
+        parser.add_argument(
+            "--url",
+            default=None,
+            help="Base url of the server to load, e.g. http://127.0.0.1:8000. The "
+            "ASGI application is called in the process without it.",
+        )
+        parser.add_argument(
+            "--serve",
+            action="store_true",
+            help="Serve the ASGI application with uvicorn at --url, in the process.",
+        )
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of the accounts the virtual users log in with, the one "
+            "populate_db sets.",
+        )
+        parser.add_argument(
+            "--seed",
+            default=0,
+            type=int,
+            help="Seed the scenarios of the virtual users are drawn with.",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="JSON file the results are written to.",
+        )
+
+    def handle(self, *args: tuple, **options: dict[str, Any]):
+        """
+        Handle the command to run a load test.
+        """
+        if options["serve"] and not options["url"]:
+            raise CommandError("--serve needs the --url to serve the application at.")
+        weights = self.parse_mix(options["mix"])
+        catalog = self.get_catalog()
+        scenarios = self.get_scenarios(
+            catalog, weights, options["users"], options["password"], options["seed"]
+        )
+
+        # Setting the application up configures the logging again, so import it
+        # first. The refused requests of the anonymous visitors would flood the
+        # output otherwise.
+        from config.asgi import application  # noqa: F401
+
+        logger = logging.getLogger("django.request")
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            logins, stats, duration = asyncio.run(self.run(scenarios, **options))
+        finally:
+            logger.setLevel(level)
+
+        login_rows = logins.summary(duration)
+        failed = sum(logins.errors.values())
+        if failed:
+            self.stderr.write(
+                f"{failed} of {len(logins.latencies['login'])} logins failed, check "
+                "the --password of the accounts."
+            )
+        rows = stats.summary(duration)
+        self.write_rows(rows)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                report = {
+                    "users": options["users"],
+                    "mix": weights,
+                    "duration": round(duration, 3),
+                    "logins": login_rows[-1] if login_rows else None,
+                    "results": rows,
+                }
+                json.dump(report, file, indent=2)
+                file.write("\n")
+
+    def parse_mix(self, mix: list[str]) -> dict[str, float]:
+        weights = {}
+        for item in mix:
+            name, _, weight = item.partition("=")
+            if name not in SCENARIOS:
+                raise CommandError(
+                    f"Unknown scenario {name!r}, use one of {', '.join(SCENARIOS)}."
+                )
+            try:
+                weights[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f"Invalid weight {weight!r} of {name}.")
+        if not sum(weights.values()) > 0:
+            raise CommandError("The weights of the mix must add up to more than 0.")
+        return weights
+
+    def get_catalog(self) -> Catalog:
+        products = Product.objects.filter(is_active=True).order_by("-created_at")
+        products = list(products.values_list("slug", "name")[:SAMPLE_SIZE])
+        skus = ProductLine.objects.filter(is_active=True, product__is_active=True)
+        skus = list(skus.order_by("-created_at").values_list("sku", flat=True))
+        categories = Category.objects.filter(is_active=True)
+        categories = categories.order_by("tree_id", "lft")
+        categories = list(categories.values_list("slug", flat=True)[:SAMPLE_SIZE])
+        if not products or not skus or not categories:
+            raise CommandError("The catalog is empty, run populate_db.")
+        words = sorted({word for _, name in products for word in name.split()})
+        return Catalog(
+            products=[slug for slug, _ in products],
+            skus=skus[:SAMPLE_SIZE],
+            categories=categories,
+            words=words,
+        )
+
+    def get_scenarios(self, catalog, weights, users, password, seed) -> list:
+        """
+        Spread the virtual users over the scenarios in proportion to their weight,
+        each logged in scenario with an account of its own while there are enough.
+        """
+        total = sum(weights.values())
+        shares = {name: users * weight / total for name, weight in weights.items()}
+        counts = {name: int(share) for name, share in shares.items()}
+        # The users left by the rounding go to the largest remainders.
+        remainders = sorted(shares, key=lambda name: counts[name] - shares[name])
+        for name in remainders[: users - sum(counts.values())]:
+            counts[name] += 1
+
+        accounts = User.objects.filter(
+            is_active=True, is_staff=False, emailaddress__verified=True
+        )
+        readers = list(accounts.order_by("username").values_list("username", flat=True))
+        sellers = {}
+        owned = Product.objects.filter(is_active=True, owner__in=accounts)
+        owned = owned.order_by("owner__username", "slug")
+        for username, slug in owned.values_list("owner__username", "slug"):
+            sellers.setdefault(username, []).append(slug)
+        if not readers or (counts.get("seller") and not sellers):
+            raise CommandError("No verified accounts to log in with, run populate_db.")
+
+        rng = random.Random(seed)
+        rng.shuffle(readers)
+        seller_names = sorted(sellers)
+        scenarios = []
+        for name, count in counts.items():
+            for index in range(count):
+                if name == "browse":
+                    scenarios.append(Scenario(name, browse(catalog)))
+                    continue
+                if name == "seller":
+                    username = seller_names[index % len(seller_names)]
+                    next_step = seller(catalog, sellers[username])
+                else:
+                    username = readers[index % len(readers)]
+                    next_step = SCENARIOS[name](catalog)
+                credentials = {"username": username, "password": password}
+                scenarios.append(Scenario(name, next_step, credentials))
+        return scenarios
+
+    async def run(self, scenarios, **options):
+        url = options["url"]
+        if url is None:
+            from config.asgi import application
+
+            def transport_factory():
+                return ASGITransport(application)
+
+        else:
+            parts = urlsplit(url)
+            host, port = parts.hostname, parts.port or 80
+
+            def transport_factory():
+                return HTTPTransport(host, port)
+
+        server = None
+        if options["serve"]:
+            server = await self.serve(host, port)
+        try:
+            return await run_load(
+                transport_factory,
+                scenarios,
+                options["duration"],
+                options["think_time"],
+                options["seed"],
+                options["warmup"],
+            )
+        finally:
+            if server is not None:
+                server.should_exit = True
+                await server.task
+            # Sync views ran in the thread of the ASGI handler, with connections
+            # of their own.
+            await sync_to_async(connections.close_all)()
+
+    async def serve(self, host: str, port: int):
+        """
+        Serve the ASGI application with uvicorn, in the event loop of the load.
+        """
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError("uvicorn is not installed, --serve needs it.")
+        from config.asgi import application
+
+        config = uvicorn.Config(application, host=host, port=port, log_level="warning")
+        server = uvicorn.Server(config)
+        server.task = asyncio.create_task(server.serve())
+        while not server.started:
+            if server.task.done():
+                raise CommandError(f"uvicorn could not serve at {host}:{port}.")
+            await asyncio.sleep(0.05)
+        return server
+
+    def write_rows(self, rows: list[dict]):
+        self.stdout.write(
+            f"{'request':<44} {'reqs':>6} {'req/s':>8} {'errors':>7} "
+            f"{'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:<44} {row['requests']:>6} {row['throughput']:>8.1f} "
+                f"{row['error_rate']:>7.1%} {row['p50_ms']:>7.1f}ms "
+                f"{row['p90_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms "
+                f"{row['max_ms']:>7.1f}ms"
+            )
@@ -1,10 +1,34 @@
+import contextlib
+import csv
+import io
+import itertools
 import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
 from typing import Any
 
+from allauth.account.models import EmailAddress
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from factory.random import reseed_random
+from faker import Faker
+from PIL import Image
 
-from ecommerce.products.models import Attribute, Brand, Category, Product
+from ecommerce.products.models import (
+    Attribute,
+    Brand,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductImage,
+    ProductLine,
+)
 from ecommerce.products.tests.factories import (
     BrandFactory,
     CategoryFactory,
@@ -19,6 +43,53 @@ NUM_CATEGORIES_LEVEL = 5
 NUM_BRANDS = 25
 NUM_PRODUCTS = 30
 
+# Bulk mode only.
+BATCH_SIZE = 5000
+NUM_DESCRIPTIONS = 1000
+LINES_PER_PRODUCT = 2
+IMAGES_PER_PRODUCT = 2
+ATTRIBUTES_PER_LINE = 2
+ATTRIBUTE_VALUES = {
+    "color": ["black", "white", "red", "green", "blue", "yellow", "grey", "pink"],
+    "size": ["XS", "S", "M", "L", "XL", "XXL"],
+    "material": ["cotton", "linen", "wool", "leather", "polyester", "silk"],
+    "fit": ["slim", "regular", "relaxed", "oversized"],
+    "pattern": ["plain", "striped", "checked", "dotted", "floral"],
+}
+
+# The columns maintained row by row by the triggers of the products migrations,
+# which the bulk mode disables, rebuilt once the rows are loaded.
+REBUILD_SQL = """
+UPDATE products_product AS product
+SET search_vector =
+        setweight(to_tsvector('english', coalesce(source.name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(brand.name, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(category.name, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(source.description, '')), 'C'),
+    min_price = summary.min_price,
+    max_price = summary.max_price,
+    total_stock = coalesce(summary.total_stock, 0),
+    active_line_count = coalesce(summary.active_line_count, 0)
+FROM products_product AS source
+JOIN products_brand AS brand ON brand.id = source.brand_id
+LEFT JOIN products_category AS category ON category.id = source.category_id
+LEFT JOIN (
+    SELECT product_id, min(price) AS min_price, max(price) AS max_price,
+        sum(stock_quantity) AS total_stock, count(*) AS active_line_count
+    FROM products_productline
+    WHERE is_active
+    GROUP BY product_id
+) AS summary ON summary.product_id = source.id
+WHERE product.id = source.id;
+
+INSERT INTO products_productfacet (product_id, attribute_id, value, line_count)
+SELECT line.product_id, attribute.attribute_id, attribute.value, count(*)
+FROM products_productattribute AS attribute
+JOIN products_productline AS line ON line.id = attribute.product_line_id
+WHERE line.is_active
+GROUP BY line.product_id, attribute.attribute_id, attribute.value;
+"""
+
 
 class Command(BaseCommand):
     """Populate database with fake data."""
@@ -35,12 +106,52 @@ class Command(BaseCommand):
         )
         parser.add_argument("brands", nargs="?", default=NUM_BRANDS, type=int)
         parser.add_argument("products", nargs="?", default=NUM_PRODUCTS, type=int)
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Insert the rows in batches, to generate large datasets.",
+        )
+        parser.add_argument(
+            "--scale",
+            default=1.0,
+            type=float,
+            help="Multiply the number of users, brands and products.",
+        )
+        parser.add_argument(
+            "--seed",
+            default=None,
+            type=int,
+            help="Seed the random generators, to reproduce the same dataset.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            default=BATCH_SIZE,
+            type=int,
+            help="Number of rows inserted per query in bulk mode.",
+        )
 
-    @transaction.atomic
     def handle(self, *args: tuple, **options: dict[str, Any]):
         """
         Handle the command to populate the database with fake data.
         """
+        seed = options["seed"]
+        if seed is not None:
+            random.seed(seed)
+            reseed_random(seed)
+
+        for key in ["users", "brands", "products"]:
+            options[key] = int(options[key] * options["scale"])
+
+        if options["bulk"]:
+            self.handle_bulk(**options)
+        else:
+            with transaction.atomic():
+                self.handle_factories(**options)
+
+    def handle_factories(self, **options: dict[str, Any]):
+        """
+        Populate the database through the factories, one row at a time.
+        """
         self.stdout.write("Deleting old data...")
         # Need to be ordered by dependencies to avoid FK errors.
         models = [Product, Attribute, Brand, Category, User]
@@ -52,21 +163,7 @@ class Command(BaseCommand):
 
         # Create admin
         self.stdout.write("Creating admin users...")
-        admin = UserFactory(
-            username="admin",
-            password="password",
-            is_active=True,
-            is_staff=True,
-            is_superuser=True,
-        )
-
-        common_user = UserFactory(
-            username="user",
-            password="password",
-            is_active=True,
-            is_staff=False,
-            is_superuser=False,
-        )
+        admin, common_user = self.create_admin_users()
 
         # Create all extra users
         self.stdout.write("Creating new users...")
@@ -133,3 +230,351 @@ class Command(BaseCommand):
                 owner=user,
             )
             products.append(product)
+
+    def create_admin_users(self):
+        """
+        Create the admin and the common user, both with the "password" password.
+        """
+        admin = UserFactory(
+            username="admin",
+            password="password",
+            is_active=True,
+            is_staff=True,
+            is_superuser=True,
+        )
+
+        common_user = UserFactory(
+            username="user",
+            password="password",
+            is_active=True,
+            is_staff=False,
+            is_superuser=False,
+        )
+        return admin, common_user
+
+    def handle_bulk(self, **options: dict[str, Any]):
+        """
+        Populate the database with batched inserts.
+
+        Rows are generated without factories and inserted one batch at a time, so
+        memory stays bounded whatever the scale. Users and brands get ids derived
+        from their index, so products can reference them without keeping them
+        around.
+
+        Each batch of products is committed on its own, with the triggers off.
+        The search vectors, facets and summaries they maintain are rebuilt with a
+        few set-based statements at the end. An interrupted run leaves them
+        empty, running the command again starts over.
+        """
+        self.rng = random.Random(options["seed"])
+        self.namespace = uuid.UUID(int=self.rng.getrandbits(128), version=4)
+        self.batch_size = options["batch_size"]
+
+        self.stdout.write("Truncating old data...")
+        models = [
+            ProductAttribute,
+            ProductImage,
+            ProductLine,
+            Product,
+            Attribute,
+            Brand,
+            Category,
+            User,
+        ]
+        tables = [m._meta.db_table for m in models]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sql_flush(no_style(), tables, allow_cascade=True):
+                cursor.execute(sql)
+
+        self.stdout.write("Creating admin users...")
+        admin, common_user = self.create_admin_users()
+
+        faker = Faker()
+        faker.seed_instance(options["seed"])
+        descriptions = [faker.text(max_nb_chars=200) for _ in range(NUM_DESCRIPTIONS)]
+
+        num_users = options["users"]
+        password = make_password("password")
+        self.bulk_insert(
+            User,
+            (
+                User(
+                    id=self.make_id("user", index),
+                    username=f"user{index}",
+                    email=f"user{index}@example.com",
+                    password=password,
+                )
+                for index in range(num_users)
+            ),
+        )
+        self.bulk_insert(
+            EmailAddress,
+            (
+                EmailAddress(
+                    user_id=self.make_id("user", index),
+                    email=f"user{index}@example.com",
+                    verified=True,
+                    primary=True,
+                )
+                for index in range(num_users)
+            ),
+        )
+
+        num_brands = options["brands"]
+        self.bulk_insert(
+            Brand,
+            (
+                Brand(
+                    id=self.make_id("brand", index),
+                    name=f"Brand {index}",
+                    slug=f"brand{index}",
+                    description=self.rng.choice(descriptions),
+                    is_active=True,
+                    created_by=admin,
+                    updated_by=admin,
+                )
+                for index in range(num_brands)
+            ),
+        )
+
+        categories = self.build_category_tree(
+            admin, options["categories_node"], options["categories_level"]
+        )
+        self.bulk_insert(Category, categories)
+        categories_ids = [category.id for category in categories[1:]]
+
+        attributes = [
+            Attribute(
+                id=self.new_id(),
+                name=slug.capitalize(),
+                slug=slug,
+                description=f"{slug.capitalize()} of the product.",
+                is_active=True,
+                created_by=admin,
+                updated_by=admin,
+            )
+            for slug in ATTRIBUTE_VALUES
+        ]
+        self.bulk_insert(Attribute, attributes)
+
+        image = self.save_placeholder_image()
+        num_products = options["products"]
+        users_ids = [common_user.id]
+        audit_fields = ["created_by_id", "created_at", "updated_by_id", "updated_at"]
+        product_fields = [
+            "id",
+            "name",
+            "slug",
+            "description",
+            "is_active",
+            "brand_id",
+            "category_id",
+            "owner_id",
+            "total_stock",
+            "active_line_count",
+        ] + audit_fields
+        line_fields = [
+            "id",
+            "price",
+            "sku",
+            "stock_quantity",
+            "is_active",
+            "product_id",
+        ] + audit_fields
+        image_fields = ["id", "image", "alt_text", "product_id"] + audit_fields
+        attribute_fields = ["id", "value", "product_line_id", "attribute_id"]
+        attribute_fields += audit_fields
+
+        self.stdout.write(f"Creating {num_products} products...")
+        now = timezone.now()
+        started = time.monotonic()
+        for start in range(0, num_products, self.batch_size):
+            end = min(start + self.batch_size, num_products)
+            products, lines, images, product_attributes = [], [], [], []
+            for index in range(start, end):
+                owner_index = self.rng.randrange(num_users + len(users_ids))
+                owner_id = (
+                    self.make_id("user", owner_index)
+                    if owner_index < num_users
+                    else users_ids[owner_index - num_users]
+                )
+                # Spread the creation dates, so the lists paginate like real ones.
+                created_at = now - timedelta(seconds=num_products - index)
+                audit = (owner_id, created_at, owner_id, created_at)
+                product_id = self.new_id()
+                products.append(
+                    (
+                        product_id,
+                        f"Product {index}",
+                        f"prod{index}",
+                        self.rng.choice(descriptions),
+                        True,
+                        self.make_id("brand", self.rng.randrange(num_brands)),
+                        self.rng.choice(categories_ids),
+                        owner_id,
+                        0,
+                        0,
+                    )
+                    + audit
+                )
+
+                for line_index in range(LINES_PER_PRODUCT):
+                    line_id = self.new_id()
+                    lines.append(
+                        (
+                            line_id,
+                            Decimal(self.rng.randint(100, 10000)) / 100,
+                            f"SKU-{index:09d}-{line_index}",
+                            self.rng.randint(1, 100),
+                            True,
+                            product_id,
+                        )
+                        + audit
+                    )
+                    for attribute in self.rng.sample(attributes, ATTRIBUTES_PER_LINE):
+                        value = self.rng.choice(ATTRIBUTE_VALUES[attribute.slug])
+                        product_attributes.append(
+                            (self.new_id(), value, line_id, attribute.id) + audit
+                        )
+
+                for image_index in range(IMAGES_PER_PRODUCT):
+                    alt_text = f"Product {index} image {image_index + 1}"
+                    images.append((self.new_id(), image, alt_text, product_id) + audit)
+
+            with self.without_triggers():
+                self.insert_rows(Product, product_fields, products)
+                self.insert_rows(ProductLine, line_fields, lines)
+                self.insert_rows(ProductImage, image_fields, images)
+                self.insert_rows(ProductAttribute, attribute_fields, product_attributes)
+            self.write_throughput("products", end, started)
+
+        if connection.vendor == "postgresql":
+            self.stdout.write("Rebuilding the search vectors, facets and summaries...")
+            started = time.monotonic()
+            with self.without_triggers(), connection.cursor() as cursor:
+                cursor.execute(REBUILD_SQL)
+            self.write_throughput("products", num_products, started)
+
+    @contextlib.contextmanager
+    def without_triggers(self):
+        """
+        Run a block in a transaction where the triggers don't fire, nor the
+        foreign key checks, the generated rows referencing existing ones.
+
+        The replication role of the session is reset at the end of the block, or
+        rolled back with it, so it doesn't leak into an enclosing transaction.
+        """
+        with transaction.atomic():
+            if connection.vendor != "postgresql":
+                yield
+                return
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL session_replication_role = replica")
+            yield
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL session_replication_role = DEFAULT")
+
+    def insert_rows(self, model, fields: list[str], rows: list[tuple]):
+        """
+        Insert rows of raw field values in the table of a model.
+
+        On PostgreSQL the rows are streamed with ``COPY``, which skips building the
+        model instances and compiling the ``INSERT`` statements, most of the cost
+        of ``bulk_create`` at this scale.
+        """
+        if connection.vendor != "postgresql":
+            model.objects.bulk_create(
+                [model(**dict(zip(fields, row))) for row in rows],
+                batch_size=self.batch_size,
+            )
+            return
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        quote_name = connection.ops.quote_name
+        columns = ", ".join(
+            quote_name(model._meta.get_field(field).column) for field in fields
+        )
+        table = quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+
+    def make_id(self, kind: str, index: int) -> uuid.UUID:
+        """
+        Return the id of the ``index``-th row of a kind, stable for a given seed.
+        """
+        return uuid.uuid5(self.namespace, f"{kind}:{index}")
+
+    def new_id(self) -> uuid.UUID:
+        """
+        Return a random id, drawn from the seeded generator.
+        """
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def build_category_tree(self, admin: User, nodes: int, levels: int):
+        """
+        Build the category tree in depth first order, with the nested set bounds
+        computed in memory instead of rewritten on every ``add_child``.
+        """
+        categories = []
+        counter = itertools.count(1)
+
+        def visit(name, slug, depth):
+            category = Category(
+                id=self.new_id(),
+                name=name,
+                slug=slug,
+                is_active=True,
+                tree_id=1,
+                depth=depth,
+                lft=next(counter),
+                created_by=admin,
+                updated_by=admin,
+            )
+            categories.append(category)
+            if depth <= levels:
+                # Siblings are kept sorted by name, as in Category.node_order_by.
+                children = sorted(
+                    (f"{name}.{index + 1}", f"{slug}_{index + 1}")
+                    for index in range(nodes)
+                )
+                for child_name, child_slug in children:
+                    visit(child_name, child_slug, depth + 1)
+            category.rgt = next(counter)
+
+        visit("Category 1", "category_1", 1)
+        return categories
+
+    def save_placeholder_image(self) -> str:
+        """
+        Store the single image file shared by every generated product image.
+        """
+        field = ProductImage._meta.get_field("image")
+        name = field.generate_filename(None, "placeholder.png")
+        if field.storage.exists(name):
+            return name
+        buffer = io.BytesIO()
+        Image.new("RGB", (100, 100), color="#cccccc").save(buffer, "PNG")
+        return field.storage.save(name, ContentFile(buffer.getvalue()))
+
+    def bulk_insert(self, model, objs):
+        """
+        Insert the objects of an iterable, one batch at a time.
+        """
+        name = model._meta.verbose_name_plural
+        self.stdout.write(f"Creating new {name}...")
+        started = time.monotonic()
+        objs = iter(objs)
+        count = 0
+        while batch := list(itertools.islice(objs, self.batch_size)):
+            model.objects.bulk_create(batch)
+            count += len(batch)
+        self.write_throughput(name, count, started)
+
+    def write_throughput(self, name: str, count: int, started: float):
+        elapsed = time.monotonic() - started
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(f"  {count} {name} in {elapsed:.1f}s ({rate:.0f}/s)")
@@ -0,0 +1,102 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ecommerce.products.models import Product, ProductLine
+from ecommerce.utils.cache import invalidate_model_cache
+from ecommerce.utils.cdn import purge_queryset
+
+BATCH_SIZE = 1000
+SUMMARY_FIELDS = ["min_price", "max_price", "total_stock", "active_line_count"]
+
+
+class Command(BaseCommand):
+    """Reconcile the product summaries."""
+
+    help = (
+        "Recompute the price range and stock summary of the products from their "
+        "active lines, and repair the products whose summary drifted, e.g. after "
+        "writes made with the database triggers disabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the drifted products without repairing them.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            default=BATCH_SIZE,
+            type=int,
+            help="Number of products repaired per batch.",
+        )
+
+    def handle(self, *args: tuple, **options: dict[str, Any]):
+        """
+        Handle the command to reconcile the product summaries.
+        """
+        drifted, batch = 0, []
+        for product, expected in self.get_summaries():
+            if [getattr(product, field) for field in SUMMARY_FIELDS] == expected:
+                continue
+            drifted += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Drifted: {product.slug}")
+            if options["dry_run"]:
+                continue
+            batch.append(product.pk)
+            if len(batch) == options["batch_size"]:
+                self.repair(batch)
+                batch = []
+        if batch:
+            self.repair(batch)
+
+        if options["dry_run"]:
+            self.stdout.write(f"{drifted} product summaries drifted.")
+            return
+        if drifted:
+            invalidate_model_cache(Product)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {drifted} product summaries."))
+
+    def repair(self, pks: list[int]):
+        """
+        Repair the summaries of the given products, recomputed by the trigger of
+        the products on a direct update, and purge their responses.
+        """
+        products = Product.objects.filter(pk__in=pks)
+        with transaction.atomic():
+            # The summaries are part of the payloads validated on updated_at.
+            products.update(total_stock=F("total_stock"), updated_at=timezone.now())
+            purge_queryset(products)
+
+    def get_summaries(self):
+        """
+        Yield every product, with its stored summary only, and the summary of its
+        active lines.
+        """
+        lines = ProductLine.objects.filter(product=OuterRef("pk"), is_active=True)
+        lines = lines.order_by().values("product")
+
+        def aggregate(function, output_field=None):
+            values = lines.annotate(value=function).values("value")
+            return Subquery(values, output_field=output_field)
+
+        products = Product.objects.only("slug", *SUMMARY_FIELDS).annotate(
+            expected_min_price=aggregate(Min("price")),
+            expected_max_price=aggregate(Max("price")),
+            expected_total_stock=Coalesce(
+                aggregate(Sum("stock_quantity"), IntegerField()), 0
+            ),
+            expected_active_line_count=Coalesce(
+                aggregate(Count("pk"), IntegerField()), 0
+            ),
+        )
+        for product in products.order_by("pk").iterator():
+            yield product, [
+                getattr(product, f"expected_{field}") for field in SUMMARY_FIELDS
+            ]
@@ -0,0 +1,79 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def benchmark(tmp_path):
+    """
+    Run the benchmark in place on a tiny dataset, and return its JSON results.
+    """
+
+    def benchmark(**options):
+        output = tmp_path / "results.json"
+        call_command(
+            "benchmark_api",
+            sizes=[3],
+            requests=2,
+            in_place=True,
+            output=str(output),
+            stdout=io.StringIO(),
+            stderr=io.StringIO(),
+            **options,
+        )
+        return json.loads(output.read_text())
+
+    return benchmark
+
+
+class TestBenchmarkApi:
+    def test_benchmark(self, benchmark):
+        report = benchmark()
+
+        names = {result["name"] for result in report["results"]}
+        assert {
+            "products.list@3",
+            "products.detail@3",
+            "products.create@3",
+            "product_image.create@3",
+            "users.detail@3",
+            "autocomplete.list@3",
+        } <= names
+        assert "categories.create@3" not in names
+        result = next(r for r in report["results"] if r["name"] == "products.list@3")
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert result["queries"] > 0
+        assert result["allocated_kib"] > 0
+
+    def test_benchmark_when_endpoints(self, benchmark):
+        report = benchmark(endpoints=["brands"])
+
+        assert [result["name"] for result in report["results"]] == [
+            "brands.list@3",
+            "brands.detail@3",
+            "brands.create@3",
+        ]
+
+    def test_benchmark_when_baseline(self, benchmark, tmp_path):
+        baseline = benchmark(endpoints=["brands"])
+        for result in baseline["results"]:
+            result.update(p95_ms=10**6, allocated_kib=10**6)
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps(baseline))
+
+        benchmark(endpoints=["brands"], baseline=str(path))
+
+    def test_benchmark_when_regressed(self, benchmark, tmp_path):
+        baseline = benchmark(endpoints=["brands"])
+        for result in baseline["results"]:
+            result.update(p95_ms=10**6, allocated_kib=10**6)
+        baseline["results"][0]["queries"] = 0
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps(baseline))
+
+        with pytest.raises(CommandError, match="1 regressions"):
+            benchmark(endpoints=["brands"], baseline=str(path))
@@ -0,0 +1,21 @@
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestBenchmarkRenderers:
+    def test_benchmark(self, product_factory):
+        product_factory.create_batch(2)
+        stdout = io.StringIO()
+        call_command("benchmark_renderers", products=2, repeat=1, stdout=stdout)
+
+        lines = stdout.getvalue().splitlines()
+        assert len(lines) == 5
+        assert lines[1].startswith("detail   render")
+
+    def test_benchmark_when_not_enough_products(self, product):
+        with pytest.raises(CommandError):
+            call_command("benchmark_renderers", products=2, stdout=io.StringIO())
@@ -0,0 +1,135 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from ecommerce.products.models import Product, ProductLine
+
+pytestmark = [pytest.mark.django_db]
+
+
+def import_catalog(path, **options):
+    call_command(
+        "import_catalog",
+        str(path),
+        owner="testadminuser",
+        stdout=io.StringIO(),
+        **options,
+    )
+
+
+def write_ndjson(path, documents):
+    path.write_text("".join(json.dumps(document) + "\n" for document in documents))
+    return path
+
+
+@pytest.fixture
+def feed(tmp_path, brand, category, attribute):
+    return write_ndjson(
+        tmp_path / "feed.ndjson",
+        [
+            {
+                "slug": f"product-{index}",
+                "name": f"Product {index}",
+                "brand": brand.slug,
+                "category": category.slug,
+                "product_lines": [
+                    {
+                        "sku": f"SKU-{index}",
+                        "price": "9.99",
+                        "stock_quantity": 3,
+                        "attributes": {attribute.slug: "red"},
+                    }
+                ],
+            }
+            for index in range(5)
+        ],
+    )
+
+
+class TestImportCatalog:
+    def test_import(self, admin_user, feed):
+        import_catalog(feed, batch_size=2)
+
+        assert Product.objects.filter(slug__startswith="product-").count() == 5
+        line = ProductLine.objects.get(sku="SKU-0")
+        assert line.product.slug == "product-0"
+        assert line.product.owner == admin_user
+        assert str(line.price) == "9.99"
+        assert list(line.productattribute_set.values_list("value", flat=True)) == [
+            "red"
+        ]
+
+    def test_import_upserts(self, admin_user, feed, brand, product_factory):
+        product = product_factory(slug="product-0", name="Old Name")
+        import_catalog(feed)
+        write_ndjson(
+            feed,
+            [
+                {
+                    "slug": "product-0",
+                    "name": "New Name",
+                    "brand": brand.slug,
+                    "product_lines": [{"sku": "SKU-0", "price": "5", "attributes": {}}],
+                }
+            ],
+        )
+        import_catalog(feed)
+
+        product.refresh_from_db()
+        assert product.name == "New Name"
+        assert Product.objects.filter(slug="product-0").count() == 1
+        line = ProductLine.objects.get(sku="SKU-0")
+        assert line.product == product
+        assert str(line.price) == "5.00"
+        assert not line.productattribute_set.exists()
+
+    def test_import_rejects(self, admin_user, tmp_path, brand):
+        feed = write_ndjson(
+            tmp_path / "feed.ndjson",
+            [
+                {"slug": "unknown-brand", "name": "Product", "brand": "unknown"},
+                {"slug": "no-name", "brand": brand.slug},
+                {
+                    "slug": "bad-line",
+                    "name": "Product",
+                    "brand": brand.slug,
+                    "product_lines": [
+                        {"sku": "NEGATIVE", "price": "-1"},
+                        {"sku": "VALID", "price": "1"},
+                    ],
+                },
+            ],
+        )
+        with feed.open("a") as file:
+            file.write("{not json\n")
+        rejects = tmp_path / "rejects.ndjson"
+        import_catalog(feed, rejects=rejects)
+
+        assert list(Product.objects.values_list("slug", flat=True)) == ["bad-line"]
+        assert list(ProductLine.objects.values_list("sku", flat=True)) == ["VALID"]
+        errors = [json.loads(line) for line in rejects.read_text().splitlines()]
+        assert [error["line"] for error in errors] == [1, 2, 3, 4]
+
+    def test_import_csv(self, admin_user, tmp_path, brand, attribute):
+        feed = tmp_path / "feed.csv"
+        feed.write_text(
+            "slug,name,brand,is_active,sku,price,stock_quantity,line_is_active,"
+            "attributes\n"
+            f"shirt,Shirt,{brand.slug},True,SHIRT-S,10.00,2,True,{attribute.slug}=S\n"
+            f"shirt,Shirt,{brand.slug},True,SHIRT-M,10.00,0,False,{attribute.slug}=M\n"
+        )
+        import_catalog(feed)
+
+        product = Product.objects.get(slug="shirt")
+        assert product.is_active
+        lines = {line.sku: line for line in product.product_lines.all()}
+        assert set(lines) == {"SHIRT-S", "SHIRT-M"}
+        assert not lines["SHIRT-M"].is_active
+
+    def test_import_when_unknown_format(self, admin_user, tmp_path):
+        feed = tmp_path / "feed.txt"
+        feed.write_text("")
+        with pytest.raises(CommandError):
+            import_catalog(feed)
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+# The views run in the thread of the ASGI handler, with a connection of its own.
+pytestmark = [pytest.mark.django_db(transaction=True)]
+
+
+@pytest.fixture
+def load_test(tmp_path, settings):
+    """
+    Run a short load test against a tiny catalog, and return its JSON report.
+    """
+    settings.ALLOWED_HOSTS = ["localhost"]
+    call_command("populate_db", 4, 2, 2, 4, 10, bulk=True, stdout=io.StringIO())
+
+    def load_test(**options):
+        output = tmp_path / "report.json"
+        stderr = io.StringIO()
+        call_command(
+            "load_test",
+            duration=1,
+            warmup=0,
+            output=str(output),
+            stdout=io.StringIO(),
+            stderr=stderr,
+            **options,
+        )
+        assert not stderr.getvalue()
+        return json.loads(output.read_text())
+
+    return load_test
+
+
+class TestLoadTest:
+    def test_load_test(self, load_test):
+        report = load_test(users=10)
+
+        assert report["users"] == 10
+        assert report["logins"]["requests"] == 8
+        assert report["logins"]["error_rate"] == 0
+        scenarios = {result["name"].split()[0] for result in report["results"]}
+        assert scenarios == {"browse", "read", "seller", "reserve", "total"}
+        total = report["results"][-1]
+        assert total["name"] == "total"
+        assert total["requests"] > 0
+        assert total["error_rate"] == 0
+        assert total["p50_ms"] <= total["p90_ms"] <= total["p99_ms"] <= total["max_ms"]
+
+    def test_load_test_when_mix(self, load_test):
+        report = load_test(users=2, mix=["read"])
+
+        assert report["mix"] == {"read": 1.0}
+        names = {result["name"] for result in report["results"]}
+        assert {name.split()[0] for name in names} == {"read", "total"}
+
+    def test_load_test_when_unknown_scenario(self, load_test):
+        with pytest.raises(CommandError, match="Unknown scenario 'checkout'"):
+            load_test(mix=["read=1", "checkout=1"])
+
+    def test_load_test_when_wrong_password(self, load_test):
+        with pytest.raises(AssertionError):
+            load_test(users=1, mix=["read"], password="wrong")
@@ -0,0 +1,98 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count, Max, Min, Q, Sum
+
+from ecommerce.products.models import (
+    Brand,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductFacet,
+    ProductImage,
+    ProductLine,
+)
+from ecommerce.users.models import User
+
+pytestmark = [pytest.mark.django_db]
+
+
+def populate(**options):
+    call_command("populate_db", 3, 2, 2, 4, 10, stdout=io.StringIO(), **options)
+
+
+class TestPopulateDbBulk:
+    def test_counts(self):
+        populate(bulk=True, batch_size=4)
+
+        assert User.objects.count() == 3 + 2
+        assert Brand.objects.count() == 4
+        assert Category.objects.count() == 1 + 2 + 4
+        assert Product.objects.count() == 10
+        assert ProductLine.objects.count() == 20
+        assert ProductImage.objects.count() == 20
+        assert ProductAttribute.objects.count() == 40
+
+    def test_rebuilt_columns(self):
+        populate(bulk=True, batch_size=4)
+
+        active = Q(product_lines__is_active=True)
+        products = Product.objects.annotate(
+            expected_min_price=Min("product_lines__price", filter=active),
+            expected_max_price=Max("product_lines__price", filter=active),
+            expected_total_stock=Sum("product_lines__stock_quantity", filter=active),
+            expected_line_count=Count("product_lines", filter=active),
+        )
+        for product in products:
+            assert product.min_price == product.expected_min_price
+            assert product.max_price == product.expected_max_price
+            assert product.total_stock == product.expected_total_stock
+            assert product.active_line_count == product.expected_line_count
+        assert Product.objects.filter(search_vector="product").count() == 10
+        assert sum(ProductFacet.objects.values_list("line_count", flat=True)) == 40
+
+    def test_triggers_enabled_after(self):
+        populate(bulk=True, batch_size=4)
+        line = ProductLine.objects.first()
+        line.stock_quantity += 1000
+        line.save()
+
+        assert Product.objects.get(pk=line.product_id).total_stock > 1000
+
+    def test_scale(self):
+        populate(bulk=True, scale=2)
+
+        assert User.objects.count() == 6 + 2
+        assert Brand.objects.count() == 8
+        assert Product.objects.count() == 20
+
+    def test_category_tree(self):
+        populate(bulk=True)
+
+        categories = list(Category.objects.order_by("lft"))
+        bounds = sorted(b for c in categories for b in (c.lft, c.rgt))
+        assert bounds == list(range(1, 2 * len(categories) + 1))
+        for category in categories[1:]:
+            assert category.get_parent().slug == category.slug.rsplit("_", 1)[0]
+        root = Category.get_root_nodes().get()
+        assert root.get_descendant_count() == 6
+        assert [c.slug for c in root.get_children()] == [
+            "category_1_1",
+            "category_1_2",
+        ]
+        assert not Product.objects.filter(category=root).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_seed(self):
+        populate(bulk=True, seed=42)
+        first = list(Product.objects.order_by("slug").values_list("id", "brand_id"))
+        populate(bulk=True, seed=42)
+        second = list(Product.objects.order_by("slug").values_list("id", "brand_id"))
+
+        assert first == second
+
+    def test_login(self, api_client):
+        populate(bulk=True)
+
+        assert api_client.login(username="user0", password="password")
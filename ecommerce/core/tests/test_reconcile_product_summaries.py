@@ -0,0 +1,77 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from ecommerce.products.models import Product
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def drifted_product(product_factory):
+    """
+    A product whose summary was written with the triggers disabled, as restores
+    and replicas do.
+    """
+    product, _ = product_factory.create_batch(2)
+    with connection.cursor() as cursor:
+        cursor.execute("SET session_replication_role = replica")
+        Product.objects.filter(pk=product.pk).update(total_stock=0, min_price=None)
+        cursor.execute("SET session_replication_role = DEFAULT")
+    return product
+
+
+class TestReconcileProductSummaries:
+    def test_reconcile(
+        self, drifted_product, purger, django_capture_on_commit_callbacks
+    ):
+        updated_at = drifted_product.updated_at
+        stdout = io.StringIO()
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command("reconcile_product_summaries", stdout=stdout)
+
+        assert stdout.getvalue().strip() == "Repaired 1 product summaries."
+        drifted_product.refresh_from_db()
+        lines = drifted_product.product_lines.filter(is_active=True)
+        assert drifted_product.total_stock == sum(line.stock_quantity for line in lines)
+        assert drifted_product.min_price == min(line.price for line in lines)
+        assert drifted_product.updated_at > updated_at
+        assert f"product:{drifted_product.id}" in purger.keys
+
+    def test_reconcile_in_batches(self, product_factory):
+        products = product_factory.create_batch(3)
+        with connection.cursor() as cursor:
+            cursor.execute("SET session_replication_role = replica")
+            Product.objects.update(active_line_count=0)
+            cursor.execute("SET session_replication_role = DEFAULT")
+        stdout = io.StringIO()
+        call_command("reconcile_product_summaries", batch_size=2, stdout=stdout)
+
+        assert stdout.getvalue().strip() == "Repaired 3 product summaries."
+        for product in products:
+            product.refresh_from_db()
+            assert product.active_line_count == (
+                product.product_lines.filter(is_active=True).count()
+            )
+
+    def test_reconcile_when_dry_run(self, drifted_product):
+        stdout = io.StringIO()
+        call_command(
+            "reconcile_product_summaries", dry_run=True, verbosity=2, stdout=stdout
+        )
+
+        assert stdout.getvalue().splitlines() == [
+            f"Drifted: {drifted_product.slug}",
+            "1 product summaries drifted.",
+        ]
+        drifted_product.refresh_from_db()
+        assert drifted_product.total_stock == 0
+
+    def test_reconcile_when_in_sync(self, product_factory):
+        product_factory.create_batch(2)
+        stdout = io.StringIO()
+        call_command("reconcile_product_summaries", stdout=stdout)
+
+        assert stdout.getvalue().strip() == "Repaired 0 product summaries."
@@ -2,10 +2,12 @@ from typing import Any
 
 from django.contrib import admin
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from treebeard.admin import TreeAdmin
 from treebeard.forms import movenodeform_factory
 
+from ecommerce.products.api.filters import get_search_query
 from ecommerce.products.models import (
     Attribute,
     Brand,
@@ -16,12 +18,38 @@ from ecommerce.products.models import (
     ProductLine,
 )
 from ecommerce.utils.admin import CustomAdminFileWidget
+from ecommerce.utils.cache import invalidate_model_cache
+from ecommerce.utils.cdn import purge_queryset
 
 admin.site.site_header = "Ecommerce Admin"
 
 
+class ActivationActionsMixin:
+    """
+    Admin actions marking the selected objects as active or inactive.
+    """
+
+    @admin.display(description="Mark selected as active")
+    def make_active(self, request: Any, queryset: Any):
+        self._bulk_update_and_purge(queryset, is_active=True, updated_by=request.user)
+
+    @admin.display(description="Mark selected as inactive")
+    def make_inactive(self, request: Any, queryset: Any):
+        self._bulk_update_and_purge(queryset, is_active=False, updated_by=request.user)
+
+    def _bulk_update_and_purge(self, queryset: Any, **fields: Any):
+        """
+        Update the selected objects in one query, purging their responses from
+        the CDN and invalidating the cached payloads of their model.
+        """
+        # Read before the update, which may take the rows out of the selection.
+        purge_queryset(queryset)
+        queryset.update(**fields, updated_at=timezone.now())
+        invalidate_model_cache(queryset.model)
+
+
 @admin.register(Category)
-class CategoryTreeAdmin(TreeAdmin):
+class CategoryTreeAdmin(ActivationActionsMixin, TreeAdmin):
     readonly_fields = (
         "created_by",
         "updated_by",
@@ -41,14 +69,6 @@ class CategoryTreeAdmin(TreeAdmin):
             return fields + ["slug"]
         return self.readonly_fields
 
-    @admin.display(description="Mark selected as active")
-    def make_active(self, request: Any, queryset: Any):
-        queryset.update(is_active=True, updated_by=request.user)
-
-    @admin.display(description="Mark selected as inactive")
-    def make_inactive(self, request: Any, queryset: Any):
-        queryset.update(is_active=False, updated_by=request.user)
-
     def save_form(self, request, form, change):
         if not change:
             form.instance.created_by = request.user
@@ -57,7 +77,7 @@ class CategoryTreeAdmin(TreeAdmin):
 
 
 @admin.register(Brand)
-class BrandAdmin(admin.ModelAdmin):
+class BrandAdmin(ActivationActionsMixin, admin.ModelAdmin):
     readonly_fields = (
         "created_by",
         "created_at",
@@ -87,14 +107,6 @@ class BrandAdmin(admin.ModelAdmin):
             return fields + ["slug"]
         return self.readonly_fields
 
-    @admin.display(description="Mark selected as active")
-    def make_active(self, request: Any, queryset: Any):
-        queryset.update(is_active=True, updated_by=request.user)
-
-    @admin.display(description="Mark selected as inactive")
-    def make_inactive(self, request: Any, queryset: Any):
-        queryset.update(is_active=False, updated_by=request.user)
-
     def save_form(self, request, form, change):
         if not change:
             form.instance.created_by = request.user
@@ -103,7 +115,7 @@ class BrandAdmin(admin.ModelAdmin):
 
 
 @admin.register(Attribute)
-class AttributeAdmin(admin.ModelAdmin):
+class AttributeAdmin(ActivationActionsMixin, admin.ModelAdmin):
     readonly_fields = (
         "created_by",
         "created_at",
@@ -142,14 +154,6 @@ class AttributeAdmin(admin.ModelAdmin):
             return fields + ["slug"]
         return self.readonly_fields
 
-    @admin.display(description="Mark selected as active")
-    def make_active(self, request: Any, queryset: Any):
-        queryset.update(is_active=True, updated_by=request.user)
-
-    @admin.display(description="Mark selected as inactive")
-    def make_inactive(self, request: Any, queryset: Any):
-        queryset.update(is_active=False, updated_by=request.user)
-
     def save_form(self, request, form, change):
         if not change:
             form.instance.created_by = request.user
@@ -165,6 +169,9 @@ class ProductImageInline(admin.TabularInline):
     formfield_overrides = {models.ImageField: {"widget": CustomAdminFileWidget}}
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("created_by", "updated_by")
+
 
 class ProductAttributeInline(admin.TabularInline):
     verbose_name = "Attribute"
@@ -173,9 +180,12 @@ class ProductAttributeInline(admin.TabularInline):
     readonly_fields = ("created_by", "updated_by")
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("created_by", "updated_by")
+
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ActivationActionsMixin, admin.ModelAdmin):
     actions = ["make_active", "make_inactive"]
     readonly_fields = (
         "created_by",
@@ -231,20 +241,23 @@ class ProductAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match the products by id, name or slug, or by their search vector.
+        """
+        results, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        if search_term:
+            results |= queryset.filter(search_vector=get_search_query(search_term))
+        return results, may_have_duplicates
+
     def get_readonly_fields(self, request: Any, obj: Any = None):
         if obj:
             fields = list(self.readonly_fields) if self.readonly_fields else []
             return fields + ["slug"]
         return self.readonly_fields
 
-    @admin.display(description="Mark selected as active")
-    def make_active(self, request: Any, queryset: Any):
-        queryset.update(is_active=True, updated_by=request.user)
-
-    @admin.display(description="Mark selected as inactive")
-    def make_inactive(self, request: Any, queryset: Any):
-        queryset.update(is_active=False, updated_by=request.user)
-
     def save_form(self, request, form, change):
         if not change:
             form.instance.created_by = request.user
@@ -253,7 +266,7 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProductLine)
-class ProductLineAdmin(admin.ModelAdmin):
+class ProductLineAdmin(ActivationActionsMixin, admin.ModelAdmin):
     actions = ["make_active", "make_inactive"]
     readonly_fields = (
         "created_by",
@@ -301,14 +314,6 @@ class ProductLineAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False
 
-    @admin.display(description="Mark selected as active")
-    def make_active(self, request, queryset):
-        queryset.update(is_active=True, updated_by=request.user)
-
-    @admin.display(description="Mark selected as inactive")
-    def make_inactive(self, request, queryset):
-        queryset.update(is_active=False, updated_by=request.user)
-
     def save_form(self, request, form, change):
         if not change:
             form.instance.created_by = request.user
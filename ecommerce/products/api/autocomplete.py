@@ -0,0 +1,248 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from collections.abc import Iterable
+from itertools import chain
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q
+from django.db.models.functions import Length
+
+from ecommerce.products.models import Brand, Category, Product
+from ecommerce.utils.cache import get_versions
+
+logger = logging.getLogger(__name__)
+
+# Most suggestions returned for a query.
+MAX_SUGGESTIONS = 20
+# Prefixes up to this length have their suggestions precomputed, the longer ones
+# match few enough keys to be ranked on the fly.
+SHORT_PREFIX_LENGTH = 3
+# Words of a name a query can start from.
+MAX_KEY_WORDS = 8
+# Most keys a longer prefix ranks its suggestions from.
+MAX_SCANNED_KEYS = 2000
+# Shortest query the products left out of the index are searched for, shorter
+# ones matching too many names to be worth a query.
+MIN_SEARCHED_LENGTH = 3
+
+
+def normalize(text: str) -> str:
+    """
+    Fold the case and accents of a text and collapse its whitespace.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.casefold().split())
+
+
+def load_suggestions(model) -> list[tuple]:
+    """
+    Return the suggestions of a catalog model kept in the index, as
+    ``(type, name, slug, weight)`` rows.
+
+    Brands and categories weigh the number of their active products, so they come
+    before the products, which all weigh one. Only the
+    ``AUTOCOMPLETE_INDEXED_PRODUCTS`` products with the most stock are kept, the
+    others are searched in the database.
+    """
+    if model is Product:
+        products = Product.objects.filter(is_active=True).order_by("-total_stock", "id")
+        products = products[: settings.AUTOCOMPLETE_INDEXED_PRODUCTS]
+        return [
+            ("product", name, slug, 1)
+            for name, slug in products.values_list("name", "slug")
+        ]
+
+    queryset = model.objects.filter(is_active=True).annotate(
+        weight=Count("product", filter=Q(product__is_active=True))
+    )
+    return [
+        (model._meta.model_name, name, slug, weight)
+        for name, slug, weight in queryset.values_list("name", "slug", "weight")
+    ]
+
+
+def search_products(query: str, limit: int, exclude: Iterable[str] = ()) -> list[tuple]:
+    """
+    Return the active products whose name starts with ``query``, shortest names
+    first, as ``(type, name, slug, weight)`` rows.
+
+    The names are matched through their ``text_pattern_ops`` index, on their
+    start only, not on the start of their other words. The case is folded, the
+    accents are not.
+    """
+    query = " ".join(query.split())
+    if not query:
+        return []
+    products = (
+        Product.objects.filter(is_active=True, name__istartswith=query)
+        .exclude(slug__in=list(exclude))
+        .order_by(Length("name"), "name")
+    )
+    return [
+        ("product", name, slug, 1)
+        for name, slug in products.values_list("name", "slug")[:limit]
+    ]
+
+
+class PrefixIndex:
+    """
+    Suggestions matching the start of any word of their name, best ranked first.
+
+    The entries are sorted by rank, so their position doubles as their rank, and
+    every word suffix of their normalized name is kept in a sorted list, paired
+    with the entry position. A query is a binary search for the range of keys it
+    prefixes, which is a flattened trie, plus a lookup of the precomputed top
+    entries for short prefixes.
+
+    A long prefix matching many keys only ranks the first ``MAX_SCANNED_KEYS`` of
+    them, in lexical order, along with the top entries of its short prefix that
+    it matches, so that the best ranked ones are still found.
+    """
+
+    def __init__(self, snapshot: Iterable[tuple]):
+        self.entries = sorted(
+            snapshot, key=lambda entry: (-entry[3], len(entry[1]), entry[1])
+        )
+        keys = []
+        top = {}
+        self.names = []
+        for position, (_, name, _, _) in enumerate(self.entries):
+            words = normalize(name).split()[:MAX_KEY_WORDS]
+            self.names.append(" " + " ".join(words))
+            for index in range(len(words)):
+                key = " ".join(words[index:])
+                keys.append((key, position))
+                # Entries come best ranked first, so the first ones reaching a
+                # short prefix are its top suggestions.
+                for length in range(1, min(len(key), SHORT_PREFIX_LENGTH) + 1):
+                    suggestions = top.setdefault(key[:length], [])
+                    if len(suggestions) < MAX_SUGGESTIONS and (
+                        not suggestions or suggestions[-1] != position
+                    ):
+                        suggestions.append(position)
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.positions = [position for _, position in keys]
+        self.top = top
+
+    def search(self, query: str, limit: int = 10) -> list[tuple]:
+        """
+        Return the best ranked entries having a word starting with ``query``.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) <= SHORT_PREFIX_LENGTH:
+            positions = self.top.get(prefix, [])
+        else:
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo=start)
+            positions = set(self.positions[start : min(end, start + MAX_SCANNED_KEYS)])
+            if end - start > MAX_SCANNED_KEYS:
+                positions.update(
+                    position
+                    for position in self.top.get(prefix[:SHORT_PREFIX_LENGTH], [])
+                    if f" {prefix}" in self.names[position]
+                )
+            positions = heapq.nsmallest(limit, positions)
+        return [self.entries[position] for position in positions[:limit]]
+
+
+class Autocomplete:
+    """
+    Hold the process-local prefix index of the brands, the categories and the
+    products with the most stock. The other products are searched in the
+    database, for the queries the index has too few suggestions for.
+
+    The index is rebuilt when the cache version of products, brands or categories
+    changes, from the rows of the changed models only. Brands and categories are
+    reloaded with the products, whose number they weigh.
+
+    Only the first index of a process is built by a request. The next ones are
+    rebuilt by a thread, ``AUTOCOMPLETE_REBUILD_DELAY`` seconds after a change is
+    seen so that a burst of writes rebuilds it once, while the requests keep
+    serving the previous index.
+    """
+
+    models = [Product, Brand, Category]
+
+    def __init__(self):
+        self.index = None
+        self.versions = None
+        self.suggestions = {}
+        self.lock = threading.Lock()
+        # Held from the scheduling of a rebuild until it is done.
+        self.rebuilding = threading.Lock()
+
+    def get_index(self) -> PrefixIndex:
+        versions = get_versions(self.models)
+        if versions == self.versions:
+            return self.index
+        delay = settings.AUTOCOMPLETE_REBUILD_DELAY
+        if self.index is not None and delay is not None:
+            if self.rebuilding.acquire(blocking=False):
+                threading.Thread(
+                    target=self.rebuild_later,
+                    args=(delay,),
+                    name="autocomplete-rebuild",
+                    daemon=True,
+                ).start()
+            return self.index
+        if not self.lock.acquire(blocking=self.index is None):
+            return self.index
+        try:
+            if versions != self.versions:
+                self.rebuild(versions)
+        finally:
+            self.lock.release()
+        return self.index
+
+    def rebuild(self, versions: list[int]):
+        previous = self.versions or [None] * len(self.models)
+        changed = {
+            model
+            for model, version, previous_version in zip(self.models, versions, previous)
+            if version != previous_version
+        }
+        if Product in changed:
+            changed.update(self.models)
+        for model in changed:
+            self.suggestions[model] = load_suggestions(model)
+        self.index = PrefixIndex(chain.from_iterable(self.suggestions.values()))
+        self.versions = versions
+
+    def rebuild_later(self, delay: float):
+        """
+        Rebuild the index for the versions current after ``delay`` seconds.
+        """
+        try:
+            time.sleep(delay)
+            with self.lock:
+                versions = get_versions(self.models)
+                if versions != self.versions:
+                    self.rebuild(versions)
+        except Exception:
+            # The previous index is kept, the next request retries.
+            logger.exception("Failed to rebuild the autocomplete index.")
+        finally:
+            connections.close_all()
+            self.rebuilding.release()
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        suggestions = self.get_index().search(query, limit)
+        if len(suggestions) < limit and len(normalize(query)) >= MIN_SEARCHED_LENGTH:
+            indexed = [slug for kind, _, slug, _ in suggestions if kind == "product"]
+            suggestions += search_products(query, limit - len(suggestions), indexed)
+        return [
+            {"type": kind, "name": name, "slug": slug}
+            for kind, name, slug, _ in suggestions
+        ]
+
+
+autocomplete = Autocomplete()
@@ -0,0 +1,202 @@
+from collections.abc import Iterator
+from datetime import datetime
+
+from django.db.models import Exists, OuterRef, Q, QuerySet
+
+from ecommerce.products.models import ProductAttribute, ProductImage, ProductLine
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_HEADER = [
+    "product_id",
+    "name",
+    "slug",
+    "description",
+    "brand",
+    "category",
+    "is_active",
+    "updated_at",
+    "sku",
+    "price",
+    "stock_quantity",
+    "line_is_active",
+    "attributes",
+    "images",
+]
+
+
+def get_export_queryset(
+    queryset: QuerySet, updated_since: datetime | None = None
+) -> QuerySet:
+    """
+    Restrict the products to export.
+
+    A full export holds the active products. An incremental export holds every
+    product changed since ``updated_since``, through itself or one of its lines,
+    images or attributes, inactive ones included so they can be removed.
+    """
+    if updated_since is None:
+        return queryset.filter(is_active=True)
+
+    product = OuterRef("pk")
+    return queryset.filter(
+        Q(updated_at__gte=updated_since)
+        | Exists(
+            ProductLine.objects.filter(product=product, updated_at__gte=updated_since)
+        )
+        | Exists(
+            ProductImage.objects.filter(product=product, updated_at__gte=updated_since)
+        )
+        | Exists(
+            ProductAttribute.objects.filter(
+                product_line__product=product, updated_at__gte=updated_since
+            )
+        )
+    )
+
+
+def _groups(rows: Iterator[dict], key: str) -> Iterator[tuple]:
+    """
+    Group consecutive rows sharing the same ``key``, yielding ``(key, rows)``.
+    """
+    group_key, group = None, []
+    for row in rows:
+        if group and row[key] != group_key:
+            yield group_key, group
+            group = []
+        group_key = row[key]
+        group.append(row)
+    if group:
+        yield group_key, group
+
+
+class _Merge:
+    """
+    Walk a stream of rows grouped by product id, in step with the products.
+
+    The streams are read by separate cursors, which may not see the same
+    products, e.g. one deactivated between two of them. The groups of the
+    products the walk went past are then skipped.
+    """
+
+    def __init__(self, rows: Iterator[dict], key: str):
+        self.groups = _groups(rows, key)
+        self.current = next(self.groups, None)
+
+    def pop(self, product_id) -> list[dict]:
+        while self.current is not None and self.current[0] < product_id:
+            self.current = next(self.groups, None)
+        if self.current is None or self.current[0] != product_id:
+            return []
+        rows = self.current[1]
+        self.current = next(self.groups, None)
+        return rows
+
+
+def iter_catalog(
+    queryset: QuerySet, build_url, active_only: bool = True
+) -> Iterator[dict]:
+    """
+    Yield the products of ``queryset`` with their lines, images and attributes.
+
+    Products and each of their relations are read by one server-side cursor each,
+    as flat ``values()`` rows ordered by product id, and merged on the fly, so
+    memory stays constant whatever the size of the catalog.
+    """
+    products = queryset.order_by("id")
+    product_ids = products.values("id")
+
+    lines = ProductLine.objects.filter(product__in=product_ids)
+    attributes = ProductAttribute.objects.filter(product_line__product__in=product_ids)
+    images = ProductImage.objects.filter(product__in=product_ids)
+    if active_only:
+        lines = lines.filter(is_active=True)
+        attributes = attributes.filter(product_line__is_active=True)
+
+    products = products.values(
+        "id",
+        "name",
+        "slug",
+        "description",
+        "brand__slug",
+        "category__slug",
+        "is_active",
+        "created_at",
+        "updated_at",
+    )
+    lines = lines.order_by("product_id", "id").values(
+        "id", "product_id", "sku", "price", "stock_quantity", "is_active"
+    )
+    attributes = attributes.order_by("product_line__product_id", "product_line_id")
+    attributes = attributes.values(
+        "product_line__product_id", "product_line_id", "attribute__slug", "value"
+    )
+    images = images.order_by("product_id", "id").values(
+        "product_id", "image", "alt_text"
+    )
+
+    lines = _Merge(lines.iterator(EXPORT_CHUNK_SIZE), "product_id")
+    attributes = _Merge(
+        attributes.iterator(EXPORT_CHUNK_SIZE), "product_line__product_id"
+    )
+    images = _Merge(images.iterator(EXPORT_CHUNK_SIZE), "product_id")
+
+    for product in products.iterator(EXPORT_CHUNK_SIZE):
+        line_attributes = {}
+        for attribute in attributes.pop(product["id"]):
+            values = line_attributes.setdefault(attribute["product_line_id"], {})
+            values[attribute["attribute__slug"]] = attribute["value"]
+
+        yield {
+            "id": product["id"],
+            "name": product["name"],
+            "slug": product["slug"],
+            "description": product["description"],
+            "brand": product["brand__slug"],
+            "category": product["category__slug"],
+            "is_active": product["is_active"],
+            "created_at": product["created_at"],
+            "updated_at": product["updated_at"],
+            "product_lines": [
+                {
+                    "sku": line["sku"],
+                    "price": str(line["price"]),
+                    "stock_quantity": line["stock_quantity"],
+                    "is_active": line["is_active"],
+                    "attributes": line_attributes.get(line["id"], {}),
+                }
+                for line in lines.pop(product["id"])
+            ],
+            "images": [
+                {"image": build_url(image["image"]), "alt_text": image["alt_text"]}
+                for image in images.pop(product["id"])
+            ],
+        }
+
+
+def iter_catalog_rows(products: Iterator[dict]) -> Iterator[dict]:
+    """
+    Flatten exported products into CSV rows, one per product line.
+    """
+    for product in products:
+        row = {
+            "product_id": product["id"],
+            "name": product["name"],
+            "slug": product["slug"],
+            "description": product["description"],
+            "brand": product["brand"],
+            "category": product["category"],
+            "is_active": product["is_active"],
+            "updated_at": product["updated_at"].isoformat(),
+            "images": "|".join(image["image"] for image in product["images"]),
+        }
+        for line in product["product_lines"] or [{}]:
+            attributes = line.get("attributes", {})
+            yield {
+                **row,
+                "sku": line.get("sku"),
+                "price": line.get("price"),
+                "stock_quantity": line.get("stock_quantity"),
+                "line_is_active": line.get("is_active"),
+                "attributes": ";".join(f"{k}={v}" for k, v in attributes.items()),
+            }
@@ -0,0 +1,269 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Count, Exists, F, FloatField, OuterRef
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
+
+from ecommerce.products.models import Category, ProductFacet, get_price_key
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+# Text search configuration the product search vectors are built with.
+SEARCH_CONFIG = "english"
+
+
+def get_search_query(text: str) -> SearchQuery:
+    """
+    Parse a search, with the syntax of web search engines, for the products.
+    """
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+
+
+class CategoryFilterBackend(BaseFilterBackend):
+    """
+    Filter products by the slug of their category.
+
+    With ``descendants=true`` the products of the whole subtree are returned. The
+    category bounds are resolved once and the products are matched with a range
+    over the nested set, served by the ``(tree_id, lft)`` index of the categories.
+    """
+
+    category_query_param = "category"
+    descendants_query_param = "descendants"
+
+    def filter_queryset(self, request, queryset, view):
+        slug = request.query_params.get(self.category_query_param)
+        if not slug:
+            return queryset
+
+        descendants = request.query_params.get(self.descendants_query_param, "")
+        if descendants.lower() not in TRUE_VALUES:
+            return queryset.filter(category__slug=slug)
+
+        bounds = Category.objects.filter(slug=slug).values("tree_id", "lft", "rgt")
+        bounds = bounds.first()
+        if bounds is None:
+            return queryset.none()
+        return queryset.filter(
+            category__tree_id=bounds["tree_id"],
+            category__lft__gte=bounds["lft"],
+            category__lft__lt=bounds["rgt"],
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.category_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Slug of the category of the products.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.descendants_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include the products of the category descendants.",
+                "schema": {"type": "boolean"},
+            },
+        ]
+
+
+class ProductSearchFilterBackend(BaseFilterBackend):
+    """
+    Full-text search of the products, ranked by relevance.
+
+    Matches are found through the GIN index of ``Product.search_vector`` and
+    ranked with the weights of its fields, name first, then brand and category,
+    then description. The pagination keyset becomes ``(rank, id)``.
+    """
+
+    search_query_param = "q"
+
+    def get_search_text(self, request):
+        return request.query_params.get(self.search_query_param, "").strip()
+
+    def filter_queryset(self, request, queryset, view):
+        text = self.get_search_text(request)
+        if not text:
+            return queryset
+
+        query = get_search_query(text)
+        # The rank is a real, cast so it round-trips exactly through the cursor.
+        rank = Cast(SearchRank(F("search_vector"), query), FloatField())
+        return queryset.filter(search_vector=query).annotate(rank=rank)
+
+    def get_ordering(self, request, queryset, view):
+        if not self.get_search_text(request):
+            return None
+        return ["-rank", "-id"]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Search the products, by relevance.",
+                "schema": {"type": "string"},
+            },
+        ]
+
+
+class ProductSummaryFilterBackend(BaseFilterBackend):
+    """
+    Filter products by stock and order them by price, on the summary columns of
+    the products kept by database triggers, so the lines are never aggregated.
+
+    ``in_stock=true`` is served by the partial index of the products in stock, and
+    the price orderings by the ``(price, id)`` indexes, the pagination keyset.
+    Products without an active line have no price and come last, their price
+    coalesced to a key beyond every price in the direction of the ordering.
+    """
+
+    in_stock_query_param = "in_stock"
+    ordering_query_param = "ordering"
+    ordering_fields = ["min_price", "max_price"]
+
+    def get_ordering_field(self, request):
+        ordering = request.query_params.get(self.ordering_query_param, "").strip()
+        if ordering.lstrip("-") in self.ordering_fields:
+            return ordering
+        return None
+
+    def filter_queryset(self, request, queryset, view):
+        in_stock = request.query_params.get(self.in_stock_query_param)
+        if in_stock is not None:
+            if in_stock.lower() in TRUE_VALUES:
+                queryset = queryset.filter(total_stock__gt=0)
+            else:
+                queryset = queryset.filter(total_stock=0)
+
+        ordering = self.get_ordering_field(request)
+        if ordering is not None:
+            field = ordering.lstrip("-")
+            key = get_price_key(field, descending=ordering.startswith("-"))
+            queryset = queryset.annotate(**{f"{field}_key": key})
+        return queryset
+
+    def get_ordering(self, request, queryset, view):
+        ordering = self.get_ordering_field(request)
+        if ordering is None:
+            return None
+        if ordering.startswith("-"):
+            return [f"{ordering}_key", "-id"]
+        return [f"{ordering}_key", "id"]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.in_stock_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Only the products in stock, or out of stock.",
+                "schema": {"type": "boolean"},
+            },
+            {
+                "name": self.ordering_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Order the products by price, descending with a -.",
+                "schema": {
+                    "type": "string",
+                    "enum": [
+                        f"{prefix}{field}"
+                        for field in self.ordering_fields
+                        for prefix in ["", "-"]
+                    ],
+                },
+            },
+        ]
+
+
+class AttributeFilterBackend(BaseFilterBackend):
+    """
+    Filter products by the attribute values of their active lines.
+
+    Every ``attr.<slug>`` parameter is a comma separated list of values, of which
+    a product must have one, for every attribute given. Products are matched, and
+    counted by value for the facets, on the ``ProductFacet`` rows kept by database
+    triggers, so the attributes of the product lines are never scanned.
+    """
+
+    attribute_query_prefix = "attr."
+
+    def get_attribute_filters(self, request) -> dict[str, list[str]]:
+        filters = {}
+        for key in request.query_params:
+            if not key.startswith(self.attribute_query_prefix):
+                continue
+            slug = key[len(self.attribute_query_prefix) :]
+            values = [
+                value.strip()
+                for param in request.query_params.getlist(key)
+                for value in param.split(",")
+            ]
+            values = [value for value in values if value]
+            if slug and values:
+                filters[slug] = values
+        return filters
+
+    def filter_attributes(self, queryset, filters: dict[str, list[str]]):
+        for slug, values in filters.items():
+            queryset = queryset.filter(
+                Exists(
+                    ProductFacet.objects.filter(
+                        product=OuterRef("pk"), attribute__slug=slug, value__in=values
+                    )
+                )
+            )
+        return queryset
+
+    def filter_queryset(self, request, queryset, view):
+        return self.filter_attributes(queryset, self.get_attribute_filters(request))
+
+    def get_facets(self, request, queryset, view) -> dict[str, list[dict]]:
+        """
+        Count the products of ``queryset`` having each value of the active
+        attributes, with the attribute filters of the request applied.
+
+        The counts of a filtered attribute ignore its own filter, so they hold
+        the alternatives to the values selected, at the cost of one query for
+        each filtered attribute.
+        """
+        filters = self.get_attribute_filters(request)
+        facets = ProductFacet.objects.filter(attribute__is_active=True)
+        counts = self.count_facets(
+            facets.exclude(attribute__slug__in=filters),
+            self.filter_attributes(queryset, filters),
+        )
+        for slug in filters:
+            others = {key: values for key, values in filters.items() if key != slug}
+            counts += self.count_facets(
+                facets.filter(attribute__slug=slug),
+                self.filter_attributes(queryset, others),
+            )
+
+        data = {}
+        for row in sorted(counts, key=lambda row: (-row["count"], row["value"])):
+            data.setdefault(row["attribute__slug"], []).append(
+                {"value": row["value"], "count": row["count"]}
+            )
+        return dict(sorted(data.items()))
+
+    def count_facets(self, facets, queryset) -> list[dict]:
+        facets = facets.filter(product__in=queryset.order_by().values("pk"))
+        facets = facets.values("attribute__slug", "value").order_by()
+        return list(facets.annotate(count=Count("product")))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": f"{self.attribute_query_prefix}{{slug}}",
+                "required": False,
+                "in": "query",
+                "description": (
+                    "Comma separated values of the attribute with this slug, "
+                    "of which the products must have one."
+                ),
+                "schema": {"type": "string"},
+            },
+        ]
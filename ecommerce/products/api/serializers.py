@@ -1,3 +1,7 @@
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
 from ecommerce.products.models import (
@@ -9,6 +13,8 @@ from ecommerce.products.models import (
     ProductImage,
     ProductLine,
 )
+from ecommerce.utils.cache import invalidate_model_cache
+from ecommerce.utils.cdn import purge_instances
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -20,6 +26,38 @@ class CategorySerializer(serializers.ModelSerializer):
         }
 
 
+class CategoryTreeListSerializer(serializers.ListSerializer):
+    """
+    Nest categories, given in ``(tree_id, lft)`` order, under their parents.
+    Inactive categories are dropped along with their whole subtree.
+    """
+
+    def to_representation(self, data):
+        roots = []
+        # Open ancestors of the current node, as (depth, children) pairs. The
+        # children of a dropped category are None, so its subtree is dropped too.
+        stack = []
+        for category in data:
+            while stack and stack[-1][0] >= category.depth:
+                stack.pop()
+
+            siblings = stack[-1][1] if stack else roots
+            if siblings is None or not category.is_active:
+                stack.append((category.depth, None))
+                continue
+
+            node = self.child.to_representation(category)
+            node["children"] = []
+            siblings.append(node)
+            stack.append((category.depth, node["children"]))
+        return roots
+
+
+class CategoryTreeSerializer(CategorySerializer):
+    class Meta(CategorySerializer.Meta):
+        list_serializer_class = CategoryTreeListSerializer
+
+
 class BrandSerializer(serializers.ModelSerializer):
     class Meta:
         model = Brand
@@ -39,12 +77,34 @@ class AttributeSerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
-    category = serializers.CharField(source="category.name")
+    category = serializers.CharField(source="category.name", allow_null=True)
     brand = serializers.CharField(source="brand.name")
 
     class Meta:
         model = Product
-        fields = ["id", "name", "slug", "category", "brand", "url"]
+        fields = [
+            "id",
+            "name",
+            "slug",
+            "category",
+            "brand",
+            "min_price",
+            "max_price",
+            "total_stock",
+            "active_line_count",
+            "url",
+        ]
+        select_related = ["category", "brand"]
+        expandable_fields = {
+            "product_lines": (
+                "ecommerce.products.api.serializers.ProductLineSerializer",
+                {"many": True},
+            ),
+            "images": (
+                "ecommerce.products.api.serializers.ProductImageSerializer",
+                {"many": True},
+            ),
+        }
         extra_kwargs = {
             "url": {"view_name": "api:product-detail", "lookup_field": "slug"}
         }
@@ -54,6 +114,13 @@ class ProductLineSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductLine
         fields = ["id", "price", "sku", "stock_quantity", "url"]
+        expandable_fields = {
+            "product": ("ecommerce.products.api.serializers.ProductSerializer", {}),
+            "product_attributes": (
+                "ecommerce.products.api.serializers.ProductAttributeSerializer",
+                {"source": "productattribute_set", "many": True},
+            ),
+        }
         extra_kwargs = {
             "url": {"view_name": "api:productline-detail", "lookup_field": "sku"}
         }
@@ -86,6 +153,7 @@ class CategoryDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         exclude = ["lft", "rgt", "tree_id", "depth"]
+        select_related = ["created_by", "updated_by"]
 
 
 class BrandDetailSerializer(serializers.ModelSerializer):
@@ -100,6 +168,7 @@ class BrandDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Brand
         fields = "__all__"
+        select_related = ["created_by", "updated_by"]
 
 
 class AttributeDetailSerializer(serializers.ModelSerializer):
@@ -115,6 +184,7 @@ class AttributeDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attribute
         fields = "__all__"
+        select_related = ["created_by", "updated_by"]
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
@@ -128,7 +198,8 @@ class ProductDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["search_vector"]
+        select_related = ["owner", "created_by", "updated_by"]
 
 
 class ProductEditSerializer(serializers.ModelSerializer):
@@ -139,7 +210,7 @@ class ProductEditSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["search_vector"]
         read_only_fields = ["owner", "created_by", "updated_by"]
 
 
@@ -158,6 +229,7 @@ class ProductLineDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductLine
         fields = "__all__"
+        select_related = ["created_by", "updated_by"]
 
 
 class ProductLineEditSerializer(serializers.ModelSerializer):
@@ -195,6 +267,201 @@ class ProductLineEditSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_by", "updated_by"]
 
 
+class ProductLineBulkAttributeSerializer(serializers.Serializer):
+    attribute = serializers.SlugField()
+    value = serializers.CharField(max_length=100)
+
+
+class ProductLineBulkListSerializer(serializers.ListSerializer):
+    """
+    Create or update product lines in bulk, keyed by sku.
+
+    The products, attributes and existing lines referenced by the payload are
+    loaded with one query each before the items are validated, and the lines are
+    written with ``bulk_create``/``bulk_update``, whatever the number of items.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.load_relations([item for item in data if isinstance(item, dict)])
+        return super().to_internal_value(data)
+
+    def load_relations(self, data):
+        product_ids = set()
+        for item in data:
+            try:
+                product_ids.add(uuid.UUID(str(item.get("product"))))
+            except ValueError:
+                continue
+        skus = [str(item.get("sku")) for item in data]
+        slugs = [
+            str(attribute.get("attribute"))
+            for item in data
+            if isinstance(item.get("attributes"), list)
+            for attribute in item["attributes"]
+            if isinstance(attribute, dict)
+        ]
+
+        self.owners = dict(
+            Product.objects.filter(pk__in=product_ids).values_list("pk", "owner_id")
+        )
+        self.lines = {
+            line.sku: line for line in ProductLine.objects.filter(sku__in=skus)
+        }
+        self.attributes = {
+            attribute.slug: attribute
+            for attribute in Attribute.objects.filter(slug__in=slugs)
+        }
+        self.seen_skus = set()
+
+    def create(self, validated_data):
+        user = self.context["request"].user
+        now = timezone.now()
+        lines, new_lines, updated_lines, attributes = [], [], [], {}
+        for item in validated_data:
+            line = item.pop("instance")
+            line_attributes = item.pop("attributes", None)
+            if line is None:
+                line = ProductLine(created_by=user, updated_by=user, **item)
+                new_lines.append(line)
+            else:
+                # The sku and the product of a line never change.
+                for field in ["price", "stock_quantity", "is_active"]:
+                    setattr(line, field, item.get(field, getattr(line, field)))
+                line.updated_by = user
+                line.updated_at = now
+                updated_lines.append(line)
+            if line_attributes is not None:
+                attributes[line] = line_attributes
+            lines.append(line)
+
+        with transaction.atomic():
+            ProductLine.objects.bulk_create(new_lines)
+            ProductLine.objects.bulk_update(
+                updated_lines,
+                ["price", "stock_quantity", "is_active", "updated_by", "updated_at"],
+            )
+            # The attributes given for a line replace the ones it had.
+            ProductAttribute.objects.filter(product_line__in=attributes).delete()
+            ProductAttribute.objects.bulk_create(
+                ProductAttribute(
+                    product_line=line,
+                    attribute=attribute["attribute"],
+                    value=attribute["value"],
+                    created_by=user,
+                    updated_by=user,
+                )
+                for line, line_attributes in attributes.items()
+                for attribute in line_attributes
+            )
+        invalidate_model_cache(ProductLine)
+        invalidate_model_cache(ProductAttribute)
+        purge_instances(lines)
+        return lines
+
+
+class ProductLineBulkSerializer(serializers.ModelSerializer):
+    """
+    ProductLine Bulk Serializer. Used for creating and updating many product lines
+    at once, always with ``many=True``.
+    """
+
+    product = serializers.UUIDField()
+    attributes = ProductLineBulkAttributeSerializer(many=True, required=False)
+
+    def validate_price(self, data):
+        """Check that price is not negative"""
+        if data < 0:
+            raise serializers.ValidationError("Price cannot be negative.")
+        return data
+
+    def validate_product(self, data):
+        """Check that the product exists and is owned by the user"""
+        owner_id = self.parent.owners.get(data)
+        if owner_id is None:
+            raise serializers.ValidationError("Product does not exist.")
+        if owner_id != self.context["request"].user.id:
+            raise serializers.ValidationError("You do not own this product.")
+        return data
+
+    def validate_attributes(self, data):
+        """Check that the attributes exist"""
+        for attribute in data:
+            slug = attribute["attribute"]
+            if slug not in self.parent.attributes:
+                raise serializers.ValidationError(f"Attribute {slug} does not exist.")
+            attribute["attribute"] = self.parent.attributes[slug]
+        return data
+
+    def validate(self, data):
+        """Check that the sku is given once and does not belong to another product"""
+        sku = data["sku"]
+        if sku in self.parent.seen_skus:
+            raise serializers.ValidationError({"sku": "Duplicated sku."})
+        self.parent.seen_skus.add(sku)
+
+        line = self.parent.lines.get(sku)
+        if line is not None and line.product_id != data["product"]:
+            raise serializers.ValidationError(
+                {"sku": "product line with this sku already exists."}
+            )
+        data["product_id"] = data.pop("product")
+        data["instance"] = line
+        return data
+
+    class Meta:
+        model = ProductLine
+        fields = [
+            "sku",
+            "price",
+            "stock_quantity",
+            "is_active",
+            "product",
+            "attributes",
+        ]
+        extra_kwargs = {"sku": {"validators": []}}
+        list_serializer_class = ProductLineBulkListSerializer
+
+
+class StockReservationSerializer(serializers.Serializer):
+    """
+    Stock Reservation Serializer. Used for reserving and releasing stock.
+    """
+
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class StockReservationItemSerializer(StockReservationSerializer):
+    sku = serializers.CharField(max_length=100)
+
+
+class StockReservationBatchSerializer(serializers.Serializer):
+    """
+    Stock Reservation Batch Serializer. Used for reserving and releasing the stock
+    of many product lines at once.
+    """
+
+    items = StockReservationItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, data):
+        """Check that every sku is given once"""
+        skus = [item["sku"] for item in data]
+        if len(skus) != len(set(skus)):
+            raise serializers.ValidationError("Duplicated sku.")
+        return data
+
+
+class StockLevelSerializer(serializers.Serializer):
+    sku = serializers.CharField()
+    stock_quantity = serializers.IntegerField()
+
+
+class SuggestionSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=["brand", "category", "product"])
+    name = serializers.CharField()
+    slug = serializers.SlugField()
+
+
 class ProductImageDetailSerializer(serializers.ModelSerializer):
     """
     ProductImage Detail Serializer. Used for retrieving and updating product images.
@@ -207,6 +474,7 @@ class ProductImageDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductImage
         fields = "__all__"
+        select_related = ["created_by", "updated_by"]
 
 
 class ProductImageEditSerializer(serializers.ModelSerializer):
@@ -1,7 +1,35 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Subquery
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ValidationError
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
-from rest_framework.permissions import IsAdminUser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
+from ecommerce.products.api.autocomplete import MAX_SUGGESTIONS, autocomplete
+from ecommerce.products.api.export import (
+    CSV_HEADER,
+    get_export_queryset,
+    iter_catalog,
+    iter_catalog_rows,
+)
+from ecommerce.products.api.filters import (
+    AttributeFilterBackend,
+    CategoryFilterBackend,
+    ProductSearchFilterBackend,
+    ProductSummaryFilterBackend,
+)
 from ecommerce.products.api.serializers import (
     AttributeDetailSerializer,
     AttributeSerializer,
@@ -9,28 +37,79 @@ from ecommerce.products.api.serializers import (
     BrandSerializer,
     CategoryDetailSerializer,
     CategorySerializer,
+    CategoryTreeSerializer,
     ProductDetailSerializer,
     ProductEditSerializer,
     ProductImageDetailSerializer,
     ProductImageEditSerializer,
     ProductImageSerializer,
+    ProductLineBulkSerializer,
     ProductLineDetailSerializer,
     ProductLineEditSerializer,
     ProductLineSerializer,
     ProductSerializer,
+    StockLevelSerializer,
+    StockReservationBatchSerializer,
+    StockReservationSerializer,
+    SuggestionSerializer,
 )
 from ecommerce.products.models import (
     Attribute,
     Brand,
     Category,
+    InsufficientStock,
     Product,
+    ProductAttribute,
     ProductImage,
     ProductLine,
 )
+from ecommerce.utils.cache import get_cache_key
+from ecommerce.utils.cdn import get_model_key
 from ecommerce.utils.permissions import IsAuthenticatedReadOnly, IsOwner
+from ecommerce.utils.renderers import CSVRenderer, NDJSONRenderer
+from ecommerce.utils.views import (
+    AtomicWritesMixin,
+    CacheResponseMixin,
+    ConditionalGetMixin,
+    ProjectionMixin,
+    QueryPlanMixin,
+    SparseFieldsMixin,
+    SurrogateKeyMixin,
+    is_shareable,
+)
+
+BULK_MAX_ITEMS = 1000
+SPARSE_FIELDS_SCHEMA = extend_schema(
+    parameters=[
+        OpenApiParameter(
+            "fields",
+            str,
+            description="Comma separated dotted paths of the fields to return.",
+        ),
+        OpenApiParameter(
+            "expand",
+            str,
+            description="Comma separated dotted paths of the relations to add.",
+        ),
+    ]
+)
+
 
+class OutOfStock(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Insufficient stock."
+    default_code = "out_of_stock"
 
-class BrandViewSet(ModelViewSet):
+
+class BrandViewSet(
+    AtomicWritesMixin,
+    SurrogateKeyMixin,
+    ConditionalGetMixin,
+    CacheResponseMixin,
+    ProjectionMixin,
+    QueryPlanMixin,
+    ModelViewSet,
+):
     """
     A viewset for viewing and editing brand instances.
     """
@@ -63,7 +142,17 @@ class BrandViewSet(ModelViewSet):
         instance.save()
 
 
-class CategoryViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+class CategoryViewSet(
+    AtomicWritesMixin,
+    SurrogateKeyMixin,
+    ConditionalGetMixin,
+    CacheResponseMixin,
+    ProjectionMixin,
+    QueryPlanMixin,
+    ListModelMixin,
+    RetrieveModelMixin,
+    GenericViewSet,
+):
     """
     A viewset for viewing and editing category instances.
     """
@@ -82,10 +171,71 @@ class CategoryViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     def get_serializer_class(self):
         if self.action == "list":
             return CategorySerializer
+        if self.action == "tree":
+            return CategoryTreeSerializer
         return CategoryDetailSerializer
 
+    def get_tree_queryset(self, root, depth):
+        """
+        Return the categories of the tree, optionally rooted at the ``root`` slug
+        and limited to ``depth`` levels, in a single ``(tree_id, lft)`` ordered
+        query. The root boundaries are resolved by subqueries.
+        """
+        queryset = self.get_queryset().order_by("tree_id", "lft")
+        if root is None:
+            if depth is not None:
+                queryset = queryset.filter(depth__lte=depth)
+            return queryset
+
+        root_queryset = Category.objects.filter(slug=root)
+        queryset = queryset.filter(
+            tree_id=Subquery(root_queryset.values("tree_id")),
+            lft__gte=Subquery(root_queryset.values("lft")),
+            lft__lt=Subquery(root_queryset.values("rgt")),
+        )
+        if depth is not None:
+            queryset = queryset.filter(
+                depth__lt=Subquery(root_queryset.values("depth")) + depth
+            )
+        return queryset
 
-class AttributeViewSet(ModelViewSet):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("root", str, description="Slug of the root category."),
+            OpenApiParameter("depth", int, description="Number of levels to return."),
+        ]
+    )
+    @action(detail=False, pagination_class=None)
+    def tree(self, request):
+        """
+        Return the active categories nested under their parents.
+        """
+        return self.get_cached_response(self.get_tree_response, request)
+
+    def get_tree_response(self, request):
+        root = request.query_params.get("root")
+        depth = request.query_params.get("depth")
+        if depth is not None:
+            if not depth.isdigit() or int(depth) < 1:
+                raise ValidationError({"depth": ["A positive integer is required."]})
+            depth = int(depth)
+
+        queryset = self.get_tree_queryset(root, depth)
+        data = self.get_serializer(queryset, many=True).data
+        if root is not None and not data:
+            raise NotFound()
+        return Response(data)
+
+
+class AttributeViewSet(
+    AtomicWritesMixin,
+    SurrogateKeyMixin,
+    ConditionalGetMixin,
+    CacheResponseMixin,
+    ProjectionMixin,
+    QueryPlanMixin,
+    ModelViewSet,
+):
     """
     A viewset for viewing and editing atributes instances.
     """
@@ -119,20 +269,86 @@ class AttributeViewSet(ModelViewSet):
         instance.save()
 
 
-class ProductViewSet(ModelViewSet):
+class AutocompleteViewSet(AtomicWritesMixin, GenericViewSet):
+    """
+    A viewset for suggesting brands, categories and products as the user types.
+    """
+
+    serializer_class = SuggestionSerializer
+    permission_classes = [IsAuthenticatedReadOnly]
+    pagination_class = None
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("q", str, description="Start of a word of the names."),
+            OpenApiParameter(
+                "limit",
+                int,
+                description=f"Number of suggestions, {MAX_SUGGESTIONS} max.",
+            ),
+        ]
+    )
+    def list(self, request):
+        """
+        Return the suggestions matching the start of a word, most popular first.
+
+        They are served from a process-local prefix index of the brands, the
+        categories and the products with the most stock. The other products are
+        queried when the index has too few suggestions, for names starting with
+        ``q``.
+        """
+        limit = request.query_params.get("limit", "10")
+        if not limit.isdigit() or not 1 <= int(limit) <= MAX_SUGGESTIONS:
+            raise ValidationError(
+                {"limit": [f"An integer between 1 and {MAX_SUGGESTIONS} is required."]}
+            )
+        suggestions = autocomplete.search(request.query_params.get("q", ""), int(limit))
+        return Response(self.get_serializer(suggestions, many=True).data)
+
+
+@extend_schema_view(list=SPARSE_FIELDS_SCHEMA, retrieve=SPARSE_FIELDS_SCHEMA)
+class ProductViewSet(
+    AtomicWritesMixin,
+    SurrogateKeyMixin,
+    ConditionalGetMixin,
+    CacheResponseMixin,
+    ProjectionMixin,
+    SparseFieldsMixin,
+    QueryPlanMixin,
+    ModelViewSet,
+):
     """
     A viewset for viewing and editing product lines instances.
     """
 
     queryset = Product.objects.all()
     serializer_class = ProductDetailSerializer
+    # The facets and the attribute filters of the list read the attributes.
+    cache_models = [
+        Product,
+        Brand,
+        Category,
+        ProductLine,
+        ProductImage,
+        ProductAttribute,
+        Attribute,
+    ]
     permission_classes = [IsAdminUser | IsOwner | IsAuthenticatedReadOnly]
+    filter_backends = [
+        CategoryFilterBackend,
+        ProductSummaryFilterBackend,
+        ProductSearchFilterBackend,
+        AttributeFilterBackend,
+    ]
     lookup_field = "slug"
 
     def get_queryset(self):
         queryset = super().get_queryset()
         if self.action == "list":
             queryset = queryset.filter(is_active=True)
+        else:
+            # Read by the IsOwner object permission, whatever the fields asked.
+            queryset = queryset.select_related("owner")
         return queryset
 
     def get_serializer_class(self):
@@ -142,6 +358,63 @@ class ProductViewSet(ModelViewSet):
             return ProductEditSerializer
         return ProductDetailSerializer
 
+    def get_etag_models(self):
+        # The facets are counted from the attributes of the lines.
+        if self.action == "list":
+            return [ProductLine, ProductAttribute, Attribute]
+        return super().get_etag_models()
+
+    def get_surrogate_keys(self, data):
+        keys = super().get_surrogate_keys(data)
+        if self.action == "list":
+            keys |= {f"{get_model_key(model)}:list" for model in self.get_etag_models()}
+        return keys
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        # The facets are the same on every page, which the clients keep.
+        if not self.paginator.has_previous:
+            response.data["facets"] = self.get_cached_facets()
+        return response
+
+    def get_cached_facets(self):
+        """
+        Return the facet counts of the listed products from the cache, keyed on
+        the filters of the request only, so every ordering and page size of a
+        listing shares them.
+        """
+        ignored = [
+            self.paginator.cursor_query_param,
+            self.paginator.page_size_query_param,
+            ProductSummaryFilterBackend.ordering_query_param,
+            self.fields_query_param,
+            self.expand_query_param,
+            api_settings.URL_FORMAT_OVERRIDE,
+        ]
+        params = sorted(
+            (key, value)
+            for key, values in self.request.query_params.lists()
+            if key not in ignored
+            for value in values
+        )
+        key = get_cache_key("facets", self.get_cache_models(), urlencode(params))
+        facets = cache.get(key)
+        if facets is None:
+            facets = self.get_facets()
+            if is_shareable(self.get_cache_models()):
+                cache.set(key, facets, settings.CATALOG_CACHE_TIMEOUT)
+        return facets
+
+    def get_facets(self):
+        """
+        Return the facet counts of the listed products, for the filter sidebars.
+        """
+        queryset = self.get_queryset()
+        for backend in self.filter_backends:
+            if backend is not AttributeFilterBackend:
+                queryset = backend().filter_queryset(self.request, queryset, self)
+        return AttributeFilterBackend().get_facets(self.request, queryset, self)
+
     def perform_create(self, serializer):
         serializer.save(
             owner=self.request.user,
@@ -157,8 +430,68 @@ class ProductViewSet(ModelViewSet):
         instance.updated_by = self.request.user
         instance.save()
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "updated_since",
+                OpenApiTypes.DATETIME,
+                description="Only export the products changed since this date.",
+            ),
+        ],
+        responses={
+            (200, NDJSONRenderer.media_type): OpenApiTypes.STR,
+            (200, CSVRenderer.media_type): OpenApiTypes.STR,
+        },
+    )
+    @action(
+        detail=False,
+        pagination_class=None,
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        """
+        Stream the whole catalog, as NDJSON or as CSV with one row per product line.
+        """
+        updated_since = request.query_params.get("updated_since")
+        if updated_since is not None:
+            updated_since = parse_datetime(updated_since)
+            if updated_since is None:
+                raise ValidationError({"updated_since": "Enter a valid date/time."})
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+
+        queryset = self.filter_queryset(Product.objects.all())
+        queryset = get_export_queryset(queryset, updated_since)
+        storage = ProductImage._meta.get_field("image").storage
+        products = iter_catalog(
+            queryset,
+            lambda name: request.build_absolute_uri(storage.url(name)),
+            active_only=updated_since is None,
+        )
 
-class ProductLineViewSet(ModelViewSet):
+        renderer = request.accepted_renderer
+        if renderer.format == CSVRenderer.format:
+            content = renderer.stream(iter_catalog_rows(products), CSV_HEADER)
+        else:
+            content = renderer.stream(products)
+        response = StreamingHttpResponse(
+            content, content_type=f"{renderer.media_type}; charset={renderer.charset}"
+        )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="catalog.{renderer.format}"'
+        return response
+
+
+@extend_schema_view(list=SPARSE_FIELDS_SCHEMA, retrieve=SPARSE_FIELDS_SCHEMA)
+class ProductLineViewSet(
+    AtomicWritesMixin,
+    ConditionalGetMixin,
+    ProjectionMixin,
+    SparseFieldsMixin,
+    QueryPlanMixin,
+    ModelViewSet,
+):
     """
     A viewset for viewing and editing product images instances.
     """
@@ -172,13 +505,29 @@ class ProductLineViewSet(ModelViewSet):
         queryset = super().get_queryset()
         if self.action == "list":
             queryset = queryset.filter(is_active=True)
+        else:
+            # Read by the IsOwner object permission, whatever the fields asked.
+            queryset = queryset.select_related("product__owner")
         return queryset
 
+    def get_permissions(self):
+        if self.action in ["reserve", "reserve_many"]:
+            return [IsAuthenticated()]
+        if self.action in ["release", "release_many"]:
+            return [IsAdminUser()]
+        return super().get_permissions()
+
     def get_serializer_class(self):
         if self.action == "list":
             return ProductLineSerializer
         if self.action in ["create", "update", "partial_update"]:
             return ProductLineEditSerializer
+        if self.action == "bulk":
+            return ProductLineBulkSerializer
+        if self.action in ["reserve", "release"]:
+            return StockReservationSerializer
+        if self.action in ["reserve_many", "release_many"]:
+            return StockReservationBatchSerializer
         return ProductLineDetailSerializer
 
     def perform_create(self, serializer):
@@ -192,8 +541,77 @@ class ProductLineViewSet(ModelViewSet):
         instance.updated_by = self.request.user
         instance.save()
 
-
-class ProductImageViewSet(ModelViewSet):
+    @extend_schema(
+        request=ProductLineBulkSerializer(many=True),
+        responses=ProductLineSerializer(many=True),
+    )
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Create or update many product lines, keyed by sku, in one transaction.
+        """
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=BULK_MAX_ITEMS
+        )
+        serializer.is_valid(raise_exception=True)
+        lines = serializer.save()
+        context = self.get_serializer_context()
+        return Response(ProductLineSerializer(lines, many=True, context=context).data)
+
+    @extend_schema(responses=StockLevelSerializer)
+    @action(detail=True, methods=["post"])
+    def reserve(self, request, *args, **kwargs):
+        return self.adjust_stock(request, ProductLine.objects.reserve)
+
+    @extend_schema(responses=StockLevelSerializer)
+    @action(detail=True, methods=["post"])
+    def release(self, request, *args, **kwargs):
+        return self.adjust_stock(request, ProductLine.objects.release)
+
+    @extend_schema(responses=StockLevelSerializer(many=True))
+    @action(detail=False, methods=["post"], url_path="reserve")
+    def reserve_many(self, request):
+        return self.adjust_stock(request, ProductLine.objects.reserve)
+
+    @extend_schema(responses=StockLevelSerializer(many=True))
+    @action(detail=False, methods=["post"], url_path="release")
+    def release_many(self, request):
+        return self.adjust_stock(request, ProductLine.objects.release)
+
+    def adjust_stock(self, request, adjust):
+        """
+        Reserve or release the stock of the product line in the url, or of every
+        product line in the body, and respond with the new stock levels.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if self.detail:
+            sku = self.kwargs[self.lookup_field]
+            quantities = {sku: serializer.validated_data["quantity"]}
+        else:
+            items = serializer.validated_data["items"]
+            quantities = {item["sku"]: item["quantity"] for item in items}
+
+        try:
+            levels = adjust(quantities)
+        except ProductLine.DoesNotExist as exc:
+            raise NotFound(str(exc))
+        except InsufficientStock as exc:
+            raise OutOfStock(str(exc))
+
+        data = [{"sku": sku, "stock_quantity": levels[sku]} for sku in sorted(levels)]
+        if self.detail:
+            return Response(StockLevelSerializer(data[0]).data)
+        return Response(StockLevelSerializer(data, many=True).data)
+
+
+class ProductImageViewSet(
+    AtomicWritesMixin,
+    ConditionalGetMixin,
+    ProjectionMixin,
+    QueryPlanMixin,
+    ModelViewSet,
+):
     """
     A viewset for viewing and editing product instances.
     """
@@ -5,3 +5,9 @@ from django.utils.translation import gettext_lazy as _
 class ProductConfig(AppConfig):
     name = "ecommerce.products"
     verbose_name = _("Products")
+
+    def ready(self):
+        try:
+            import ecommerce.products.signals  # noqa F401
+        except ImportError:
+            pass
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attribute",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="attribute_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="brand",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="brand_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="category_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="product_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productimage",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="productimage_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productline",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="productline_created_id_idx"
+            ),
+        ),
+    ]
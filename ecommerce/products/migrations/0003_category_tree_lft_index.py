@@ -0,0 +1,16 @@
+# Generated by Django 4.2 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0002_created_id_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(fields=["tree_id", "lft"], name="category_tree_lft_idx"),
+        ),
+    ]
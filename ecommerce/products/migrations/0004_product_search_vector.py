@@ -0,0 +1,83 @@
+# Generated by Django 4.2 on 2026-10-18 05:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+CREATE FUNCTION products_product_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(
+            (SELECT name FROM products_brand WHERE id = NEW.brand_id), ''
+        )), 'B')
+        || setweight(to_tsvector('english', coalesce(
+            (SELECT name FROM products_category WHERE id = NEW.category_id), ''
+        )), 'B')
+        || setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_product_search_vector
+BEFORE INSERT OR UPDATE OF name, description, brand_id, category_id
+ON products_product
+FOR EACH ROW EXECUTE FUNCTION products_product_search_vector();
+
+-- A renamed brand or category touches the name of its products, which fires
+-- the trigger above for each of them.
+CREATE FUNCTION products_product_search_vector_related() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'products_brand' THEN
+        UPDATE products_product SET name = name WHERE brand_id = NEW.id;
+    ELSE
+        UPDATE products_product SET name = name WHERE category_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_brand_search_vector
+AFTER UPDATE OF name ON products_brand
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION products_product_search_vector_related();
+
+CREATE TRIGGER products_category_search_vector
+AFTER UPDATE OF name ON products_category
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION products_product_search_vector_related();
+
+UPDATE products_product SET name = name;
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER products_category_search_vector ON products_category;
+DROP TRIGGER products_brand_search_vector ON products_brand;
+DROP FUNCTION products_product_search_vector_related();
+DROP TRIGGER products_product_search_vector ON products_product;
+DROP FUNCTION products_product_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0003_category_tree_lft_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="product_search_idx"
+            ),
+        ),
+    ]
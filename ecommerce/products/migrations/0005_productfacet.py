@@ -0,0 +1,170 @@
+# Generated by Django 4.2 on 2026-10-18 05:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FACETS_SQL = """
+CREATE FUNCTION products_facet_adjust(
+    line_id uuid, facet_attribute_id uuid, facet_value varchar, delta integer
+) RETURNS void AS $$
+DECLARE
+    line_product_id uuid;
+BEGIN
+    SELECT product_id INTO line_product_id
+    FROM products_productline WHERE id = line_id AND is_active;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    IF delta > 0 THEN
+        INSERT INTO products_productfacet (product_id, attribute_id, value, line_count)
+        VALUES (line_product_id, facet_attribute_id, facet_value, delta)
+        ON CONFLICT ON CONSTRAINT product_facet_unique
+        DO UPDATE SET line_count = products_productfacet.line_count + delta;
+    ELSE
+        DELETE FROM products_productfacet
+        WHERE product_id = line_product_id
+            AND attribute_id = facet_attribute_id
+            AND value = facet_value
+            AND line_count <= -delta;
+        UPDATE products_productfacet
+        SET line_count = line_count + delta
+        WHERE product_id = line_product_id
+            AND attribute_id = facet_attribute_id
+            AND value = facet_value;
+    END IF;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION products_productattribute_facet() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM products_facet_adjust(
+            OLD.product_line_id, OLD.attribute_id, OLD.value, -1
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM products_facet_adjust(
+            NEW.product_line_id, NEW.attribute_id, NEW.value, 1
+        );
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_productattribute_facet
+AFTER INSERT OR DELETE OR UPDATE OF product_line_id, attribute_id, value
+ON products_productattribute
+FOR EACH ROW EXECUTE FUNCTION products_productattribute_facet();
+
+-- A product line moved to another product, activated or deactivated, moves the
+-- counts of its attributes.
+CREATE FUNCTION products_productline_facet() RETURNS trigger AS $$
+DECLARE
+    attribute record;
+BEGIN
+    FOR attribute IN
+        SELECT attribute_id, value FROM products_productattribute
+        WHERE product_line_id = NEW.id
+    LOOP
+        IF OLD.is_active THEN
+            UPDATE products_productfacet AS facet
+            SET line_count = facet.line_count - 1
+            WHERE facet.product_id = OLD.product_id
+                AND facet.attribute_id = attribute.attribute_id
+                AND facet.value = attribute.value;
+        END IF;
+        IF NEW.is_active THEN
+            INSERT INTO products_productfacet
+                (product_id, attribute_id, value, line_count)
+            VALUES (NEW.product_id, attribute.attribute_id, attribute.value, 1)
+            ON CONFLICT ON CONSTRAINT product_facet_unique
+            DO UPDATE SET line_count = products_productfacet.line_count + 1;
+        END IF;
+    END LOOP;
+    IF OLD.is_active THEN
+        DELETE FROM products_productfacet
+        WHERE product_id = OLD.product_id AND line_count = 0;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_productline_facet
+AFTER UPDATE OF product_id, is_active ON products_productline
+FOR EACH ROW
+WHEN (
+    OLD.product_id IS DISTINCT FROM NEW.product_id
+    OR OLD.is_active IS DISTINCT FROM NEW.is_active
+)
+EXECUTE FUNCTION products_productline_facet();
+
+INSERT INTO products_productfacet (product_id, attribute_id, value, line_count)
+SELECT line.product_id, attribute.attribute_id, attribute.value, count(*)
+FROM products_productattribute AS attribute
+JOIN products_productline AS line ON line.id = attribute.product_line_id
+WHERE line.is_active
+GROUP BY line.product_id, attribute.attribute_id, attribute.value;
+"""
+
+DROP_FACETS_SQL = """
+DROP TRIGGER products_productline_facet ON products_productline;
+DROP FUNCTION products_productline_facet();
+DROP TRIGGER products_productattribute_facet ON products_productattribute;
+DROP FUNCTION products_productattribute_facet();
+DROP FUNCTION products_facet_adjust(uuid, uuid, varchar, integer);
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0004_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductFacet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.CharField(max_length=100)),
+                ("line_count", models.PositiveIntegerField(default=0)),
+                (
+                    "attribute",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.attribute",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facets",
+                        to="products.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="productfacet",
+            index=models.Index(
+                fields=["attribute", "value", "product"], name="product_facet_value_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productfacet",
+            constraint=models.UniqueConstraint(
+                fields=("product", "attribute", "value"), name="product_facet_unique"
+            ),
+        ),
+        migrations.RunSQL(FACETS_SQL, DROP_FACETS_SQL),
+    ]
@@ -0,0 +1,151 @@
+# Generated by Django 4.2 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+SUMMARY_SQL = """
+CREATE FUNCTION products_product_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        NEW.min_price := NULL;
+        NEW.max_price := NULL;
+        NEW.total_stock := 0;
+        NEW.active_line_count := 0;
+    ELSE
+        SELECT min(price), max(price), coalesce(sum(stock_quantity), 0), count(*)
+        INTO NEW.min_price, NEW.max_price, NEW.total_stock, NEW.active_line_count
+        FROM products_productline
+        WHERE product_id = NEW.id AND is_active;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_product_summary
+BEFORE INSERT OR UPDATE ON products_product
+FOR EACH ROW EXECUTE FUNCTION products_product_summary();
+
+-- Product lines written touch their products once per statement, which fires
+-- the trigger above for each of them. The products are locked in id order, so
+-- statements writing lines of the same products can't deadlock.
+CREATE FUNCTION products_productline_summary() RETURNS trigger AS $$
+DECLARE
+    product_ids uuid[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        product_ids := ARRAY(
+            SELECT DISTINCT product_id FROM new_lines WHERE is_active
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        product_ids := ARRAY(
+            SELECT DISTINCT product_id FROM old_lines WHERE is_active
+        );
+    ELSE
+        product_ids := ARRAY(
+            SELECT DISTINCT unnest(ARRAY[old_line.product_id, new_line.product_id])
+            FROM old_lines AS old_line
+            JOIN new_lines AS new_line ON new_line.id = old_line.id
+            WHERE (old_line.is_active OR new_line.is_active)
+                AND (
+                    old_line.product_id,
+                    old_line.price,
+                    old_line.stock_quantity,
+                    old_line.is_active
+                ) IS DISTINCT FROM (
+                    new_line.product_id,
+                    new_line.price,
+                    new_line.stock_quantity,
+                    new_line.is_active
+                )
+        );
+    END IF;
+    IF cardinality(product_ids) > 0 THEN
+        PERFORM 1 FROM products_product
+        WHERE id = ANY(product_ids) ORDER BY id FOR UPDATE;
+        UPDATE products_product SET total_stock = total_stock
+        WHERE id = ANY(product_ids);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_productline_summary_insert
+AFTER INSERT ON products_productline
+REFERENCING NEW TABLE AS new_lines
+FOR EACH STATEMENT EXECUTE FUNCTION products_productline_summary();
+
+CREATE TRIGGER products_productline_summary_update
+AFTER UPDATE ON products_productline
+REFERENCING OLD TABLE AS old_lines NEW TABLE AS new_lines
+FOR EACH STATEMENT EXECUTE FUNCTION products_productline_summary();
+
+CREATE TRIGGER products_productline_summary_delete
+AFTER DELETE ON products_productline
+REFERENCING OLD TABLE AS old_lines
+FOR EACH STATEMENT EXECUTE FUNCTION products_productline_summary();
+
+UPDATE products_product SET total_stock = total_stock
+WHERE id IN (SELECT product_id FROM products_productline WHERE is_active);
+"""
+
+DROP_SUMMARY_SQL = """
+DROP TRIGGER products_productline_summary_delete ON products_productline;
+DROP TRIGGER products_productline_summary_update ON products_productline;
+DROP TRIGGER products_productline_summary_insert ON products_productline;
+DROP FUNCTION products_productline_summary();
+DROP TRIGGER products_product_summary ON products_product;
+DROP FUNCTION products_product_summary();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0005_productfacet"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="active_line_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="max_price",
+            field=models.DecimalField(
+                decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="min_price",
+            field=models.DecimalField(
+                decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="total_stock",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(SUMMARY_SQL, DROP_SUMMARY_SQL),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["min_price", "id"], name="product_min_price_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["max_price", "id"], name="product_max_price_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("total_stock__gt", 0)),
+                fields=["-created_at", "-id"],
+                name="product_in_stock_idx",
+            ),
+        ),
+    ]
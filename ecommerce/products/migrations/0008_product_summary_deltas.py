@@ -0,0 +1,205 @@
+# Generated by Django 4.2 on 2026-10-18 08:40
+
+from django.db import migrations
+
+DELTAS_SQL = """
+-- A statement writing products, e.g. a save() carrying a summary read earlier,
+-- has it recomputed from the lines. The deltas applied by the line triggers
+-- below run nested, and are kept as they are.
+CREATE OR REPLACE FUNCTION products_product_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        NEW.min_price := NULL;
+        NEW.max_price := NULL;
+        NEW.total_stock := 0;
+        NEW.active_line_count := 0;
+    ELSIF pg_trigger_depth() = 1 THEN
+        SELECT min(price), max(price), coalesce(sum(stock_quantity), 0), count(*)
+        INTO NEW.min_price, NEW.max_price, NEW.total_stock, NEW.active_line_count
+        FROM products_productline
+        WHERE product_id = NEW.id AND is_active;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+-- The contribution of an active line to the summary of its product, negative
+-- for the lines removed from it.
+CREATE TYPE products_productline_change AS (
+    product_id uuid,
+    stock bigint,
+    lines integer,
+    added_price numeric,
+    removed_price numeric
+);
+
+-- The changes are added to the summaries of their products, without reading
+-- their other lines. Only removing the lowest or highest price of a product
+-- reads the price of its other lines. The products are locked in id order, so
+-- statements writing lines of the same products can't deadlock.
+CREATE FUNCTION products_product_summary_apply(
+    changes products_productline_change[]
+) RETURNS void AS $$
+BEGIN
+    IF cardinality(changes) = 0 THEN
+        RETURN;
+    END IF;
+    PERFORM 1 FROM products_product
+    WHERE id IN (SELECT product_id FROM unnest(changes))
+    ORDER BY id FOR UPDATE;
+    UPDATE products_product AS product
+    SET total_stock = product.total_stock + delta.stock,
+        active_line_count = product.active_line_count + delta.lines,
+        min_price = CASE
+            WHEN delta.removed_min <= product.min_price THEN (
+                SELECT min(price) FROM products_productline
+                WHERE product_id = product.id AND is_active
+            )
+            ELSE least(product.min_price, delta.added_min)
+        END,
+        max_price = CASE
+            WHEN delta.removed_max >= product.max_price THEN (
+                SELECT max(price) FROM products_productline
+                WHERE product_id = product.id AND is_active
+            )
+            ELSE greatest(product.max_price, delta.added_max)
+        END
+    FROM (
+        SELECT product_id, sum(stock) AS stock, sum(lines) AS lines,
+            min(added_price) AS added_min, max(added_price) AS added_max,
+            min(removed_price) AS removed_min, max(removed_price) AS removed_max
+        FROM unnest(changes)
+        GROUP BY product_id
+    ) AS delta
+    WHERE product.id = delta.product_id;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION products_productline_summary() RETURNS trigger AS $$
+DECLARE
+    changes products_productline_change[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        changes := ARRAY(
+            SELECT ROW(product_id, stock_quantity, 1, price, NULL)
+                ::products_productline_change
+            FROM new_lines WHERE is_active
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        changes := ARRAY(
+            SELECT ROW(product_id, -stock_quantity, -1, NULL, price)
+                ::products_productline_change
+            FROM old_lines WHERE is_active
+        );
+    ELSE
+        -- A line whose stock only changed, e.g. reserved, contributes no price.
+        changes := ARRAY(
+            SELECT changed.change
+            FROM old_lines AS old_line
+            JOIN new_lines AS new_line ON new_line.id = old_line.id
+            CROSS JOIN LATERAL (
+                SELECT (old_line.is_active AND new_line.is_active
+                    AND old_line.product_id = new_line.product_id
+                    AND old_line.price = new_line.price) AS stock_only
+            ) AS line
+            CROSS JOIN LATERAL (
+                SELECT ROW(
+                    new_line.product_id,
+                    new_line.stock_quantity - old_line.stock_quantity,
+                    0, NULL, NULL
+                )::products_productline_change AS change
+                WHERE line.stock_only
+                    AND old_line.stock_quantity <> new_line.stock_quantity
+                UNION ALL
+                SELECT ROW(
+                    old_line.product_id, -old_line.stock_quantity, -1,
+                    NULL, old_line.price
+                )::products_productline_change
+                WHERE old_line.is_active AND NOT line.stock_only
+                UNION ALL
+                SELECT ROW(
+                    new_line.product_id, new_line.stock_quantity, 1,
+                    new_line.price, NULL
+                )::products_productline_change
+                WHERE new_line.is_active AND NOT line.stock_only
+            ) AS changed
+        );
+    END IF;
+    PERFORM products_product_summary_apply(changes);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+AGGREGATES_SQL = """
+CREATE OR REPLACE FUNCTION products_product_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        NEW.min_price := NULL;
+        NEW.max_price := NULL;
+        NEW.total_stock := 0;
+        NEW.active_line_count := 0;
+    ELSE
+        SELECT min(price), max(price), coalesce(sum(stock_quantity), 0), count(*)
+        INTO NEW.min_price, NEW.max_price, NEW.total_stock, NEW.active_line_count
+        FROM products_productline
+        WHERE product_id = NEW.id AND is_active;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION products_productline_summary() RETURNS trigger AS $$
+DECLARE
+    product_ids uuid[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        product_ids := ARRAY(
+            SELECT DISTINCT product_id FROM new_lines WHERE is_active
+        );
+    ELSIF TG_OP = 'DELETE' THEN
+        product_ids := ARRAY(
+            SELECT DISTINCT product_id FROM old_lines WHERE is_active
+        );
+    ELSE
+        product_ids := ARRAY(
+            SELECT DISTINCT unnest(ARRAY[old_line.product_id, new_line.product_id])
+            FROM old_lines AS old_line
+            JOIN new_lines AS new_line ON new_line.id = old_line.id
+            WHERE (old_line.is_active OR new_line.is_active)
+                AND (
+                    old_line.product_id,
+                    old_line.price,
+                    old_line.stock_quantity,
+                    old_line.is_active
+                ) IS DISTINCT FROM (
+                    new_line.product_id,
+                    new_line.price,
+                    new_line.stock_quantity,
+                    new_line.is_active
+                )
+        );
+    END IF;
+    IF cardinality(product_ids) > 0 THEN
+        PERFORM 1 FROM products_product
+        WHERE id = ANY(product_ids) ORDER BY id FOR UPDATE;
+        UPDATE products_product SET total_stock = total_stock
+        WHERE id = ANY(product_ids);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION products_product_summary_apply(products_productline_change[]);
+DROP TYPE products_productline_change;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0007_product_name_prefix_idx"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELTAS_SQL, AGGREGATES_SQL),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2 on 2026-10-18 08:28
+
+from decimal import Decimal
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_product_summary_deltas"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_min_price_id_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_max_price_id_idx",
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.functions.comparison.Coalesce(
+                    "min_price",
+                    models.Value(Decimal("100000000")),
+                    output_field=models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                models.F("id"),
+                name="product_min_price_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.functions.comparison.Coalesce(
+                    "min_price",
+                    models.Value(Decimal("-100000000")),
+                    output_field=models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                models.F("id"),
+                name="product_min_price_desc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.functions.comparison.Coalesce(
+                    "max_price",
+                    models.Value(Decimal("100000000")),
+                    output_field=models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                models.F("id"),
+                name="product_max_price_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.functions.comparison.Coalesce(
+                    "max_price",
+                    models.Value(Decimal("-100000000")),
+                    output_field=models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                models.F("id"),
+                name="product_max_price_desc_idx",
+            ),
+        ),
+    ]
@@ -1,11 +1,35 @@
 import uuid
+from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce, Upper
+from django.utils import timezone
 from treebeard.ns_tree import NS_Node
 
+from ecommerce.utils.cache import invalidate_model_cache
+from ecommerce.utils.cdn import get_purge_keys, purge
+
 User = get_user_model()
 
+# Sort key of the products without a price, beyond every price.
+NO_PRICE = Decimal("100000000")
+
+
+def get_price_key(field: str, descending: bool = False) -> Coalesce:
+    """
+    Return the sort key of the products on a price summary column, which puts
+    the products without a price last in either direction.
+    """
+    return Coalesce(
+        field,
+        Value(-NO_PRICE if descending else NO_PRICE),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
 
 class Category(NS_Node):
     """
@@ -32,8 +56,21 @@ class Category(NS_Node):
         """
         return self.slug
 
+    def move(self, target, pos=None):
+        """
+        Move the category and its descendants to a new position in the tree.
+        The nested set is rewritten without saving any instance, so the cached
+        category payloads are invalidated here.
+        """
+        super().move(target, pos)
+        invalidate_model_cache(Category)
+
     class Meta:
         verbose_name_plural = "categories"
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="category_created_id_idx"),
+            models.Index(fields=["tree_id", "lft"], name="category_tree_lft_idx"),
+        ]
 
 
 class Brand(models.Model):
@@ -59,6 +96,11 @@ class Brand(models.Model):
         """
         return self.slug
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="brand_created_id_idx"),
+        ]
+
 
 class Attribute(models.Model):
     """
@@ -83,6 +125,13 @@ class Attribute(models.Model):
         """
         return self.slug
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"], name="attribute_created_id_idx"
+            ),
+        ]
+
 
 class Product(models.Model):
     """
@@ -106,12 +155,127 @@ class Product(models.Model):
     updated_by = models.ForeignKey(User, related_name="+", on_delete=models.PROTECT)
     updated_at = models.DateTimeField(auto_now=True, editable=True)
 
+    # Weighted name, brand, category and description, maintained by database
+    # triggers (see migration 0004), so bulk writes and renames keep it in sync.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Price range and stock of the active lines, maintained by database triggers
+    # (see migrations 0006 and 0008), so the lists don't aggregate the lines of
+    # every row.
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, editable=False
+    )
+    max_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, editable=False
+    )
+    total_stock = models.PositiveIntegerField(default=0, editable=False)
+    active_line_count = models.PositiveIntegerField(default=0, editable=False)
+
     def __str__(self):
         """
         Return the slug of the product.
         """
         return self.slug
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="product_created_id_idx"),
+            GinIndex(fields=["search_vector"], name="product_search_idx"),
+            # The autocomplete searches the products left out of its index.
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="product_name_prefix_idx",
+            ),
+            # The price orderings, scanned backward when descending.
+            models.Index(
+                get_price_key("min_price"), F("id"), name="product_min_price_id_idx"
+            ),
+            models.Index(
+                get_price_key("min_price", descending=True),
+                F("id"),
+                name="product_min_price_desc_idx",
+            ),
+            models.Index(
+                get_price_key("max_price"), F("id"), name="product_max_price_id_idx"
+            ),
+            models.Index(
+                get_price_key("max_price", descending=True),
+                F("id"),
+                name="product_max_price_desc_idx",
+            ),
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(total_stock__gt=0),
+                name="product_in_stock_idx",
+            ),
+        ]
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when a product line has less stock than the quantity reserved.
+    """
+
+    def __init__(self, sku: str):
+        super().__init__(f"Insufficient stock for {sku}.")
+        self.sku = sku
+
+
+class ProductLineQuerySet(models.QuerySet):
+    def reserve(self, quantities: dict[str, int]) -> dict[str, int]:
+        """
+        Take quantities, keyed by SKU, out of the stock of active product lines,
+        all or nothing, and return the new stock levels.
+
+        The lines are locked in SKU order, checked, then decremented by a single
+        ``UPDATE``, so concurrent reservations can't oversell. The trigger adding
+        the change to the summary of their products locks them in id order, once
+        for the statement, so overlapping reservations can't deadlock.
+        """
+        return self._adjust_stock(quantities, -1)
+
+    def release(self, quantities: dict[str, int]) -> dict[str, int]:
+        """
+        Put quantities, keyed by SKU, back in the stock of the product lines and
+        return the new stock levels.
+        """
+        return self._adjust_stock(quantities, 1)
+
+    def _adjust_stock(self, quantities: dict[str, int], sign: int):
+        with transaction.atomic():
+            lines = self.filter(sku__in=quantities).order_by("sku").select_for_update()
+            rows = {
+                row[0]: row[1:]
+                for row in lines.values_list(
+                    "sku", "stock_quantity", "is_active", "pk", "product_id"
+                )
+            }
+            for sku in sorted(quantities):
+                if sku not in rows or (sign < 0 and not rows[sku][1]):
+                    raise self.model.DoesNotExist(f"No product line matches {sku}.")
+                if sign < 0 and rows[sku][0] < quantities[sku]:
+                    raise InsufficientStock(sku)
+
+            self.filter(sku__in=quantities).update(
+                stock_quantity=F("stock_quantity")
+                + Case(
+                    *[
+                        When(sku=sku, then=Value(sign * quantity))
+                        for sku, quantity in quantities.items()
+                    ],
+                    output_field=models.IntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+
+            levels, keys = {}, set()
+            for sku, (stock_quantity, _, pk, product_id) in rows.items():
+                levels[sku] = stock_quantity + sign * quantities[sku]
+                keys |= get_purge_keys(self.model, pk, product_id=product_id)
+            purge(keys)
+        invalidate_model_cache(self.model)
+        return levels
+
 
 class ProductLine(models.Model):
     """
@@ -137,6 +301,11 @@ class ProductLine(models.Model):
         "Attribute", through="ProductAttribute", related_name="product_line"
     )
 
+    objects = ProductLineQuerySet.as_manager()
+
+    # Parents rendering the rows in their responses, purged from the CDN with them.
+    surrogate_key_parents = ["product"]
+
     def __str__(self):
         """
         Return the name of the product line.
@@ -151,6 +320,11 @@ class ProductLine(models.Model):
 
     class Meta:
         verbose_name_plural = "Product Lines"
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"], name="productline_created_id_idx"
+            ),
+        ]
 
 
 class ProductImage(models.Model):
@@ -171,6 +345,9 @@ class ProductImage(models.Model):
         Product, on_delete=models.CASCADE, related_name="images"
     )
 
+    # Parents rendering the rows in their responses, purged from the CDN with them.
+    surrogate_key_parents = ["product"]
+
     def __str__(self):
         """
         Return the name of the product image.
@@ -183,6 +360,13 @@ class ProductImage(models.Model):
         """
         return self.product.owner
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"], name="productimage_created_id_idx"
+            ),
+        ]
+
 
 class ProductAttribute(models.Model):
     """
@@ -200,8 +384,46 @@ class ProductAttribute(models.Model):
     product_line = models.ForeignKey(ProductLine, on_delete=models.CASCADE)
     attribute = models.ForeignKey(Attribute, on_delete=models.PROTECT)
 
+    # Parents rendering the rows in their responses, purged from the CDN with them.
+    surrogate_key_parents = ["product_line"]
+
     def __str__(self):
         """
         Return the name of the product attribute.
         """
         return f"{self.product_line.product}({self.attribute}) - {self.value}"
+
+
+class ProductFacet(models.Model):
+    """
+    Product Facet model. It counts the active product lines of a product having
+    an attribute value, for the facet counts of the product list.
+
+    The rows are maintained by database triggers on the product attributes and
+    product lines (see migration 0005), so bulk writes keep them in sync.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="facets"
+    )
+    attribute = models.ForeignKey(Attribute, on_delete=models.CASCADE, related_name="+")
+    value = models.CharField(max_length=100)
+    line_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """
+        Return the attribute value of the product.
+        """
+        return f"{self.product}({self.attribute}) - {self.value}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "attribute", "value"], name="product_facet_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["attribute", "value", "product"], name="product_facet_value_idx"
+            ),
+        ]
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+
+from ecommerce.products.models import (
+    Attribute,
+    Brand,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductImage,
+    ProductLine,
+)
+from ecommerce.utils.cache import invalidate_model_cache
+from ecommerce.utils.cdn import purge_instances
+
+CATALOG_MODELS = [
+    Attribute,
+    Brand,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductImage,
+    ProductLine,
+]
+
+
+def invalidate_catalog_cache(sender, **kwargs):
+    """
+    Invalidate the cached payloads of a catalog model when one of its rows changes.
+    """
+    invalidate_model_cache(sender)
+
+
+def purge_catalog_responses(sender, instance, **kwargs):
+    """
+    Purge the CDN responses rendering a catalog row when it changes.
+    """
+    purge_instances([instance])
+
+
+# Connected per model, the deletions of the other models keep their fast path.
+for model in CATALOG_MODELS:
+    for signal in [post_save, post_delete]:
+        signal.connect(invalidate_catalog_cache, sender=model)
+        signal.connect(purge_catalog_responses, sender=model)
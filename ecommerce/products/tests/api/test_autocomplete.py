@@ -0,0 +1,127 @@
+import pytest
+
+from ecommerce.products.api import autocomplete
+from ecommerce.products.api.autocomplete import (
+    Autocomplete,
+    PrefixIndex,
+    normalize,
+    search_products,
+)
+from ecommerce.products.models import Brand
+
+SNAPSHOT = [
+    ("product", "Blue Cotton Shirt", "blue-cotton-shirt", 1),
+    ("product", "Café Crème Mug", "cafe-creme-mug", 1),
+    ("product", "Cotton Socks", "cotton-socks", 1),
+    ("brand", "Cottonwood", "cottonwood", 12),
+    ("category", "Shirts", "shirts", 30),
+]
+
+
+class TestPrefixIndex:
+    def test_normalize(self):
+        assert normalize("  Café\tCRÈME  ") == "cafe creme"
+
+    @pytest.mark.parametrize(
+        "query, expected",
+        [
+            ("cot", ["cottonwood", "cotton-socks", "blue-cotton-shirt"]),
+            ("cotton", ["cottonwood", "cotton-socks", "blue-cotton-shirt"]),
+            ("cotton s", ["cotton-socks", "blue-cotton-shirt"]),
+            ("shi", ["shirts", "blue-cotton-shirt"]),
+            ("creme", ["cafe-creme-mug"]),
+            ("CAFÉ", ["cafe-creme-mug"]),
+            ("blue shirt", []),
+            ("", []),
+        ],
+    )
+    def test_search(self, query, expected):
+        index = PrefixIndex(SNAPSHOT)
+        assert [slug for _, _, slug, _ in index.search(query)] == expected
+
+    def test_search_limit(self):
+        index = PrefixIndex(SNAPSHOT)
+        assert [slug for _, _, slug, _ in index.search("co", 2)] == [
+            "cottonwood",
+            "cotton-socks",
+        ]
+        assert [slug for _, _, slug, _ in index.search("cotto", 2)] == [
+            "cottonwood",
+            "cotton-socks",
+        ]
+
+    def test_search_when_many_keys(self, monkeypatch):
+        snapshot = SNAPSHOT + [("product", f"Cotton {i}", i, 1) for i in range(30)]
+        expected = PrefixIndex(snapshot).search("cotton", 20)
+        monkeypatch.setattr(autocomplete, "MAX_SCANNED_KEYS", 2)
+
+        # The brand sorts last, but the top entries of "cot" are ranked too.
+        assert PrefixIndex(snapshot).search("cotton", 20) == expected
+        assert expected[0][2] == "cottonwood"
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAutocomplete:
+    def test_rebuild_in_background(self, settings, product_factory):
+        settings.AUTOCOMPLETE_REBUILD_DELAY = 0.1
+        product = product_factory(name="Zephyr Fan", is_active=True)
+        index = Autocomplete()
+        assert [s["slug"] for s in index.search("zephyr")] == [product.slug]
+
+        product.name = "Breeze Fan"
+        product.save()
+        # The previous index is served while it is rebuilt.
+        assert [s["slug"] for s in index.search("zephyr")] == [product.slug]
+        with index.rebuilding:
+            pass
+        assert [s["slug"] for s in index.search("breeze")] == [product.slug]
+
+    def test_rebuild_changed_models(self, mocker, brand, product_factory):
+        product_factory(is_active=True, brand=brand)
+        index = Autocomplete()
+        index.search("a")
+        load_suggestions = mocker.spy(autocomplete, "load_suggestions")
+
+        brand.name = "Zephyr Works"
+        brand.save()
+        assert [s["slug"] for s in index.search("zephyr")] == [brand.slug]
+        load_suggestions.assert_called_once_with(Brand)
+
+    def test_search_products_not_indexed(self, settings, product_factory):
+        settings.AUTOCOMPLETE_INDEXED_PRODUCTS = 1
+        product_factory(name="Zephyr Fan", slug="fan", is_active=True)
+        product_factory(name="Zephyr", slug="zephyr", is_active=True)
+        product_factory(name="Zephyrs", slug="inactive", is_active=False)
+        index = Autocomplete()
+        indexed = index.search("zeph", 1)
+
+        # The other one is searched in the database, from three letters.
+        assert len(indexed) == 1
+        assert index.search("ze") == indexed
+        assert sorted(s["slug"] for s in index.search("zeph")) == ["fan", "zephyr"]
+
+
+@pytest.mark.django_db
+class TestSearchProducts:
+    @pytest.mark.parametrize(
+        "query, expected",
+        [
+            ("cot", ["cotton-socks", "cotton-tee-shirt"]),
+            ("COTTON  s", ["cotton-socks"]),
+            ("shirt", []),
+            ("cot%", []),
+            ("", []),
+        ],
+    )
+    def test_search_products(self, product_factory, query, expected):
+        product_factory(
+            name="Cotton Tee Shirt", slug="cotton-tee-shirt", is_active=True
+        )
+        product_factory(name="Cotton Socks", slug="cotton-socks", is_active=True)
+        product_factory(name="Cotton Hat", slug="cotton-hat", is_active=False)
+
+        assert [slug for _, _, slug, _ in search_products(query, 10)] == expected
+
+    def test_search_products_exclude(self, product_factory):
+        product_factory(name="Cotton Socks", slug="cotton-socks", is_active=True)
+        assert search_products("cotton", 10, exclude=["cotton-socks"]) == []
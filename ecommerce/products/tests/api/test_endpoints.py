@@ -1,14 +1,63 @@
+import csv
+import io
+import json
+from datetime import timedelta
 from decimal import Decimal
 
 import pytest
+from django.core.cache import cache
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
 
-from ecommerce.products.models import Attribute, Brand, Product
+from ecommerce.products.models import (
+    Attribute,
+    Brand,
+    Category,
+    Product,
+    ProductAttribute,
+    ProductImage,
+    ProductLine,
+)
 from ecommerce.utils.serializer import model_to_dict
 
 pytestmark = [pytest.mark.django_db, pytest.mark.e2e]
 
+# The page keys and the validators, the page rows and the facet counts. The safe
+# requests of the viewsets run outside of a transaction.
+QUERIES_PRODUCT_LIST = 4
+# The validators, the product row, its lines and its images.
+QUERIES_PRODUCT_DETAIL = 4
+# The validators, the product row and its lines.
+QUERIES_PRODUCT_DETAIL_SPARSE = 3
+# The validators.
+QUERIES_NOT_MODIFIED = 1
+# The whole tree.
+QUERIES_CATEGORY_TREE = 1
+# Savepoint and release around the request and the writes, products, lines and
+# attributes lookups, line insert and update, attribute delete and insert.
+QUERIES_PRODUCT_LINE_BULK = 12
+# The products, lines, attributes and images cursors.
+QUERIES_PRODUCT_EXPORT = 4
+# None, the suggestions come from the process-local index.
+QUERIES_AUTOCOMPLETE = 0
+
+
+def export_items(response):
+    """
+    Return the documents of a streamed NDJSON export.
+    """
+    content = b"".join(response.streaming_content).decode()
+    return [json.loads(line) for line in content.splitlines()]
+
+
+def tree_slugs(nodes):
+    """
+    Return the nested slugs of a category tree payload.
+    """
+    return [(node["slug"], tree_slugs(node["children"])) for node in nodes]
+
 
 class TestCategoryEndpoint:
     def test_get_category_when_unauthenticated(self, api_client, category):
@@ -43,14 +92,14 @@ class TestCategoryEndpoint:
         url = reverse("api:category-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 10
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 10
 
     def test_list_category_when_dont_exists(self, auth_api_client):
         url = reverse("api:category-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 0
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 0
 
     def test_list_category_when_has_deactivated_entries(
@@ -65,6 +114,73 @@ class TestCategoryEndpoint:
         assert response.data["results"][0]["name"] == category.name
         assert response.data["results"][0]["slug"] == category.slug
 
+    def test_tree_category_when_unauthenticated(self, api_client):
+        url = reverse("api:category-tree")
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_tree_category_when_authenticated(
+        self, auth_api_client, category_tree, django_assert_num_queries
+    ):
+        url = reverse("api:category-tree")
+        with django_assert_num_queries(QUERIES_CATEGORY_TREE):
+            response = auth_api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert tree_slugs(response.data) == [
+            ("root", [("root_1", [("root_1_1", [])]), ("root_2", [])])
+        ]
+
+    def test_tree_category_when_rooted(self, auth_api_client, category_tree):
+        url = reverse("api:category-tree")
+        response = auth_api_client.get(url, data={"root": "root_1"})
+        assert response.status_code == status.HTTP_200_OK
+        assert tree_slugs(response.data) == [("root_1", [("root_1_1", [])])]
+
+    def test_tree_category_when_depth_limited(self, auth_api_client, category_tree):
+        url = reverse("api:category-tree")
+        response = auth_api_client.get(url, data={"depth": 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert tree_slugs(response.data) == [("root", [("root_1", []), ("root_2", [])])]
+
+    def test_tree_category_when_rooted_and_depth_limited(
+        self, auth_api_client, category_tree
+    ):
+        url = reverse("api:category-tree")
+        response = auth_api_client.get(url, data={"root": "root_1", "depth": 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert tree_slugs(response.data) == [("root_1", [])]
+
+    def test_tree_category_when_invalid_depth(self, auth_api_client, category_tree):
+        url = reverse("api:category-tree")
+        response = auth_api_client.get(url, data={"depth": 0})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "depth" in response.data
+
+    def test_tree_category_when_root_dont_exists(self, auth_api_client):
+        url = reverse("api:category-tree")
+        response = auth_api_client.get(url, data={"root": "fake-slug"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_tree_category_when_has_deactivated_entries(
+        self, auth_api_client, category_tree
+    ):
+        Category.objects.filter(slug="root_1").update(is_active=False)
+        url = reverse("api:category-tree")
+        response = auth_api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert tree_slugs(response.data) == [("root", [("root_2", [])])]
+
+    def test_tree_category_when_moved(self, auth_api_client, category_tree):
+        url = reverse("api:category-tree")
+        auth_api_client.get(url)
+        node = Category.objects.get(slug="root_1_1")
+        node.move(Category.objects.get(slug="root_2"), "sorted-child")
+        response = auth_api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert tree_slugs(response.data) == [
+            ("root", [("root_1", []), ("root_2", [("root_1_1", [])])])
+        ]
+
 
 @pytest.mark.e2e
 class TestBrandEndpoint:
@@ -113,7 +229,7 @@ class TestBrandEndpoint:
         url = reverse("api:brand-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 10
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 10
 
     def test_list_brand_when_dont_exists(self, auth_api_client):
@@ -292,14 +408,14 @@ class TestAttributeEndpoint:
         url = reverse("api:attribute-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 10
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 10
 
     def test_list_attribute_when_dont_exists(self, auth_api_client):
         url = reverse("api:attribute-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 0
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 0
 
     def test_list_attribute_when_has_deactivated_entries(
@@ -309,7 +425,7 @@ class TestAttributeEndpoint:
         url = reverse("api:attribute-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 1
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 1
         assert response.data["results"][0]["id"] == str(attribute.id)
         assert response.data["results"][0]["name"] == attribute.name
@@ -441,6 +557,7 @@ class TestProductEndpoint:
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
         assert response.data["name"] == product.name
+        assert "search_vector" not in response.data
 
     def test_get_product_when_admin_authenticated(self, admin_api_client, product):
         url = reverse("api:product-detail", kwargs={"slug": product.slug})
@@ -463,14 +580,14 @@ class TestProductEndpoint:
         url = reverse("api:product-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 10
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 10
 
     def test_list_product_when_dont_exists(self, auth_api_client):
         url = reverse("api:product-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 0
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 0
 
     def test_list_product_when_has_deactivated_entries(
@@ -480,12 +597,400 @@ class TestProductEndpoint:
         url = reverse("api:product-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 1
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 1
         assert response.data["results"][0]["id"] == str(product.id)
         assert response.data["results"][0]["name"] == product.name
         assert response.data["results"][0]["slug"] == product.slug
 
+    def test_list_product_when_filtered_by_category(
+        self, auth_api_client, product_factory, category_tree
+    ):
+        product = product_factory(category=category_tree["root_1"])
+        product_factory(category=category_tree["root_1_1"])
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"category": "root_1"})
+        assert response.status_code == status.HTTP_200_OK
+        assert [p["id"] for p in response.data["results"]] == [str(product.id)]
+
+    @pytest.mark.parametrize(
+        "slug, expected",
+        [
+            ("root", ["root", "root_1", "root_1_1", "root_2"]),
+            ("root_1", ["root_1", "root_1_1"]),
+            ("root_1_1", ["root_1_1"]),
+            ("root_2", ["root_2"]),
+        ],
+    )
+    def test_list_product_when_filtered_by_category_descendants(
+        self, auth_api_client, product_factory, category_tree, slug, expected
+    ):
+        for category in category_tree.values():
+            product_factory(category=category)
+        url = reverse("api:product-list")
+        response = auth_api_client.get(
+            url, data={"category": slug, "descendants": "true"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(p["category"] for p in response.data["results"]) == expected
+
+    def test_list_product_when_filtered_by_category_dont_exists(
+        self, auth_api_client, product
+    ):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(
+            url, data={"category": "fake-slug", "descendants": "true"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 0
+
+    def test_list_product_when_searched(self, auth_api_client, product_factory):
+        in_description = product_factory(name="Plain", description="A red lamp")
+        in_name = product_factory(name="Red lamp", description="Nothing")
+        product_factory(name="Blue chair", description="Nothing")
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"q": "red lamps"})
+        assert response.status_code == status.HTTP_200_OK
+        assert [p["id"] for p in response.data["results"]] == [
+            str(in_name.id),
+            str(in_description.id),
+        ]
+
+    def test_list_product_when_searched_by_brand_and_category(
+        self, auth_api_client, product_factory, brand_factory, category_factory
+    ):
+        brand = brand_factory(name="Acme")
+        by_brand = product_factory(brand=brand)
+        by_category = product_factory(category=category_factory(name="Furniture"))
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"q": "acme"})
+        assert [p["id"] for p in response.data["results"]] == [str(by_brand.id)]
+        response = auth_api_client.get(url, data={"q": "furniture"})
+        assert [p["id"] for p in response.data["results"]] == [str(by_category.id)]
+
+        brand.name = "Globex"
+        brand.save()
+        response = auth_api_client.get(url, data={"q": "globex"})
+        assert [p["id"] for p in response.data["results"]] == [str(by_brand.id)]
+
+    def test_list_product_when_searched_with_operators(
+        self, auth_api_client, product_factory
+    ):
+        product = product_factory(name="Red lamp", description="Nothing")
+        product_factory(name="Red chair", description="Nothing")
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"q": "red -chair"})
+        assert [p["id"] for p in response.data["results"]] == [str(product.id)]
+
+    def test_list_product_when_searched_pages(self, auth_api_client, product_factory):
+        for index in range(7):
+            product_factory(
+                name=f"Lamp {index}", description=" ".join(["lamp"] * (index % 3))
+            )
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"q": "lamp", "limit": 2})
+        ids = []
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            ids += [p["id"] for p in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            response = auth_api_client.get(response.data["next"])
+        assert len(ids) == len(set(ids)) == 7
+
+        response = auth_api_client.get(url, data={"q": "lamp", "limit": 7})
+        assert [p["id"] for p in response.data["results"]] == ids
+
+    @pytest.fixture
+    def faceted_products(
+        self, product_factory, product_line_factory, product_attribute_factory
+    ):
+        """
+        Products with lines of the given (color, size), the last one inactive.
+        """
+        products = {}
+        for slug, lines in [
+            ("red-m", [("red", "M")]),
+            ("blue-m", [("blue", "M")]),
+            ("red-s", [("red", "S"), ("green", "L")]),
+        ]:
+            product = product_factory(slug=slug, product_lines__size=0)
+            for index, values in enumerate(lines):
+                line = product_line_factory(
+                    product=product, is_active=index == 0, attributes__size=0
+                )
+                for attribute, value in zip(["color", "size"], values):
+                    product_attribute_factory(
+                        product_line=line, attribute__slug=attribute, value=value
+                    )
+            products[slug] = product
+        return products
+
+    @pytest.mark.parametrize(
+        "params, expected",
+        [
+            ({}, ["red-m", "blue-m", "red-s"]),
+            ({"attr.color": "red"}, ["red-m", "red-s"]),
+            ({"attr.color": "red,blue"}, ["red-m", "blue-m", "red-s"]),
+            ({"attr.color": "red", "attr.size": "M"}, ["red-m"]),
+            ({"attr.color": "green"}, []),
+            ({"attr.unknown": "red"}, []),
+        ],
+    )
+    def test_list_product_when_filtered_by_attributes(
+        self, auth_api_client, faceted_products, params, expected
+    ):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data=params)
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(p["slug"] for p in response.data["results"]) == sorted(expected)
+
+    def test_list_product_facets(self, auth_api_client, faceted_products):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url)
+        assert response.data["facets"] == {
+            "color": [{"value": "red", "count": 2}, {"value": "blue", "count": 1}],
+            "size": [{"value": "M", "count": 2}, {"value": "S", "count": 1}],
+        }
+
+    def test_list_product_facets_when_filtered(self, auth_api_client, faceted_products):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"attr.color": "red"})
+        assert response.data["facets"] == {
+            "color": [{"value": "red", "count": 2}, {"value": "blue", "count": 1}],
+            "size": [{"value": "M", "count": 1}, {"value": "S", "count": 1}],
+        }
+
+        response = auth_api_client.get(url, data={"attr.size": "S", "q": "xyzzy"})
+        assert response.data["facets"] == {}
+
+    def test_list_product_facets_when_paged(
+        self, auth_api_client, faceted_products, django_assert_num_queries
+    ):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"limit": 2})
+        facets = response.data["facets"]
+
+        response = auth_api_client.get(response.data["next"])
+        assert "facets" not in response.data
+        response = auth_api_client.get(response.data["previous"])
+        assert response.data["facets"] == facets
+
+        # Shared by the orderings and page sizes of the listing, from the cache.
+        with django_assert_num_queries(QUERIES_PRODUCT_LIST - 1) as context:
+            response = auth_api_client.get(url, data={"ordering": "min_price"})
+        assert response.data["facets"] == facets
+        for query in context.captured_queries:
+            assert "products_productfacet" not in query["sql"]
+
+    def test_list_product_facets_when_attribute_added(
+        self, auth_api_client, faceted_products, product_attribute_factory
+    ):
+        url = reverse("api:product-list")
+        auth_api_client.get(url)
+
+        line = faceted_products["blue-m"].product_lines.get(is_active=True)
+        product_attribute_factory(
+            product_line=line, attribute__slug="material", value="wood"
+        )
+        response = auth_api_client.get(url)
+
+        assert response.data["facets"]["material"] == [{"value": "wood", "count": 1}]
+        response = auth_api_client.get(url, data={"attr.material": "wood"})
+        assert [p["slug"] for p in response.data["results"]] == ["blue-m"]
+
+    @pytest.fixture
+    def priced_products(self, product_factory, product_line_factory):
+        """
+        Products with active lines of the given (price, stock).
+        """
+        products = {}
+        for slug, lines in [
+            ("cheap", [("5.00", 0), ("30.00", 0)]),
+            ("middle", [("10.00", 2)]),
+            ("pricey", [("20.00", 1), ("40.00", 0)]),
+            ("unpriced", []),
+        ]:
+            product = product_factory(slug=slug, product_lines__size=0)
+            for price, stock in lines:
+                product_line_factory(
+                    product=product, price=Decimal(price), stock_quantity=stock
+                )
+            products[slug] = product
+        return products
+
+    def test_list_product_summary(self, auth_api_client, priced_products):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"ordering": "min_price"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"][0]["min_price"] == "5.00"
+        assert response.data["results"][0]["max_price"] == "30.00"
+        assert response.data["results"][0]["total_stock"] == 0
+        assert response.data["results"][0]["active_line_count"] == 2
+
+    @pytest.mark.parametrize(
+        "params, expected",
+        [
+            ({"in_stock": "true"}, ["middle", "pricey"]),
+            ({"in_stock": "false"}, ["cheap", "unpriced"]),
+            ({"ordering": "min_price"}, ["cheap", "middle", "pricey", "unpriced"]),
+            ({"ordering": "-min_price"}, ["pricey", "middle", "cheap", "unpriced"]),
+            ({"ordering": "max_price"}, ["middle", "cheap", "pricey", "unpriced"]),
+            ({"ordering": "min_price", "in_stock": "1"}, ["middle", "pricey"]),
+        ],
+    )
+    def test_list_product_when_filtered_by_summary(
+        self, auth_api_client, priced_products, params, expected
+    ):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data=params)
+        assert response.status_code == status.HTTP_200_OK
+        slugs = [p["slug"] for p in response.data["results"]]
+        if "ordering" not in params:
+            slugs.sort()
+        assert slugs == expected
+
+    def test_list_product_when_ordered_by_price_pages(
+        self, auth_api_client, priced_products
+    ):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"ordering": "-min_price", "limit": 1})
+        slugs = []
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            slugs += [p["slug"] for p in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            response = auth_api_client.get(response.data["next"])
+        assert slugs == ["pricey", "middle", "cheap", "unpriced"]
+
+        # And back, from the products without a price.
+        while response.data["previous"] is not None:
+            response = auth_api_client.get(response.data["previous"])
+            slugs.append(response.data["results"][0]["slug"])
+        assert slugs[4:] == ["cheap", "middle", "pricey"]
+
+    @pytest.mark.parametrize("size", [1, 25])
+    def test_list_product_query_count(
+        self, auth_api_client, product_factory, django_assert_num_queries, size
+    ):
+        product_factory.create_batch(size)
+        url = reverse("api:product-list")
+        with django_assert_num_queries(QUERIES_PRODUCT_LIST):
+            response = auth_api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == size
+
+    def test_list_product_when_fields(self, auth_api_client, product):
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url, data={"fields": "id,name"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == [
+            {"id": str(product.id), "name": product.name}
+        ]
+
+    @pytest.mark.parametrize("size", [1, 25])
+    def test_list_product_when_expanded(
+        self, auth_api_client, product_factory, django_assert_num_queries, size
+    ):
+        product_factory.create_batch(size, product_lines__size=2)
+        url = reverse("api:product-list")
+        data = {"fields": "name,product_lines.sku", "expand": "product_lines"}
+        # The lines are prefetched, the category and brand are not joined.
+        with django_assert_num_queries(QUERIES_PRODUCT_LIST + 1) as context:
+            response = auth_api_client.get(url, data=data)
+        assert response.status_code == status.HTTP_200_OK
+        assert "products_category" not in context.captured_queries[4]["sql"]
+        assert len(response.data["results"]) == size
+        for result in response.data["results"]:
+            assert set(result) == {"name", "product_lines"}
+            assert [set(line) for line in result["product_lines"]] == [{"sku"}] * 2
+
+    def test_get_product_when_fields(
+        self, auth_api_client, product_factory, django_assert_num_queries
+    ):
+        product = product_factory(product_lines__size=2, images__size=2)
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        data = {"fields": "name,category.slug,product_lines.sku"}
+        with django_assert_num_queries(QUERIES_PRODUCT_DETAIL_SPARSE):
+            response = auth_api_client.get(url, data=data)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["name"] == product.name
+        assert response.data["category"] == {"slug": product.category.slug}
+        assert {line["sku"] for line in response.data["product_lines"]} == {
+            line.sku for line in product.product_lines.all()
+        }
+        assert set(response.data) == {"name", "category", "product_lines"}
+
+    @pytest.mark.parametrize("size", [1, 25])
+    def test_get_product_query_count(
+        self, auth_api_client, product_factory, django_assert_num_queries, size
+    ):
+        product = product_factory(product_lines__size=size, images__size=size)
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        with django_assert_num_queries(QUERIES_PRODUCT_DETAIL):
+            response = auth_api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["product_lines"]) == size
+        assert len(response.data["images"]) == size
+
+    def test_get_product_when_not_modified(
+        self, auth_api_client, product, django_assert_num_queries
+    ):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response = auth_api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Last-Modified"] == http_date(product.updated_at.timestamp())
+
+        cache.clear()
+        with django_assert_num_queries(QUERIES_NOT_MODIFIED):
+            not_modified = auth_api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not_modified["ETag"] == response["ETag"]
+        assert not_modified.content == b""
+
+        not_modified = auth_api_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda product: product.product_lines.first().save(),
+            lambda product: product.images.first().delete(),
+            lambda product: product.brand.save(),
+        ],
+    )
+    def test_get_product_when_modified(self, auth_api_client, product_factory, change):
+        product = product_factory(product_lines__size=2, images__size=2)
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response = auth_api_client.get(url)
+
+        change(product)
+        modified = auth_api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert modified.status_code == status.HTTP_200_OK
+        assert modified["ETag"] != response["ETag"]
+
+    def test_get_product_etag_when_fields(self, auth_api_client, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response = auth_api_client.get(url)
+        sparse = auth_api_client.get(url, data={"fields": "name"})
+        assert sparse["ETag"] != response["ETag"]
+
+    def test_list_product_when_not_modified(self, auth_api_client, product_factory):
+        product_factory.create_batch(2)
+        url = reverse("api:product-list")
+        response = auth_api_client.get(url)
+
+        not_modified = auth_api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+        product_factory()
+        modified = auth_api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert modified.status_code == status.HTTP_200_OK
+        assert len(modified.data["results"]) == 3
+
     def test_create_product_when_unauthenticated(self, api_client, product_factory):
         url = reverse("api:product-list")
         data = model_to_dict(product_factory.build())
@@ -646,6 +1151,93 @@ class TestProductEndpoint:
         response = api_client.delete(url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
+    def test_export_products_when_unauthenticated(self, api_client):
+        url = reverse("api:product-export")
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_export_products(self, auth_api_client, product_factory):
+        products = product_factory.create_batch(3, is_active=True)
+        product_factory(is_active=False)
+        url = reverse("api:product-export")
+        response = auth_api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("application/x-ndjson")
+        items = export_items(response)
+        assert sorted(item["slug"] for item in items) == sorted(
+            product.slug for product in products
+        )
+        product = next(item for item in items if item["slug"] == products[0].slug)
+        line = products[0].product_lines.order_by("id").first()
+        exported_line = next(
+            item for item in product["product_lines"] if item["sku"] == line.sku
+        )
+        assert exported_line["price"] == str(line.price)
+        assert exported_line["attributes"] == {
+            attribute.attribute.slug: attribute.value
+            for attribute in line.productattribute_set.all()
+        }
+        assert len(product["images"]) == products[0].images.count()
+        assert product["images"][0]["image"].startswith("http://testserver/")
+
+    def test_export_products_as_csv(self, auth_api_client, product_factory):
+        product_factory.create_batch(2, is_active=True, product_lines__size=3)
+        url = reverse("api:product-export")
+        response = auth_api_client.get(url, data={"format": "csv"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.getvalue().decode())))
+        assert len(rows) == 6
+        assert rows[0]["attributes"].count("=") == 2
+
+    def test_export_products_when_updated_since(self, auth_api_client, product_factory):
+        updated, changed_line, unchanged, inactive = product_factory.create_batch(
+            4, is_active=True
+        )
+        since = timezone.now()
+        Product.objects.update(updated_at=since - timedelta(days=1))
+        ProductLine.objects.update(updated_at=since - timedelta(days=1))
+        ProductImage.objects.update(updated_at=since - timedelta(days=1))
+        ProductAttribute.objects.update(updated_at=since - timedelta(days=1))
+        updated.save()
+        changed_line.product_lines.first().save()
+        inactive.is_active = False
+        inactive.save()
+
+        url = reverse("api:product-export")
+        response = auth_api_client.get(url, data={"updated_since": since.isoformat()})
+        assert response.status_code == status.HTTP_200_OK
+        items = {item["slug"]: item for item in export_items(response)}
+        assert set(items) == {updated.slug, changed_line.slug, inactive.slug}
+        assert items[inactive.slug]["is_active"] is False
+
+    def test_export_products_when_invalid_updated_since(self, auth_api_client):
+        url = reverse("api:product-export")
+        response = auth_api_client.get(url, data={"updated_since": "yesterday"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_products_when_filtered_by_category(
+        self, auth_api_client, product_factory, category_tree
+    ):
+        product = product_factory(category=category_tree["root_1_1"], is_active=True)
+        product_factory(category=category_tree["root_2"], is_active=True)
+        url = reverse("api:product-export")
+        response = auth_api_client.get(
+            url, data={"category": "root_1", "descendants": "true"}
+        )
+        assert [item["slug"] for item in export_items(response)] == [product.slug]
+
+    @pytest.mark.parametrize("size", [1, 10])
+    def test_export_products_query_count(
+        self, auth_api_client, product_factory, django_assert_num_queries, size
+    ):
+        product_factory.create_batch(size, is_active=True)
+        url = reverse("api:product-export")
+        with django_assert_num_queries(QUERIES_PRODUCT_EXPORT):
+            response = auth_api_client.get(url)
+            items = export_items(response)
+        assert len(items) == size
+
 
 @pytest.mark.e2e
 class TestProductLineEndpoint:
@@ -689,6 +1281,18 @@ class TestProductLineEndpoint:
         assert response.data["sku"] == product_line.sku
         assert response.data["product"]["id"] == str(product_line.product.id)
 
+    def test_get_product_line_when_not_modified(self, auth_api_client, product_line):
+        url = reverse("api:productline-detail", kwargs={"sku": product_line.sku})
+        response = auth_api_client.get(url)
+        not_modified = auth_api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+        attribute = product_line.productattribute_set.first()
+        attribute.value = "changed"
+        attribute.save()
+        modified = auth_api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert modified.status_code == status.HTTP_200_OK
+
     def test_get_product_line_when_dont_exists(self, admin_api_client):
         url = reverse("api:productline-detail", kwargs={"sku": "test-sku"})
         response = admin_api_client.get(url)
@@ -706,14 +1310,29 @@ class TestProductLineEndpoint:
         url = reverse("api:productline-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 10
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 10
 
+    def test_list_product_line_when_expanded(self, auth_api_client, product_line):
+        url = reverse("api:productline-list")
+        data = {"fields": "sku", "expand": "product"}
+        response = auth_api_client.get(url, data=data)
+        assert response.status_code == status.HTTP_200_OK
+        [result] = response.data["results"]
+        assert set(result) == {"sku", "product"}
+        assert result["product"]["id"] == str(product_line.product.id)
+
+    def test_get_product_line_when_fields(self, auth_api_client, product_line):
+        url = reverse("api:productline-detail", kwargs={"sku": product_line.sku})
+        response = auth_api_client.get(url, data={"fields": "sku,price,unknown"})
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {"sku", "price"}
+
     def test_list_product_line_when_dont_exists(self, admin_api_client):
         url = reverse("api:productline-list")
         response = admin_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 0
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 0
 
     def test_create_product_line_when_unauthenticated(self, api_client, product_line):
@@ -913,6 +1532,246 @@ class TestProductLineEndpoint:
         response = auth_api_client.delete(url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
+    def test_bulk_product_lines_when_unauthenticated(self, api_client):
+        url = reverse("api:productline-bulk")
+        response = api_client.post(url, data=[], format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_bulk_product_lines(
+        self, auth_api_client, user, product_factory, product_line_factory, attribute
+    ):
+        product = product_factory(owner=user, product_lines=None)
+        existing = product_line_factory(product=product, price=Decimal("1.00"))
+        url = reverse("api:productline-bulk")
+        data = [
+            {"sku": existing.sku, "price": "2.00", "product": str(product.id)},
+            {
+                "sku": "NEW-SKU",
+                "price": "3.00",
+                "stock_quantity": 4,
+                "is_active": True,
+                "product": str(product.id),
+                "attributes": [{"attribute": attribute.slug, "value": "red"}],
+            },
+        ]
+        response = auth_api_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["sku"] for item in response.data] == [existing.sku, "NEW-SKU"]
+        existing.refresh_from_db()
+        assert existing.price == Decimal("2.00")
+        assert existing.productattribute_set.count() == 2
+        new = ProductLine.objects.get(sku="NEW-SKU")
+        assert new.stock_quantity == 4
+        assert new.created_by == user
+        assert list(new.productattribute_set.values_list("value", flat=True)) == ["red"]
+
+    def test_bulk_product_lines_replaces_attributes(
+        self,
+        auth_api_client,
+        user,
+        product_line_factory,
+        attribute,
+        purger,
+        django_capture_on_commit_callbacks,
+    ):
+        existing = product_line_factory(product__owner=user)
+        replaced = existing.productattribute_set.first()
+        url = reverse("api:productline-bulk")
+        data = [
+            {
+                "sku": existing.sku,
+                "price": "2.00",
+                "product": str(existing.product_id),
+                "attributes": [{"attribute": attribute.slug, "value": "blue"}],
+            }
+        ]
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_api_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert list(existing.productattribute_set.values_list("value", flat=True)) == [
+            "blue"
+        ]
+        assert f"productattribute:{replaced.id}" in purger.keys
+
+    def test_bulk_product_lines_when_invalid_items(
+        self, auth_api_client, user, user_factory, product_factory, product_line
+    ):
+        product = product_factory(owner=user)
+        other_product = product_factory(owner=user_factory(username="other_user"))
+        url = reverse("api:productline-bulk")
+        data = [
+            {"sku": "SKU-1", "price": "1.00", "product": str(product.id)},
+            {"sku": "SKU-2", "price": "1.00", "product": str(other_product.id)},
+            {"sku": "SKU-3", "price": "-1.00", "product": str(product.id)},
+            {"sku": "SKU-1", "price": "1.00", "product": str(product.id)},
+            {"sku": product_line.sku, "price": "1.00", "product": str(product.id)},
+            {
+                "sku": "SKU-4",
+                "price": "1.00",
+                "product": str(product.id),
+                "attributes": [{"attribute": "unknown", "value": "red"}],
+            },
+        ]
+        response = auth_api_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [list(errors) for errors in response.data] == [
+            [],
+            ["product"],
+            ["price"],
+            ["sku"],
+            ["sku"],
+            ["attributes"],
+        ]
+        assert not ProductLine.objects.filter(sku__startswith="SKU-").exists()
+
+    def test_bulk_product_lines_when_empty(self, auth_api_client):
+        url = reverse("api:productline-bulk")
+        response = auth_api_client.post(url, data=[], format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.parametrize("size", [1, 20])
+    def test_bulk_product_lines_query_count(
+        self,
+        auth_api_client,
+        user,
+        product_factory,
+        product_line_factory,
+        attribute,
+        django_assert_num_queries,
+        size,
+    ):
+        product = product_factory(owner=user, product_lines=None)
+        existing = product_line_factory.create_batch(size, product=product)
+        data = [
+            {
+                "sku": sku,
+                "price": "1.00",
+                "product": str(product.id),
+                "attributes": [{"attribute": attribute.slug, "value": "red"}],
+            }
+            for sku in [line.sku for line in existing]
+            + [f"NEW-{index}" for index in range(size)]
+        ]
+        url = reverse("api:productline-bulk")
+        with django_assert_num_queries(QUERIES_PRODUCT_LINE_BULK):
+            response = auth_api_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert ProductAttribute.objects.filter(value="red").count() == 2 * size
+
+    def test_reserve_product_line(self, auth_api_client, product_line_factory):
+        product_line = product_line_factory(stock_quantity=5, is_active=True)
+        url = reverse("api:productline-reserve", kwargs={"sku": product_line.sku})
+        response = auth_api_client.post(url, data={"quantity": 2}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"sku": product_line.sku, "stock_quantity": 3}
+        product_line.refresh_from_db()
+        assert product_line.stock_quantity == 3
+
+    def test_reserve_product_line_when_unauthenticated(self, api_client, product_line):
+        url = reverse("api:productline-reserve", kwargs={"sku": product_line.sku})
+        response = api_client.post(url, data={"quantity": 1}, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_reserve_product_line_when_insufficient_stock(
+        self, auth_api_client, product_line_factory
+    ):
+        product_line = product_line_factory(stock_quantity=1, is_active=True)
+        url = reverse("api:productline-reserve", kwargs={"sku": product_line.sku})
+        response = auth_api_client.post(url, data={"quantity": 2}, format="json")
+        assert response.status_code == status.HTTP_409_CONFLICT
+        product_line.refresh_from_db()
+        assert product_line.stock_quantity == 1
+
+    def test_reserve_product_line_when_inactive(
+        self, auth_api_client, product_line_factory
+    ):
+        product_line = product_line_factory(stock_quantity=5, is_active=False)
+        url = reverse("api:productline-reserve", kwargs={"sku": product_line.sku})
+        response = auth_api_client.post(url, data={"quantity": 1}, format="json")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize("quantity", [0, -1, "abc", None])
+    def test_reserve_product_line_when_invalid_quantity(
+        self, auth_api_client, product_line, quantity
+    ):
+        url = reverse("api:productline-reserve", kwargs={"sku": product_line.sku})
+        response = auth_api_client.post(url, data={"quantity": quantity}, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_release_product_line_when_admin_authenticated(
+        self, admin_api_client, product_line_factory
+    ):
+        product_line = product_line_factory(stock_quantity=5)
+        url = reverse("api:productline-release", kwargs={"sku": product_line.sku})
+        response = admin_api_client.post(url, data={"quantity": 2}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["stock_quantity"] == 7
+
+    def test_release_product_line_when_authenticated(
+        self, auth_api_client, product_line
+    ):
+        url = reverse("api:productline-release", kwargs={"sku": product_line.sku})
+        response = auth_api_client.post(url, data={"quantity": 1}, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_reserve_many_product_lines(self, auth_api_client, product_line_factory):
+        first, second = product_line_factory.create_batch(
+            2, stock_quantity=5, is_active=True
+        )
+        url = reverse("api:productline-reserve-many")
+        data = {
+            "items": [
+                {"sku": second.sku, "quantity": 1},
+                {"sku": first.sku, "quantity": 5},
+            ]
+        }
+        response = auth_api_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(response.data, key=lambda item: item["sku"]) == sorted(
+            [
+                {"sku": first.sku, "stock_quantity": 0},
+                {"sku": second.sku, "stock_quantity": 4},
+            ],
+            key=lambda item: item["sku"],
+        )
+
+    def test_reserve_many_product_lines_when_one_insufficient(
+        self, auth_api_client, product_line_factory
+    ):
+        first, second = product_line_factory.create_batch(
+            2, stock_quantity=5, is_active=True
+        )
+        url = reverse("api:productline-reserve-many")
+        data = {
+            "items": [
+                {"sku": first.sku, "quantity": 1},
+                {"sku": second.sku, "quantity": 6},
+            ]
+        }
+        response = auth_api_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_409_CONFLICT
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert (first.stock_quantity, second.stock_quantity) == (5, 5)
+
+    def test_reserve_many_product_lines_when_duplicated(
+        self, auth_api_client, product_line
+    ):
+        url = reverse("api:productline-reserve-many")
+        item = {"sku": product_line.sku, "quantity": 1}
+        response = auth_api_client.post(
+            url, data={"items": [item, item]}, format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_release_many_product_lines_when_authenticated(
+        self, auth_api_client, product_line
+    ):
+        url = reverse("api:productline-release-many")
+        data = {"items": [{"sku": product_line.sku, "quantity": 1}]}
+        response = auth_api_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
 
 class TestProductImageEndpoint:
     def test_get_product_image_when_unauthenticated(self, api_client, product_image):
@@ -954,14 +1813,14 @@ class TestProductImageEndpoint:
         url = reverse("api:productimage-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 10
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 10
 
     def test_list_product_image_when_dont_exists(self, auth_api_client):
         url = reverse("api:productimage-list")
         response = auth_api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data["count"] == 0
+        assert response.data["next"] is None
         assert len(response.data["results"]) == 0
 
     def test_create_product_image_when_unauthenticated(self, api_client, product_image):
@@ -1117,3 +1976,57 @@ class TestProductImageEndpoint:
         url = reverse("api:productimage-detail", kwargs={"pk": product_image.pk})
         response = auth_api_client.delete(url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestAutocompleteEndpoint:
+    def test_autocomplete_when_unauthenticated(self, api_client):
+        url = reverse("api:autocomplete-list")
+        response = api_client.get(url, data={"q": "a"})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_autocomplete(
+        self, auth_api_client, product_factory, brand_factory, category_factory
+    ):
+        brand = brand_factory(name="Acme Works", slug="acme")
+        category = category_factory(name="Accessories", slug="accessories")
+        product_factory.create_batch(2, brand=brand, category=category)
+        product_factory(name="Blue Acme Lamp", slug="lamp")
+        product_factory(name="Acoustic Guitar", slug="guitar", is_active=False)
+        url = reverse("api:autocomplete-list")
+        response = auth_api_client.get(url, data={"q": "Ac"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data[0] == {
+            "type": "brand",
+            "name": "Acme Works",
+            "slug": "acme",
+        }
+        assert response.data[1]["slug"] == "accessories"
+        assert [s["slug"] for s in response.data if s["type"] == "product"] == ["lamp"]
+
+        response = auth_api_client.get(url, data={"q": "acme l"})
+        assert [s["slug"] for s in response.data] == ["lamp"]
+
+    def test_autocomplete_when_catalog_changes(self, auth_api_client, product):
+        url = reverse("api:autocomplete-list")
+        response = auth_api_client.get(url, data={"q": "zephyr"})
+        assert response.data == []
+
+        product.name = "Zephyr Fan"
+        product.save()
+        response = auth_api_client.get(url, data={"q": "zephyr"})
+        assert [s["slug"] for s in response.data] == [product.slug]
+
+    @pytest.mark.parametrize("limit", ["0", "21", "ten"])
+    def test_autocomplete_when_invalid_limit(self, auth_api_client, limit):
+        url = reverse("api:autocomplete-list")
+        response = auth_api_client.get(url, data={"q": "a", "limit": limit})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_autocomplete_query_count(
+        self, auth_api_client, product, django_assert_num_queries
+    ):
+        url = reverse("api:autocomplete-list")
+        auth_api_client.get(url, data={"q": "a"})
+        with django_assert_num_queries(QUERIES_AUTOCOMPLETE):
+            response = auth_api_client.get(url, data={"q": "b"})
+        assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,20 @@
+from ecommerce.products.api.export import _Merge
+
+
+class TestMerge:
+    def test_pop(self):
+        rows = [{"product_id": 1}, {"product_id": 1}, {"product_id": 3}]
+        merge = _Merge(iter(rows), "product_id")
+
+        assert merge.pop(1) == rows[:2]
+        assert merge.pop(2) == []
+        assert merge.pop(3) == rows[2:]
+        assert merge.pop(4) == []
+
+    def test_pop_when_product_missing(self):
+        # E.g. a product deactivated after the lines were read, before itself.
+        rows = [{"product_id": 1}, {"product_id": 2}, {"product_id": 3}]
+        merge = _Merge(iter(rows), "product_id")
+
+        assert merge.pop(1) == rows[:1]
+        assert merge.pop(3) == rows[2:]
@@ -31,6 +31,15 @@ class TestUrls:
         assert reverse_url == "/api/categories/"
         assert resolved_url == "api:category-list"
 
+    def test_category_tree(self):
+        """
+        Test category tree url resolution.
+        """
+        reverse_url = reverse("api:category-tree")
+        resolved_url = resolve("/api/categories/tree/").view_name
+        assert reverse_url == "/api/categories/tree/"
+        assert resolved_url == "api:category-tree"
+
     def test_attribute_detail(self, attribute: Attribute):
         """
         Test attribute detail url resolution.
@@ -87,6 +96,24 @@ class TestUrls:
         assert reverse_url == "/api/products/"
         assert resolved_url == "api:product-list"
 
+    def test_product_export(self):
+        """
+        Test product export url resolution.
+        """
+        reverse_url = reverse("api:product-export")
+        resolved_url = resolve("/api/products/export/").view_name
+        assert reverse_url == "/api/products/export/"
+        assert resolved_url == "api:product-export"
+
+    def test_autocomplete(self):
+        """
+        Test autocomplete url resolution.
+        """
+        reverse_url = reverse("api:autocomplete-list")
+        resolved_url = resolve("/api/autocomplete/").view_name
+        assert reverse_url == "/api/autocomplete/"
+        assert resolved_url == "api:autocomplete-list"
+
     def test_product_line_detail(self, product_line: ProductLine):
         """
         Test product detail url resolution.
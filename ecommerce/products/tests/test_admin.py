@@ -10,6 +10,8 @@ from ecommerce.products.tests.factories import (
     ProductFactory,
 )
 from ecommerce.users.models import User
+from ecommerce.utils.cache import get_versions
+from ecommerce.utils.cdn import LocalPurger
 from ecommerce.utils.serializer import model_to_dict
 
 pytestmark = [pytest.mark.django_db, pytest.mark.e2e]
@@ -45,6 +47,7 @@ class TestAttributeAdmin:
         assert db_attribute.is_active
         assert attribute.created_by == db_attribute.created_by
         assert admin_user == db_attribute.updated_by
+        assert db_attribute.updated_at > attribute.updated_at
 
     def test_make_inactive(
         self, admin_client: Client, attribute: Attribute, admin_user: User
@@ -61,6 +64,7 @@ class TestAttributeAdmin:
         assert not db_attribute.is_active
         assert attribute.created_by == db_attribute.created_by
         assert admin_user == db_attribute.updated_by
+        assert db_attribute.updated_at > attribute.updated_at
 
     def test_add(self, admin_client: Client):
         """Test that the add page is accessible."""
@@ -147,6 +151,7 @@ class TestCategoryAdmin:
         assert db_category.is_active
         assert category.created_by == db_category.created_by
         assert admin_user == db_category.updated_by
+        assert db_category.updated_at > category.updated_at
 
     def test_make_inactive(
         self, admin_client: Client, category: Category, admin_user: User
@@ -163,6 +168,7 @@ class TestCategoryAdmin:
         assert not db_category.is_active
         assert category.created_by == db_category.created_by
         assert admin_user == db_category.updated_by
+        assert db_category.updated_at > category.updated_at
 
     def test_add(
         self,
@@ -261,6 +267,20 @@ class TestProductAdmin:
         response = admin_client.get(url, data={"q": "test"})
         assert response.status_code == status.HTTP_200_OK
 
+    def test_search_description(
+        self, admin_client: Client, admin_user: User, product_factory
+    ):
+        """Test that the search matches the description of the products."""
+        product = product_factory(description="A sturdy oak table")
+        product_factory(description="A soft cushion")
+        # The factories reset the password of the admin user, log it in again.
+        admin_user.refresh_from_db()
+        admin_client.force_login(admin_user)
+        url = reverse("admin:products_product_changelist")
+        response = admin_client.get(url, data={"q": "oak"})
+        assert response.status_code == status.HTTP_200_OK
+        assert list(response.context["cl"].result_list) == [product]
+
     def test_make_active(
         self, admin_client: Client, product: Product, admin_user: User
     ):
@@ -276,6 +296,7 @@ class TestProductAdmin:
         assert db_product.is_active
         assert product.created_by == db_product.created_by
         assert admin_user == db_product.updated_by
+        assert db_product.updated_at > product.updated_at
 
     def test_make_inactive(
         self, admin_client: Client, product: Product, admin_user: User
@@ -292,6 +313,35 @@ class TestProductAdmin:
         assert not db_product.is_active
         assert product.created_by == db_product.created_by
         assert admin_user == db_product.updated_by
+        assert db_product.updated_at > product.updated_at
+
+    def test_make_inactive_invalidates_cache(
+        self, admin_client: Client, product: Product
+    ):
+        """Test that the make_inactive action invalidates the cached payloads."""
+        version = get_versions([Product])
+        url = reverse("admin:products_product_changelist")
+        admin_client.post(
+            url, data={"action": "make_inactive", "_selected_action": [product.pk]}
+        )
+
+        assert get_versions([Product]) != version
+
+    def test_make_inactive_purges_cdn(
+        self,
+        admin_client: Client,
+        product: Product,
+        purger: LocalPurger,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test that the make_inactive action purges the products from the CDN."""
+        url = reverse("admin:products_product_changelist")
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_client.post(
+                url, data={"action": "make_inactive", "_selected_action": [product.pk]}
+            )
+
+        assert purger.keys == {f"product:{product.pk}", "product:list"}
 
     def test_add(
         self,
@@ -398,6 +448,7 @@ class TestBrandAdmin:
         assert db_brand.is_active
         assert brand.created_by == db_brand.created_by
         assert admin_user == db_brand.updated_by
+        assert db_brand.updated_at > brand.updated_at
 
     def test_make_inactive(self, admin_client: Client, brand: Brand, admin_user: User):
         """Test that the make_inactive action is working."""
@@ -412,6 +463,7 @@ class TestBrandAdmin:
         assert not db_brand.is_active
         assert brand.created_by == db_brand.created_by
         assert admin_user == db_brand.updated_by
+        assert db_brand.updated_at > brand.updated_at
 
     def test_add(
         self, admin_client: Client, brand_factory: BrandFactory, admin_user: User
@@ -1,10 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
 import pytest
+from django.db import connection
+from django.db.models import F
 
 from ecommerce.products.models import (
     Brand,
     Category,
+    InsufficientStock,
     Product,
     ProductAttribute,
+    ProductFacet,
     ProductImage,
     ProductLine,
 )
@@ -23,9 +30,72 @@ class TestBrandModels:
 
 
 class TestProductModels:
+    def get_summary(self, product):
+        product.refresh_from_db()
+        return (
+            product.min_price,
+            product.max_price,
+            product.total_stock,
+            product.active_line_count,
+        )
+
     def test_product_str(self, product: Product):
         assert str(product) == f"{product.slug}"
 
+    def test_product_summary_of_active_lines(
+        self, product_factory, product_line_factory
+    ):
+        product, other = product_factory.create_batch(2, product_lines__size=0)
+        assert self.get_summary(product) == (None, None, 0, 0)
+
+        lines = [
+            product_line_factory(product=product, price=price, stock_quantity=stock)
+            for price, stock in [(Decimal("5"), 2), (Decimal("8"), 3)]
+        ]
+        product_line_factory(product=product, price=Decimal("1"), is_active=False)
+        assert self.get_summary(product) == (Decimal("5"), Decimal("8"), 5, 2)
+
+        ProductLine.objects.filter(pk=lines[0].pk).update(is_active=False)
+        assert self.get_summary(product) == (Decimal("8"), Decimal("8"), 3, 1)
+
+        ProductLine.objects.filter(pk=lines[1].pk).update(product=other)
+        assert self.get_summary(product) == (None, None, 0, 0)
+        assert self.get_summary(other) == (Decimal("8"), Decimal("8"), 3, 1)
+
+        ProductLine.objects.reserve({lines[1].sku: 2})
+        assert self.get_summary(other) == (Decimal("8"), Decimal("8"), 1, 1)
+
+        lines[1].delete()
+        assert self.get_summary(other) == (None, None, 0, 0)
+
+    def test_product_summary_when_prices_change(
+        self, product_factory, product_line_factory
+    ):
+        product = product_factory(product_lines__size=0)
+        cheap, dear = [
+            product_line_factory(product=product, price=price, stock_quantity=1)
+            for price in [Decimal("5"), Decimal("8")]
+        ]
+        product_line_factory(product=product, price=Decimal("2"))
+        assert self.get_summary(product)[:2] == (Decimal("2"), Decimal("8"))
+
+        ProductLine.objects.filter(pk=dear.pk).update(price=Decimal("1"))
+        assert self.get_summary(product)[:2] == (Decimal("1"), Decimal("5"))
+
+        ProductLine.objects.filter(pk__in=[cheap.pk, dear.pk]).update(
+            stock_quantity=F("stock_quantity") + 1
+        )
+        assert self.get_summary(product)[:2] == (Decimal("1"), Decimal("5"))
+
+    def test_product_summary_when_saved_stale(self, product_line):
+        product = Product.objects.get(pk=product_line.product_id)
+        product_line.stock_quantity += 1
+        product_line.save()
+
+        product.save()
+
+        assert self.get_summary(product)[2] == product_line.stock_quantity
+
 
 class TestProductLineModels:
     def test_product_line_str(self, product_line: ProductLine):
@@ -34,6 +104,70 @@ class TestProductLineModels:
             f"{product_line.product.slug}({product_line.sku})"
         )
 
+    def test_reserve(self, product_line_factory):
+        product_line = product_line_factory(stock_quantity=5, is_active=True)
+        levels = ProductLine.objects.reserve({product_line.sku: 2})
+        assert levels == {product_line.sku: 3}
+
+    def test_reserve_when_insufficient_stock(self, product_line_factory):
+        product_line = product_line_factory(stock_quantity=1, is_active=True)
+        with pytest.raises(InsufficientStock):
+            ProductLine.objects.reserve({product_line.sku: 2})
+
+    def test_release(self, product_line_factory):
+        product_line = product_line_factory(stock_quantity=1, is_active=False)
+        levels = ProductLine.objects.release({product_line.sku: 2})
+        assert levels == {product_line.sku: 3}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reserve_when_concurrent(self, product_line_factory):
+        product_line = product_line_factory(stock_quantity=5, is_active=True)
+
+        def reserve(_):
+            try:
+                ProductLine.objects.reserve({product_line.sku: 1})
+                return True
+            except InsufficientStock:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(reserve, range(20)))
+
+        product_line.refresh_from_db()
+        assert results.count(True) == 5
+        assert product_line.stock_quantity == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reserve_when_concurrent_across_products(
+        self, product_factory, product_line_factory
+    ):
+        product, other = product_factory.create_batch(2, product_lines__size=0)
+        # The SKU order crosses the products in opposite orders.
+        carts = [
+            [
+                product_line_factory(sku="a1", product=product, stock_quantity=50),
+                product_line_factory(sku="b1", product=other, stock_quantity=50),
+            ],
+            [
+                product_line_factory(sku="a2", product=other, stock_quantity=50),
+                product_line_factory(sku="b2", product=product, stock_quantity=50),
+            ],
+        ]
+
+        def reserve(index):
+            try:
+                ProductLine.objects.reserve({line.sku: 1 for line in carts[index % 2]})
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(reserve, range(40)))
+
+        product.refresh_from_db()
+        assert product.total_stock == 60
+
 
 class TestProductImageModels:
     def test_product_image_str(self, product_image: ProductImage):
@@ -51,3 +185,43 @@ class TestProductAttributeModels:
             f"{product_attribute.product_line.product.slug}"
             f"({product_attribute.attribute.slug}) - {product_attribute.value}"
         )
+
+
+class TestProductFacetModels:
+    def get_facets(self, product):
+        facets = ProductFacet.objects.filter(product=product)
+        return dict(facets.values_list("value", "line_count"))
+
+    def test_product_facet_str(self, product_attribute: ProductAttribute):
+        facet = ProductFacet.objects.get()
+        assert str(facet) == (
+            f"{product_attribute.product_line.product.slug}"
+            f"({product_attribute.attribute.slug}) - {product_attribute.value}"
+        )
+
+    def test_product_facet_counts_active_lines(
+        self, product_factory, product_line_factory, product_attribute_factory
+    ):
+        product, other = product_factory.create_batch(2, product_lines__size=0)
+        lines = product_line_factory.create_batch(
+            3, product=product, attributes__size=0
+        )
+        for line, value in zip(lines, ["red", "red", "blue"]):
+            product_attribute_factory(
+                product_line=line, attribute__slug="color", value=value
+            )
+        assert self.get_facets(product) == {"red": 2, "blue": 1}
+
+        ProductLine.objects.filter(pk=lines[0].pk).update(is_active=False)
+        assert self.get_facets(product) == {"red": 1, "blue": 1}
+
+        ProductLine.objects.filter(pk=lines[1].pk).update(product=other)
+        assert self.get_facets(product) == {"blue": 1}
+        assert self.get_facets(other) == {"red": 1}
+
+        ProductAttribute.objects.filter(product_line=lines[2]).update(value="green")
+        assert self.get_facets(product) == {"green": 1}
+
+        lines[2].delete()
+        ProductLine.objects.filter(pk=lines[0].pk).update(is_active=True)
+        assert self.get_facets(product) == {"red": 1}
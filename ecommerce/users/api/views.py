@@ -9,12 +9,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from ecommerce.utils.views import AtomicWritesMixin
+
 from .serializers import UserDetailsSerializer, UserSerializer
 
 User = get_user_model()
 
 
-class UserViewSet(RetrieveModelMixin, GenericViewSet):
+class UserViewSet(AtomicWritesMixin, RetrieveModelMixin, GenericViewSet):
     serializer_class = UserSerializer
     queryset = User.objects.all()
 
@@ -0,0 +1,91 @@
+import hashlib
+import time
+from collections.abc import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+
+
+def get_version_key(model: type[Model]) -> str:
+    """
+    Return the cache key holding the version of a model.
+    """
+    return f"version:{model._meta.label_lower}"
+
+
+def get_versions(models: Iterable[type[Model]]) -> list[int]:
+    """
+    Return the current cache version of each model.
+
+    A missing version is seeded with the current time, so a version evicted from
+    the cache never comes back with a value already used by older entries.
+    """
+    keys = [get_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_bumped_at_key(model: type[Model]) -> str:
+    """
+    Return the cache key holding the time the version of a model was last bumped.
+    """
+    return f"bumped_at:{model._meta.label_lower}"
+
+
+def bump_version(model: type[Model]):
+    """
+    Bump the cache version of a model, orphaning every entry built from it.
+    """
+    key = get_version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+    cache.set(get_bumped_at_key(model), time.time(), None)
+
+
+def bumped_since(models: Iterable[type[Model]], timestamp: float) -> bool:
+    """
+    Return whether the version of one of the models was bumped after ``timestamp``.
+    """
+    times = cache.get_many([get_bumped_at_key(model) for model in models])
+    return any(bumped_at > timestamp for bumped_at in times.values())
+
+
+def invalidate_model_cache(model: type[Model]):
+    """
+    Invalidate the cached payloads built from a model.
+
+    The version is bumped right away, so the current transaction reads its own
+    writes, and once more on commit, so entries rebuilt by concurrent requests
+    from the previous snapshot are dropped too.
+    """
+    bump_version(model)
+    transaction.on_commit(lambda: bump_version(model))
+
+
+def get_cache_key(prefix: str, models: Iterable[type[Model]], *parts) -> str:
+    """
+    Return the cache key of a value built from the given models, and identified
+    by ``parts``, e.g. the request url.
+    """
+    models = list(models)
+    versions = get_versions(models)
+    digest = hashlib.md5(
+        f"{':'.join(map(str, parts))}:{versions}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"{prefix}:{models[0]._meta.label_lower}:{digest}"
+
+
+def get_response_cache_key(
+    request, models: Iterable[type[Model]], prefix: str = "response"
+) -> str:
+    """
+    Return the cache key of a response built from the given models.
+    """
+    return get_cache_key(prefix, models, request.build_absolute_uri())
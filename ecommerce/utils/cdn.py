@@ -0,0 +1,338 @@
+import functools
+import json
+import logging
+import threading
+import urllib.request
+import weakref
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Model, QuerySet
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from ecommerce.utils.serializer import get_relation
+
+logger = logging.getLogger(__name__)
+
+SURROGATE_KEY_HEADER = "Surrogate-Key"
+SURROGATE_CONTROL_HEADER = "Surrogate-Control"
+
+
+def get_model_key(model: type[Model]) -> str:
+    """
+    Return the surrogate key of every response reading rows of a model.
+    """
+    return model._meta.model_name
+
+
+def get_surrogate_keys(serializer: BaseSerializer, data, listed: bool = False):
+    """
+    Return the surrogate keys of a payload rendered by a serializer.
+
+    The payload is tagged with the key of every model it reads, e.g. ``product``,
+    the key of every object it names by id, e.g. ``product:<id>``, and the list
+    key, e.g. ``product:list``, of the models whose rows it reads without naming
+    them, in lists and through flat fields like ``category.name``.
+
+    params:
+        serializer: Serializer, or ``ListSerializer``, which rendered the payload
+        data: rendered object, or list of objects
+        listed: whether the objects are the rows of a list
+    """
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    items = data if isinstance(data, list) else [data]
+    model = serializer.Meta.model
+    key = get_model_key(model)
+
+    keys = {key}
+    if listed:
+        keys.add(f"{key}:list")
+    else:
+        keys.update(f"{key}:{item['id']}" for item in items if item.get("id"))
+
+    for name, field in serializer.fields.items():
+        nested = field.child if isinstance(field, ListSerializer) else field
+        if isinstance(nested, BaseSerializer):
+            if getattr(getattr(nested, "Meta", None), "model", None) is None:
+                continue
+            children = []
+            for item in items:
+                value = item.get(name)
+                children += value if isinstance(value, list) else [value]
+            children = [child for child in children if child]
+            keys |= get_surrogate_keys(nested, children, listed)
+            continue
+
+        related = model
+        for attribute in field.source_attrs[:-1]:
+            relation = get_relation(related, attribute)
+            if relation is None:
+                break
+            related = relation.related_model
+            # Only the rows tracking their changes are purged, e.g. not the users.
+            if any(f.name == "updated_at" for f in related._meta.concrete_fields):
+                keys |= {get_model_key(related), f"{get_model_key(related)}:list"}
+    return keys
+
+
+def get_purge_keys(model: type[Model], pk, **parents) -> set[str]:
+    """
+    Return the surrogate keys to purge when a row changes: its own key, the list
+    key of its model and the keys of its parents.
+
+    params:
+        model: model of the row
+        pk: primary key of the row
+        parents: primary keys of the parents, by attribute name, e.g. ``product_id``
+    """
+    key = get_model_key(model)
+    keys = {f"{key}:{pk}", f"{key}:list"}
+    for attname, parent_pk in parents.items():
+        if parent_pk is not None:
+            field = model._meta.get_field(attname.removesuffix("_id"))
+            keys.add(f"{get_model_key(field.related_model)}:{parent_pk}")
+    return keys
+
+
+def get_parent_attnames(model: type[Model]) -> list[str]:
+    """
+    Return the attribute names of the parents a model lists, in its
+    ``surrogate_key_parents``, as rendered along with them.
+    """
+    parents = getattr(model, "surrogate_key_parents", [])
+    return [model._meta.get_field(name).attname for name in parents]
+
+
+def purge_instances(instances: Iterable[Model]):
+    """
+    Purge the responses rendering the given instances.
+    """
+    keys = set()
+    for instance in instances:
+        model = type(instance)
+        parents = {
+            attname: getattr(instance, attname)
+            for attname in get_parent_attnames(model)
+        }
+        keys |= get_purge_keys(model, instance.pk, **parents)
+    purge(keys)
+
+
+def purge_queryset(queryset: QuerySet):
+    """
+    Purge the responses rendering the rows of a queryset, read in one query, e.g.
+    before a bulk update.
+    """
+    model = queryset.model
+    attnames = get_parent_attnames(model)
+    keys = {f"{get_model_key(model)}:list"}
+    for pk, *parent_pks in queryset.order_by().values_list("pk", *attnames):
+        keys |= get_purge_keys(model, pk, **dict(zip(attnames, parent_pks)))
+    purge(keys)
+
+
+def purge_models(models: Iterable[type[Model]]):
+    """
+    Purge every response reading rows of the given models, e.g. after an import.
+    """
+    purge({get_model_key(model) for model in models})
+
+
+class PurgeBatch:
+    """
+    Surrogate keys purged at once when the transaction they were queued in
+    commits. A batch is registered once per savepoint with ``on_commit``, which
+    drops it, keys included, if the savepoint rolls back.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.sent = False
+
+    def __call__(self):
+        self.sent = True
+        send_purge(self.keys)
+
+
+class PurgeWorker:
+    """
+    Daemon thread purging the keys of the committed transactions, so that the
+    writes do not wait for the CDN. The keys queued while a purge runs are merged
+    into the next one. Keys still queued when the process exits are lost, their
+    CDN entries expire on their own.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.busy = False
+        self.thread = None
+        self.condition = threading.Condition()
+
+    def submit(self, keys: Iterable[str]):
+        with self.condition:
+            self.keys |= set(keys)
+            # Started on first use, and again in the processes forked since.
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name="cdn-purge", daemon=True
+                )
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+                self.condition.wait_for(lambda: self.keys)
+                keys, self.keys = self.keys, set()
+                self.busy = True
+            purge_now(keys)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """
+        Wait until the keys submitted are purged, and return whether they are.
+        """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: not self.keys and not self.busy, timeout
+            )
+
+
+purge_worker = PurgeWorker()
+# Batches of the transactions in progress, by database and savepoints. Only
+# on_commit holds them, so the batches it drops on rollback go away.
+pending_batches = threading.local()
+
+
+def purge_now(keys: set[str]):
+    try:
+        get_purger().purge(sorted(keys))
+    except Exception:
+        # The writes are committed, the CDN entries expire on their own.
+        logger.exception("Failed to purge %d surrogate keys.", len(keys))
+
+
+def send_purge(keys: set[str]):
+    """
+    Purge keys now, or from the worker if the purger calls a remote API.
+    """
+    if get_purger().background:
+        purge_worker.submit(keys)
+    else:
+        purge_now(keys)
+
+
+def purge(keys: Iterable[str]):
+    """
+    Queue surrogate keys for the purger, which is called once the transaction
+    commits, or right away outside of one.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        send_purge(keys)
+        return
+    batches = getattr(pending_batches, "batches", None)
+    if batches is None:
+        batches = pending_batches.batches = weakref.WeakValueDictionary()
+    # One batch per savepoint, so a rollback drops the keys queued since.
+    key = (connection.alias, tuple(connection.savepoint_ids))
+    batch = batches.get(key)
+    if batch is None or batch.sent:
+        batch = batches[key] = PurgeBatch()
+        transaction.on_commit(batch)
+    batch.keys |= keys
+
+
+class BasePurger:
+    """
+    Purge surrogate keys from a CDN, in batches of at most ``max_keys``.
+    """
+
+    max_keys = 256
+    # Whether the purges are sent from the worker thread, e.g. over the network.
+    background = False
+
+    def purge(self, keys: list[str]):
+        for start in range(0, len(keys), self.max_keys):
+            self.purge_batch(keys[start : start + self.max_keys])
+
+    def purge_batch(self, keys: list[str]):
+        raise NotImplementedError
+
+
+class NullPurger(BasePurger):
+    """
+    Drop the keys, when no CDN caches the responses.
+    """
+
+    def purge_batch(self, keys: list[str]):
+        pass
+
+
+class LocalPurger(BasePurger):
+    """
+    Keep the batches of keys purged in memory, for the tests.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+    @property
+    def keys(self) -> set[str]:
+        return {key for batch in self.batches for key in batch}
+
+    def purge_batch(self, keys: list[str]):
+        self.batches.append(keys)
+
+
+class FastlyPurger(BasePurger):
+    """
+    Purge the keys through the Fastly API, softly by default, so the stale
+    entries can still be served while they are fetched again.
+    """
+
+    url = "https://api.fastly.com/service/{service_id}/purge"
+    background = True
+
+    def __init__(self, service_id: str, token: str, soft: bool = True, timeout=5):
+        self.url = self.url.format(service_id=service_id)
+        self.token = token
+        self.soft = soft
+        self.timeout = timeout
+
+    def purge_batch(self, keys: list[str]):
+        headers = {"Fastly-Key": self.token, "Content-Type": "application/json"}
+        if self.soft:
+            headers["Fastly-Soft-Purge"] = "1"
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"surrogate_keys": keys}).encode(),
+            headers=headers,
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+@functools.cache
+def get_purger() -> BasePurger:
+    """
+    Return the purger configured by the ``CDN_PURGER`` setting.
+    """
+    config = settings.CDN_PURGER
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_purger(setting, **kwargs):
+    if setting == "CDN_PURGER":
+        get_purger.cache_clear()
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+LOGIN_PATH = "/api/auth/login/"
+REFRESH_PATH = "/api/auth/token/refresh/"
+# Exceptions a transport raises when the server drops or refuses a request.
+TRANSPORT_ERRORS = (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError)
+
+
+@dataclass
+class Response:
+    status: int
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class ASGITransport:
+    """
+    Send the requests to an ASGI application, in the process.
+    """
+
+    def __init__(self, app, host: str = "localhost"):
+        self.app = app
+        self.host = host
+
+    async def request(self, method: str, path: str, headers=None, body=b""):
+        path, _, query = path.partition("?")
+        headers = {
+            "host": self.host,
+            "content-length": str(len(body)),
+            **(headers or {}),
+        }
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers.items()
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": (self.host, 80),
+        }
+        received, done = False, asyncio.Event()
+        status, chunks = 500, []
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            done.set()
+        return Response(status, b"".join(chunks))
+
+    async def close(self):
+        pass
+
+
+class HTTPTransport:
+    """
+    Send the requests over a keep-alive HTTP/1.1 connection, opened on the first
+    request and again after the server closes it.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers=None, body=b""):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        headers = {
+            "Host": f"{self.host}:{self.port}",
+            "Content-Length": str(len(body)),
+            **(headers or {}),
+        }
+        lines = [f"{method} {path} HTTP/1.1"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            return await self.read_response()
+        except TRANSPORT_ERRORS:
+            await self.close()
+            raise
+
+    async def read_response(self) -> Response:
+        status = int((await self.reader.readuntil(b"\r\n")).split()[1])
+        headers = {}
+        while (line := await self.reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if not size:
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            # The last chunk is followed by an empty trailer.
+            await self.reader.readuntil(b"\r\n")
+            body = b"".join(chunks)
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            await self.close()
+        return Response(status, body)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+@dataclass
+class Step:
+    """
+    A request of a scenario, and the statuses answering it as expected.
+    """
+
+    name: str
+    method: str
+    path: str
+    data: dict | None = None
+    expected: tuple[int, ...] = (200,)
+
+
+@dataclass
+class Scenario:
+    """
+    The requests of a virtual user, drawn one at a time by ``next_step``, and the
+    credentials it logs in with, anonymous without.
+    """
+
+    name: str
+    next_step: Callable[[random.Random], Step]
+    credentials: dict | None = None
+
+
+class VirtualUser:
+    """
+    Run a scenario in a loop, logging in once through ``dj_rest_auth`` and
+    sending the JWT access token with every request. The token is refreshed when
+    it expires.
+    """
+
+    def __init__(self, transport, scenario: Scenario, seed: int):
+        self.transport = transport
+        self.scenario = scenario
+        self.rng = random.Random(seed)
+        self.access = self.refresh = None
+
+    async def send(self, method: str, path: str, data=None) -> Response:
+        headers = {"Accept": "application/json"}
+        body = b""
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(data).encode()
+        if self.access:
+            headers["Authorization"] = f"Bearer {self.access}"
+        return await self.transport.request(method, path, headers, body)
+
+    async def login(self) -> Response | None:
+        if self.scenario.credentials is None:
+            return None
+        response = await self.send("POST", LOGIN_PATH, self.scenario.credentials)
+        if response.status == 200:
+            tokens = response.json()
+            self.access, self.refresh = tokens["access_token"], tokens["refresh_token"]
+        return response
+
+    async def request(self, step: Step) -> Response:
+        response = await self.send(step.method, step.path, step.data)
+        if response.status == 401 and self.refresh:
+            refreshed = await self.send("POST", REFRESH_PATH, {"refresh": self.refresh})
+            if refreshed.status == 200:
+                self.access = refreshed.json()["access"]
+                response = await self.send(step.method, step.path, step.data)
+        return response
+
+    async def run(self, stats, start: float, deadline: float, think_time: float):
+        """
+        Send requests until the deadline, recording those sent after ``start``.
+        """
+        while time.monotonic() < deadline:
+            step = self.scenario.next_step(self.rng)
+            sent, begin = time.monotonic(), time.perf_counter()
+            try:
+                response = await self.request(step)
+            except TRANSPORT_ERRORS as exc:
+                status, error = type(exc).__name__, True
+            else:
+                status, error = response.status, response.status not in step.expected
+            if sent >= start:
+                name = f"{self.scenario.name} {step.name}"
+                stats.record(name, time.perf_counter() - begin, status, error)
+            if think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / think_time))
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+@dataclass
+class LoadStats:
+    """
+    Latencies, in seconds, statuses and errors of the requests, by step name.
+    """
+
+    latencies: dict = field(default_factory=lambda: defaultdict(list))
+    statuses: dict = field(default_factory=lambda: defaultdict(Counter))
+    errors: Counter = field(default_factory=Counter)
+
+    def record(self, name: str, latency: float, status, error: bool):
+        self.latencies[name].append(latency)
+        self.statuses[name][str(status)] += 1
+        if error:
+            self.errors[name] += 1
+
+    def summary(self, duration: float) -> list[dict]:
+        """
+        Return the throughput, error rate and latency percentiles of every step,
+        and of all of them, under ``total``.
+        """
+        rows = [
+            summarize(name, latencies, self.errors[name], self.statuses[name], duration)
+            for name, latencies in sorted(self.latencies.items())
+        ]
+        if rows:
+            latencies, statuses = [], Counter()
+            for name, values in self.latencies.items():
+                latencies += values
+                statuses.update(self.statuses[name])
+            errors = sum(self.errors.values())
+            rows.append(summarize("total", latencies, errors, statuses, duration))
+        return rows
+
+
+def summarize(name, latencies, errors, statuses, duration) -> dict:
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "throughput": round(len(latencies) / duration, 2),
+        "error_rate": round(errors / len(latencies), 4),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "statuses": dict(statuses),
+    }
+
+
+async def run_load(
+    transport_factory: Callable,
+    scenarios: list[Scenario],
+    duration: float,
+    think_time: float = 0,
+    seed: int = 0,
+    warmup: float = 0,
+) -> tuple[LoadStats, LoadStats, float]:
+    """
+    Log the virtual users in, one per scenario and with a transport each, then
+    run them concurrently for ``warmup`` seconds, not recorded, and ``duration``
+    seconds.
+
+    Return the statistics of the logins, of the scenarios, and the measured
+    duration of the recorded run.
+    """
+    users = [
+        VirtualUser(transport_factory(), scenario, seed + index)
+        for index, scenario in enumerate(scenarios)
+    ]
+    logins = LoadStats()
+
+    async def login(user):
+        start = time.perf_counter()
+        try:
+            response = await user.login()
+        except TRANSPORT_ERRORS as exc:
+            status, error = type(exc).__name__, True
+        else:
+            if response is None:
+                return
+            status, error = response.status, response.status != 200
+        logins.record("login", time.perf_counter() - start, status, error)
+
+    await asyncio.gather(*(login(user) for user in users))
+
+    stats = LoadStats()
+    start = time.monotonic() + warmup
+    try:
+        await asyncio.gather(
+            *(user.run(stats, start, start + duration, think_time) for user in users)
+        )
+    finally:
+        for user in users:
+            await user.transport.close()
+    return logins, stats, time.monotonic() - start
@@ -0,0 +1,218 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from rest_framework.serializers import ListSerializer, Serializer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Buckets of the durations, in seconds, and of the query counts.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\""),
+        )
+        for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+class Histogram:
+    """
+    Distribution of observed values, counted in cumulative buckets by label
+    values, exposed in the Prometheus text format.
+
+    Observations only take a lock and bump two counters, the buckets are made
+    cumulative when the histogram is collected.
+    """
+
+    def __init__(self, name: str, documentation: str, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # Counts of the buckets, of +Inf last, and the sum.
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0]
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    def collect(self) -> list[str]:
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, values in sorted(series.items()):
+            labels = dict(zip(self.labels, labels))
+            count = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), values):
+                count += bucket_count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(values[-1])}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+REQUEST_LABELS = ["endpoint", "method"]
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer a request.",
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries run by a request.",
+    REQUEST_LABELS,
+    QUERY_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries by a request.",
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+REQUEST_SERIALIZER_DURATION = Histogram(
+    "http_request_serializer_duration_seconds",
+    "Time spent in the serializers by a request, out of the database queries.",
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+HISTOGRAMS = [
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    REQUEST_DB_DURATION,
+    REQUEST_SERIALIZER_DURATION,
+]
+
+
+class RequestMetrics:
+    """
+    Queries and timings of the request being answered, recorded as a database
+    ``execute_wrapper``.
+    """
+
+    def __init__(self, collect_sql: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.statements = [] if collect_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            if self.statements is not None:
+                self.statements.append(sql)
+
+    def observe(self, duration: float, endpoint: str, method: str):
+        REQUEST_DURATION.observe(duration, endpoint, method)
+        REQUEST_QUERIES.observe(self.queries, endpoint, method)
+        REQUEST_DB_DURATION.observe(self.db_time, endpoint, method)
+        REQUEST_SERIALIZER_DURATION.observe(self.serializer_time, endpoint, method)
+
+
+current_request_metrics = contextvars.ContextVar("current_request_metrics")
+
+
+@contextlib.contextmanager
+def serializer_timer():
+    """
+    Add the time spent in the block, out of the database queries, to the
+    serializer time of the current request.
+    """
+    metrics = current_request_metrics.get(None)
+    # Serializers rendered by another one are part of its time already.
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    start, db_time = time.perf_counter(), metrics.db_time
+    metrics.serializing = True
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        elapsed = time.perf_counter() - start - (metrics.db_time - db_time)
+        metrics.serializer_time += elapsed
+
+
+def _timed_data(fget):
+    @functools.wraps(fget)
+    def data(self):
+        with serializer_timer():
+            return fget(self)
+
+    data.timed = True
+    return data
+
+
+def instrument_serializers():
+    """
+    Time the ``data`` of the serializers, which renders their instances.
+    """
+    for serializer_class in [Serializer, ListSerializer]:
+        fget = serializer_class.data.fget
+        if not getattr(fget, "timed", False):
+            serializer_class.data = property(_timed_data(fget))
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.collect()
+    return "\n".join(lines) + "\n"
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Expose the histograms of the process in the Prometheus text format.
+
+    When ``METRICS_TOKEN`` is set, the scraper must send it as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        authorization = request.headers.get("Authorization", "")
+        if not constant_time_compare(authorization, f"Bearer {token}"):
+            return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,279 @@
+import contextlib
+import json
+import logging
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.text import slugify
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from ecommerce.utils.cdn import SURROGATE_CONTROL_HEADER, SURROGATE_KEY_HEADER
+from ecommerce.utils.metrics import (
+    RequestMetrics,
+    current_request_metrics,
+    instrument_serializers,
+)
+from ecommerce.utils.profiling import Profiler
+from ecommerce.utils.queries import (
+    QueryInspector,
+    RepeatedQueriesError,
+    inspect_queries,
+)
+from ecommerce.utils.routers import replica_read, use_replica
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED_ENDPOINT = "<unresolved>"
+PRIMARY_PIN_COOKIE = "primary_pin"
+PROFILE_PARAM = "profile"
+PROFILE_HEADER = "X-Profile"
+# Content type and file extension of the profile formats.
+PROFILE_FORMATS = {
+    "speedscope": ("application/json", "speedscope.json"),
+    "collapsed": ("text/plain", "collapsed.txt"),
+}
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, the number and duration of the database queries, and
+    the serializer time of every request in the histograms of the process, by
+    URL name, e.g. ``api:product-list``.
+
+    Queries are counted by an ``execute_wrapper`` on every database, around the
+    rest of the middleware chain. The bodies of streaming responses are sent
+    after the request is recorded, their queries are not counted.
+
+    With ``METRICS_QUERY_THRESHOLD`` set, the SQL of the requests running more
+    queries than the threshold is logged.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.query_threshold = settings.METRICS_QUERY_THRESHOLD
+        instrument_serializers()
+
+    def __call__(self, request):
+        metrics = RequestMetrics(collect_sql=self.query_threshold is not None)
+        token = current_request_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        endpoint = match.view_name if match is not None else UNRESOLVED_ENDPOINT
+        metrics.observe(duration, endpoint, request.method)
+
+        if self.query_threshold is not None and metrics.queries > self.query_threshold:
+            logger.warning(
+                "%s %s ran %d queries in %.1f ms (threshold %d):\n%s",
+                request.method,
+                endpoint,
+                metrics.queries,
+                metrics.db_time * 1000,
+                self.query_threshold,
+                "\n".join(metrics.statements),
+            )
+        return response
+
+
+class QueryInspectionMiddleware:
+    """
+    Report the statements a request repeats more than ``REPEATED_QUERY_THRESHOLD``
+    times, by fingerprint, with the serializer field and the stack frame that
+    first repeated them, and the statements slower than ``SLOW_QUERY_THRESHOLD``
+    milliseconds.
+
+    The report is logged, or raised as a ``RepeatedQueriesError`` for repeated
+    statements when ``QUERY_INSPECTION_RAISE`` is set, so that the tests fail on
+    N+1 lookups.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.repeat_threshold = settings.REPEATED_QUERY_THRESHOLD
+        slow_threshold = settings.SLOW_QUERY_THRESHOLD
+        if self.repeat_threshold is None and slow_threshold is None:
+            raise MiddlewareNotUsed
+        self.slow_threshold = (
+            slow_threshold / 1000 if slow_threshold is not None else None
+        )
+        self.raise_on_repeat = settings.QUERY_INSPECTION_RAISE
+
+    def __call__(self, request):
+        inspector = QueryInspector(self.repeat_threshold, self.slow_threshold)
+        with inspect_queries(inspector):
+            response = self.get_response(request)
+
+        report = inspector.get_report(f"{request.method} {request.path}")
+        if report.repeated and self.raise_on_repeat:
+            raise RepeatedQueriesError(report)
+        if report:
+            logger.warning("%s", report)
+        return response
+
+
+def is_staff(request) -> bool:
+    """
+    Tell whether the request is sent by a staff user, logged in with a session or
+    with a JWT access token in the ``Authorization`` header.
+    """
+    if request.user.is_staff:
+        return True
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests of staff users asking for it with the ``profile`` query
+    parameter or the ``X-Profile`` header, set to ``speedscope`` or
+    ``collapsed``, when ``PROFILING_ENABLED`` is set.
+
+    The profile replaces the response, or is written to ``PROFILING_DIR`` and
+    named by the ``X-Profile`` header of the response. The time spent in the
+    authentication, permission checks, queryset evaluation, serialization and
+    rendering is sent in the ``Server-Timing`` header.
+
+    The middleware comes last, so that only the view and the rendering of its
+    response are profiled.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = settings.PROFILING_DIR
+
+    def __call__(self, request):
+        output = request.GET.get(PROFILE_PARAM, request.headers.get(PROFILE_HEADER))
+        if output is None or not is_staff(request):
+            return self.get_response(request)
+        if output not in PROFILE_FORMATS:
+            output = "speedscope"
+
+        with Profiler(f"{request.method} {request.path}") as profiler:
+            response = self.get_response(request)
+        if output == "speedscope":
+            content = json.dumps(profiler.speedscope())
+        else:
+            content = profiler.collapsed()
+        content_type, extension = PROFILE_FORMATS[output]
+
+        if self.directory is None:
+            profile = HttpResponse(content, content_type=content_type)
+            profile["X-Profile-Status"] = response.status_code
+        else:
+            profile = response
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method.lower()}"
+            name = f"{name}-{slugify(request.path.replace('/', '-'))}.{extension}"
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "w") as file:
+                file.write(content)
+            profile[PROFILE_HEADER] = name
+        profile["Server-Timing"] = profiler.server_timing()
+        return profile
+
+
+def get_primary_pin_key(user_id) -> str:
+    return f"primary-pin:{user_id}"
+
+
+def get_token_user_id(request):
+    """
+    Return the id of the user of the JWT access token in the ``Authorization``
+    header, if valid, without loading the user.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = header and authentication.get_raw_token(header)
+    if not raw_token:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    return token.get(jwt_settings.USER_ID_CLAIM)
+
+
+class ReplicaMiddleware:
+    """
+    Send the reads of the safe requests to one of the ``REPLICA_DATABASES``,
+    picked at random, when there are any.
+
+    The clients which wrote in the last ``PRIMARY_PIN_TIMEOUT`` seconds read
+    from the primary, so that they read their own writes while the replicas
+    catch up. A write pins the client with a cookie, and its user with a cache
+    key, read from the JWT access token of the following requests.
+
+    The responses whose payload was read from a replica, which may lag behind,
+    are private, kept out of the CDN.
+    """
+
+    def __init__(self, get_response):
+        self.replicas = settings.REPLICA_DATABASES
+        if not self.replicas:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.timeout = settings.PRIMARY_PIN_TIMEOUT
+
+    def __call__(self, request):
+        alias = None
+        if request.method in SAFE_METHODS and not self.is_pinned(request):
+            alias = random.choice(self.replicas)
+        with use_replica(alias):
+            response = self.get_response(request)
+            if replica_read.get():
+                self.make_private(response)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    def make_private(self, response):
+        """
+        Keep the responses rendered from a replica, which may lag behind the
+        primary, out of the shared caches, e.g. of the CDN.
+        """
+        patch_cache_control(response, private=True)
+        del response[SURROGATE_CONTROL_HEADER]
+        del response[SURROGATE_KEY_HEADER]
+
+    def is_pinned(self, request) -> bool:
+        if PRIMARY_PIN_COOKIE in request.COOKIES:
+            return True
+        user_id = get_token_user_id(request)
+        return user_id is not None and bool(cache.get(get_primary_pin_key(user_id)))
+
+    def pin(self, request, response):
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE,
+            "1",
+            max_age=self.timeout,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite="Lax",
+        )
+        # Set on the request by the authentication of the view.
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            cache.set(get_primary_pin_key(user.pk), True, self.timeout)
@@ -0,0 +1,166 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Func, Q, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+from rest_framework.utils.urls import remove_query_param
+
+
+class Row(Func):
+    """
+    Row value of expressions, e.g. ``(created_at, id)``, compared column by
+    column. It is typed as its first column.
+    """
+
+    template = "(%(expressions)s)"
+
+    def _resolve_output_field(self):
+        return self.get_source_fields()[0]
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination keyed on ``(created_at, id)``.
+
+    The cursor holds the key of the boundary row of the page, so every page is
+    fetched with a single index range scan, without ``OFFSET`` or ``COUNT(*)``,
+    and rows inserted while a client walks the list never shift the pages.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(queryset, position))
+
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_following = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Return the ordering given by the first filter backend of the view that
+        orders the request, e.g. by search rank, or the default keyset.
+        """
+        for backend in getattr(view, "filter_backends", []):
+            if not hasattr(backend, "get_ordering"):
+                continue
+            ordering = backend().get_ordering(request, queryset, view)
+            if ordering:
+                return tuple(ordering)
+        return self.ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Nothing before the cursor, so the following page is the first one.
+            return self.encode_cursor(Cursor(offset=0, reverse=False, position=None))
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def encode_cursor(self, cursor):
+        if cursor.position is None and not cursor.reverse:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[field_name]
+            else:
+                value = getattr(instance, field_name)
+            values.append(str(value))
+        return json.dumps(values)
+
+    def _get_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def _get_keyset_filter(self, queryset, position):
+        """
+        Build the filter matching the rows after ``position`` in the queryset
+        ordering, i.e. the row value comparison ``(a, b) < (x, y)``, which is a
+        single range of the ``(a, b)`` index.
+
+        Mixed directions have no row value comparison and are expanded as
+        ``a < x OR (a = x AND b < y)``, bounded by ``a <= x`` so the range scan
+        still starts at the cursor.
+        """
+        ordering = queryset.query.order_by
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = [self._get_field(queryset, order.lstrip("-")) for order in ordering]
+        try:
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+        descending = {order.startswith("-") for order in ordering}
+        if len(descending) == 1:
+            lookup = LessThan if descending.pop() else GreaterThan
+            columns = Row(*[F(order.lstrip("-")) for order in ordering])
+            cursor = Row(
+                *[
+                    Value(value, output_field=field)
+                    for field, value in zip(fields, values)
+                ]
+            )
+            return lookup(columns, cursor)
+
+        keyset_filter = Q()
+        equals = {}
+        for order, value in zip(ordering, values):
+            field_name = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") else "gt"
+            keyset_filter |= Q(**equals, **{f"{field_name}__{lookup}": value})
+            equals[field_name] = value
+        first, value = ordering[0], values[0]
+        bound = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{bound}": value}) & keyset_filter
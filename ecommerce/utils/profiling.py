@@ -0,0 +1,213 @@
+import inspect
+import sys
+import time
+from collections import Counter
+
+from django.db.models.query import QuerySet
+from django.db.models.sql.compiler import SQLCompiler, SQLInsertCompiler
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer, ListSerializer, Serializer
+from rest_framework.views import APIView
+
+from ecommerce.utils.serializer import Projection
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+# Phase of the time spent outside of the DRF phases, e.g. in the view itself.
+OTHER_PHASE = "other"
+
+
+def get_phases() -> dict:
+    """
+    Return the DRF phases of a request, by the code of the functions running
+    them. A phase called from another one, e.g. a queryset evaluated by a
+    serializer, counts as the inner one. Wrapped functions, e.g. the ``data`` of
+    the serializers timed by the metrics, are known by the code they wrap.
+    """
+    phases = {
+        APIView.perform_authentication: "authentication",
+        APIView.check_permissions: "permissions",
+        # Calls the has_object_permission of the permissions, e.g. IsOwner.
+        APIView.check_object_permissions: "permissions",
+        QuerySet._fetch_all: "queryset",
+        SQLCompiler.execute_sql: "queryset",
+        SQLInsertCompiler.execute_sql: "queryset",
+        BaseSerializer.data.fget: "serialization",
+        Serializer.data.fget: "serialization",
+        ListSerializer.data.fget: "serialization",
+        Projection.render: "serialization",
+        Response.rendered_content.fget: "rendering",
+    }
+    return {
+        inspect.unwrap(function).__code__: phase for function, phase in phases.items()
+    }
+
+
+class Profiler:
+    """
+    Deterministic profiler of the Python functions the current thread calls, as
+    a context manager, recording when each of them is entered and left.
+
+    The functions running a DRF phase are wrapped in a frame of the phase, e.g.
+    ``[serialization]``, so that the flamegraphs group them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.phases = get_phases()
+        # Name, file and line of the frames, and their index by code or phase.
+        self.frames: list[tuple[str, str | None, int | None]] = []
+        self.indexes: dict = {}
+        # Whether a frame is opened or closed, its index and the time, in order.
+        self.events: list[tuple[bool, int, float]] = []
+        # Frames to close when the function on top of the stack returns.
+        self.stack: list[tuple[int, ...]] = []
+        self.phase_stack: list[str] = []
+        self.start = self.end = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        sys.setprofile(self.trace)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.setprofile(None)
+        self.end = time.perf_counter()
+        # Leave out the call of this method, the last one recorded.
+        self.stack.pop()
+        self.events.pop()
+        while self.stack:
+            for index in reversed(self.stack.pop()):
+                self.events.append((False, index, self.end))
+
+    def get_index(self, key, name: str, file=None, line=None) -> int:
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = len(self.frames)
+            self.frames.append((name, file, line))
+        return index
+
+    def trace(self, frame, event: str, arg):
+        if event == "call":
+            now = time.perf_counter()
+            code = frame.f_code
+            indexes = ()
+            phase = self.phases.get(code)
+            if phase is not None and phase != self.current_phase:
+                self.phase_stack.append(phase)
+                indexes = (self.get_index(phase, f"[{phase}]"),)
+            index = self.indexes.get(code)
+            if index is None:
+                module = frame.f_globals.get("__name__", "?")
+                name = f"{module}.{code.co_qualname}"
+                index = self.get_index(
+                    code, name, code.co_filename, code.co_firstlineno
+                )
+            indexes += (index,)
+            for index in indexes:
+                self.events.append((True, index, now))
+            self.stack.append(indexes)
+        elif event == "return" and self.stack:
+            now = time.perf_counter()
+            indexes = self.stack.pop()
+            for index in reversed(indexes):
+                self.events.append((False, index, now))
+            if len(indexes) > 1:
+                self.phase_stack.pop()
+
+    @property
+    def current_phase(self) -> str | None:
+        return self.phase_stack[-1] if self.phase_stack else None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def get_self_times(self) -> Counter:
+        """
+        Return the seconds spent in every stack of frame indexes, excluding the
+        calls the top frame made.
+        """
+        times, stack, last = Counter(), [], self.start
+        for opened, index, at in self.events:
+            times[tuple(stack)] += at - last
+            last = at
+            if opened:
+                stack.append(index)
+            else:
+                stack.pop()
+        times[tuple(stack)] += self.end - last
+        return times
+
+    def get_phase_times(self) -> dict[str, float]:
+        """
+        Return the seconds spent in every phase, the time outside of them under
+        ``other``.
+        """
+        phases = {index: key for key, index in self.indexes.items() if type(key) is str}
+        times = dict.fromkeys([*sorted(set(phases.values())), OTHER_PHASE], 0.0)
+        for stack, seconds in self.get_self_times().items():
+            phase = next(
+                (phases[index] for index in reversed(stack) if index in phases),
+                OTHER_PHASE,
+            )
+            times[phase] += seconds
+        return times
+
+    def server_timing(self) -> str:
+        """
+        Return the phase times as the value of a ``Server-Timing`` header.
+        """
+        return ", ".join(
+            f"{phase};dur={seconds * 1000:.2f}"
+            for phase, seconds in self.get_phase_times().items()
+        )
+
+    def collapsed(self) -> str:
+        """
+        Return the profile as collapsed stacks, one ``root;caller;callee count``
+        line per stack, counting the microseconds spent in its top frame, e.g. for
+        flamegraph.pl or speedscope.
+        """
+        lines = []
+        for stack, seconds in sorted(self.get_self_times().items()):
+            microseconds = round(seconds * 10**6)
+            if microseconds:
+                names = [self.name] + [self.frames[index][0] for index in stack]
+                names = [name.replace(";", ":") for name in names]
+                lines.append(f"{';'.join(names)} {microseconds}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """
+        Return the profile as a speedscope evented profile, in milliseconds.
+        """
+        frames = []
+        for name, file, line in self.frames:
+            frame = {"name": name}
+            if file is not None:
+                frame.update(file=file, line=line)
+            frames.append(frame)
+        events = [
+            {
+                "type": "O" if opened else "C",
+                "frame": index,
+                "at": (at - self.start) * 1000,
+            }
+            for opened, index, at in self.events
+        ]
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "ecommerce",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "evented",
+                    "name": self.name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": self.duration * 1000,
+                    "events": events,
+                }
+            ],
+        }
@@ -0,0 +1,59 @@
+"""
+Fail the tests whose requests repeat a statement more than
+``REPEATED_QUERY_THRESHOLD`` times, as N+1 lookups do.
+
+The requests are inspected by the ``QueryInspectionMiddleware``, which raises in
+the tests. Tests repeating statements by design are marked with
+``allow_repeated_queries``, and the code run out of a request is checked with the
+``assert_no_repeated_queries`` fixture.
+"""
+
+import contextlib
+
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "allow_repeated_queries(threshold=None): allow the requests of the test to "
+        "repeat a statement, up to threshold times when given",
+    )
+
+
+@pytest.fixture(autouse=True)
+def _allow_repeated_queries(request):
+    marker = request.node.get_closest_marker("allow_repeated_queries")
+    if marker is None:
+        return
+    settings = request.getfixturevalue("settings")
+    threshold = marker.kwargs.get("threshold", marker.args[0] if marker.args else None)
+    if threshold is None:
+        settings.QUERY_INSPECTION_RAISE = False
+    else:
+        settings.REPEATED_QUERY_THRESHOLD = threshold
+
+
+@pytest.fixture
+def assert_no_repeated_queries(settings):
+    """
+    Return a context manager raising a ``RepeatedQueriesError`` when its block
+    repeats a statement more than ``REPEATED_QUERY_THRESHOLD`` times.
+    """
+    from ecommerce.utils.queries import (
+        QueryInspector,
+        RepeatedQueriesError,
+        inspect_queries,
+    )
+
+    @contextlib.contextmanager
+    def assert_no_repeated_queries(threshold=None):
+        if threshold is None:
+            threshold = settings.REPEATED_QUERY_THRESHOLD
+        with inspect_queries(QueryInspector(threshold)) as inspector:
+            yield inspector
+        report = inspector.get_report("block")
+        if report.repeated:
+            raise RepeatedQueriesError(report)
+
+    return assert_no_repeated_queries
@@ -0,0 +1,205 @@
+import contextlib
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+
+import django
+import rest_framework
+from django import db
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+# Literals, placeholders and lists of them, replaced to fingerprint a statement.
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"(?<![\w.\"])-?\d+(?:\.\d+)?(?![\w\"])")
+PLACEHOLDER_RE = re.compile(r"%s|\$\d+")
+LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+SPACE_RE = re.compile(r"\s+")
+# Statements repeated by design, e.g. by every nested atomic block.
+IGNORED_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+# Code running the statements, never reported as their caller, and libraries,
+# only reported along with the frame of the project calling them.
+UTILS_PATH = os.path.dirname(__file__)
+WRAPPER_PATHS = (
+    os.path.dirname(os.__file__),
+    os.path.dirname(db.__file__),
+    *(os.path.join(UTILS_PATH, name) for name in ["metrics.py", "middleware.py"]),
+    __file__,
+)
+LIBRARY_PATHS = (
+    os.path.dirname(django.__file__),
+    os.path.dirname(rest_framework.__file__),
+)
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Return the statement with its literals and placeholders replaced by ``?`` and
+    its lists of them by ``(...)``, so the statements only differing by their
+    parameters, or by the length of an ``IN`` list, share a fingerprint.
+    """
+    sql = STRING_RE.sub("?", sql)
+    sql = PLACEHOLDER_RE.sub("?", sql)
+    sql = NUMBER_RE.sub("?", sql)
+    sql = LIST_RE.sub("(...)", sql)
+    return SPACE_RE.sub(" ", sql).strip()
+
+
+def format_frame(frame) -> str:
+    path = os.path.relpath(frame.f_code.co_filename)
+    return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def get_caller() -> str | None:
+    """
+    Return the innermost stack frame running the statement, as
+    ``path:line in function``, followed by the innermost frame of the project
+    when the former is in Django or DRF.
+    """
+    frame, caller = sys._getframe(1), None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(WRAPPER_PATHS):
+            is_library = filename.startswith(LIBRARY_PATHS) or "-packages" in filename
+            if caller is None:
+                caller = format_frame(frame)
+                if not is_library:
+                    break
+            elif not is_library:
+                return f"{caller} via {format_frame(frame)}"
+        frame = frame.f_back
+    return caller
+
+
+def get_serializer_field() -> str | None:
+    """
+    Return the innermost serializer field being rendered, as ``Serializer.field``.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == "to_representation":
+            serializer = frame.f_locals.get("self")
+            serializer_field = frame.f_locals.get("field")
+            if isinstance(serializer, BaseSerializer) and serializer_field is not None:
+                return f"{type(serializer).__name__}.{serializer_field.field_name}"
+        frame = frame.f_back
+    return None
+
+
+@dataclass
+class RepeatedQuery:
+    fingerprint: str
+    count: int
+    field: str | None
+    caller: str | None
+
+    def __str__(self):
+        return (
+            f"{self.count} x {self.fingerprint}\n"
+            f"    field: {self.field or '-'}\n"
+            f"    from: {self.caller or '-'}"
+        )
+
+
+@dataclass
+class SlowQuery:
+    sql: str
+    duration: float
+    caller: str | None
+
+    def __str__(self):
+        return (
+            f"{self.duration * 1000:.1f} ms: {self.sql}\n"
+            f"    from: {self.caller or '-'}"
+        )
+
+
+@dataclass
+class QueryReport:
+    """
+    Statements of a request repeated more than the threshold, as N+1 lookups do,
+    and statements slower than the threshold.
+    """
+
+    name: str
+    repeated: list[RepeatedQuery] = field(default_factory=list)
+    slow: list[SlowQuery] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.repeated or self.slow)
+
+    def __str__(self):
+        lines = [f"Queries of {self.name}:"]
+        if self.repeated:
+            lines.append("Repeated queries, N+1 lookups may be missing a join:")
+            lines += [str(query) for query in self.repeated]
+        if self.slow:
+            lines.append("Slow queries:")
+            lines += [str(query) for query in self.slow]
+        return "\n".join(lines)
+
+
+class RepeatedQueriesError(AssertionError):
+    """
+    Raised when a request repeats a statement more than the threshold.
+    """
+
+    def __init__(self, report: QueryReport):
+        super().__init__(str(report))
+        self.report = report
+
+
+class QueryInspector:
+    """
+    Fingerprint the statements run while installed as a database
+    ``execute_wrapper``, and time them.
+
+    The serializer field and the stack frame of a fingerprint are captured when
+    it first repeats, so the stack is only walked for the repeated statements,
+    or when it first runs with a threshold of 0.
+    """
+
+    def __init__(self, repeat_threshold=None, slow_threshold=None):
+        self.repeat_threshold = repeat_threshold
+        self.capture_count = 1 if repeat_threshold == 0 else 2
+        self.slow_threshold = slow_threshold
+        self.counts = {}
+        self.origins = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if self.slow_threshold is not None and duration > self.slow_threshold:
+                self.slow.append(SlowQuery(sql, duration, get_caller()))
+            if not sql.lstrip().upper().startswith(IGNORED_PREFIXES):
+                key = fingerprint(sql)
+                count = self.counts[key] = self.counts.get(key, 0) + 1
+                if count == self.capture_count:
+                    self.origins[key] = (get_serializer_field(), get_caller())
+
+    def get_report(self, name: str) -> QueryReport:
+        report = QueryReport(name, slow=list(self.slow))
+        if self.repeat_threshold is not None:
+            for key, count in self.counts.items():
+                if count > self.repeat_threshold:
+                    report.repeated.append(
+                        RepeatedQuery(key, count, *self.origins[key])
+                    )
+        return report
+
+
+@contextlib.contextmanager
+def inspect_queries(inspector: QueryInspector):
+    """
+    Install the inspector on every database for the duration of the block.
+    """
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(inspector))
+        yield inspector
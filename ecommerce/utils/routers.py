@@ -0,0 +1,59 @@
+import contextlib
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Alias of the replica the reads of the current request are sent to, if any.
+current_replica = contextvars.ContextVar("current_replica", default=None)
+# Whether the current request read from the replica, whose rows may be stale.
+replica_read = contextvars.ContextVar("replica_read", default=False)
+
+
+@contextlib.contextmanager
+def use_replica(alias: str | None):
+    """
+    Send the reads to the replica ``alias`` in the block, or to the primary.
+    """
+    token = current_replica.set(alias)
+    read_token = replica_read.set(False)
+    try:
+        yield
+    finally:
+        replica_read.reset(read_token)
+        current_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send the reads to the replica of the current request, set by the
+    ``ReplicaMiddleware`` for the safe requests, and everything else to the
+    primary.
+
+    The reads run in a transaction of the primary, e.g. with the
+    ``ATOMIC_REQUESTS`` of the views, stay on the primary. After a write, the
+    rest of the request reads from the primary too, so that it sees the write.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = current_replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        replica_read.set(True)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        current_replica.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
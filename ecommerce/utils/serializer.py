@@ -1,6 +1,18 @@
-from django.db.models import Model
+from types import SimpleNamespace
+from urllib.parse import quote
+
+from django.db.models import Model, Prefetch, QuerySet
 from django.db.models.fields import UUIDField
 from django.db.models.fields.related import ForeignKey
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.settings import api_settings
+
+# Stands for the lookup value in the url templates of the projections.
+LOOKUP_PLACEHOLDER = "__lookup__"
+# Characters ``reverse()`` leaves unquoted in the url arguments.
+URL_SAFE_CHARACTERS = "!$&'()*+,;=/~:@"
 
 
 def model_to_dict(instance: Model, exclude_fields: list[str] = []):
@@ -29,3 +41,267 @@ def model_to_dict(instance: Model, exclude_fields: list[str] = []):
         else:
             data[f.name] = f.value_from_object(instance)
     return data
+
+
+def _prefix_lookup(prefix: str, lookup: str | Prefetch):
+    """
+    Prefix a prefetch lookup with the relation it is reached through.
+    """
+    if isinstance(lookup, Prefetch):
+        return Prefetch(
+            f"{prefix}__{lookup.prefetch_through}",
+            queryset=lookup.queryset,
+            to_attr=lookup.to_attr,
+        )
+    return f"{prefix}__{lookup}"
+
+
+def _lookup_root(lookup: str | Prefetch) -> str:
+    if isinstance(lookup, Prefetch):
+        lookup = lookup.prefetch_through
+    return lookup.split("__")[0]
+
+
+def get_query_plan(serializer: type[BaseSerializer] | BaseSerializer):
+    """
+    Build the relations to load along with the instances of a serializer.
+
+    Serializers declare the relations they read in ``Meta.select_related`` and
+    ``Meta.prefetch_related``. Nested serializers are walked recursively, so each
+    serializer only declares the relations it reads directly. Given a serializer
+    instance, e.g. one shaped by ``shape_serializer``, only the relations read by
+    its remaining fields are kept.
+
+    params:
+        serializer: Serializer class or instance used to render the instances
+
+    returns:
+        tuple with the ``select_related`` lookups and the ``prefetch_related``
+        lookups (strings or ``Prefetch`` objects)
+    """
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    meta = getattr(serializer, "Meta", None)
+    select_related = list(getattr(meta, "select_related", []))
+    prefetch_related = list(getattr(meta, "prefetch_related", []))
+
+    bound = isinstance(serializer, BaseSerializer)
+    if bound:
+        fields = serializer.fields
+        roots = {field.source.split(".")[0] for field in fields.values()}
+        select_related = [s for s in select_related if _lookup_root(s) in roots]
+        prefetch_related = [p for p in prefetch_related if _lookup_root(p) in roots]
+    else:
+        fields = getattr(serializer, "_declared_fields", {})
+
+    for name, field in fields.items():
+        many = isinstance(field, ListSerializer)
+        nested = field.child if many else field
+        if not isinstance(nested, BaseSerializer):
+            continue
+
+        lookup = (field.source or name).replace(".", "__")
+        nested_select, nested_prefetch = get_query_plan(
+            nested if bound else type(nested)
+        )
+        if many:
+            queryset = nested.Meta.model._default_manager.all()
+            if nested_select:
+                queryset = queryset.select_related(*nested_select)
+            if nested_prefetch:
+                queryset = queryset.prefetch_related(*nested_prefetch)
+            prefetch_related.append(Prefetch(lookup, queryset=queryset))
+        else:
+            select_related.append(lookup)
+            select_related += [f"{lookup}__{s}" for s in nested_select]
+            prefetch_related += [_prefix_lookup(lookup, p) for p in nested_prefetch]
+
+    return select_related, prefetch_related
+
+
+def get_relation(model: type[Model], attribute: str):
+    """
+    Return the relation of a model read through an attribute, or ``None``.
+    """
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+        name = field.name if field.concrete else field.get_accessor_name()
+        if name == attribute:
+            return field
+    return None
+
+
+def get_modified_lookups(
+    serializer: BaseSerializer,
+    model: type[Model] | None = None,
+    prefix: str = "",
+    many: bool = False,
+) -> dict[str, bool]:
+    """
+    Return the lookups of the related rows the fields of a serializer read, to
+    validate its payloads from their ``updated_at``.
+
+    params:
+        serializer: Serializer instance, or ``ListSerializer``
+        model: model the serializer reads, ``Meta.model`` by default
+        prefix: lookup the serializer is reached through
+        many: whether the prefix goes through a to-many relation
+
+    returns:
+        dictionary of the lookups of the related models having an ``updated_at``,
+        mapped to whether they go through a to-many relation
+    """
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    model = model or serializer.Meta.model
+    lookups = {}
+    for field in serializer.fields.values():
+        if field.source == "*":
+            continue
+        nested = field.child if isinstance(field, ListSerializer) else field
+        nested = nested if isinstance(nested, BaseSerializer) else None
+        # A flat field reads its last attribute from the row it is reached by.
+        attributes = field.source_attrs if nested else field.source_attrs[:-1]
+
+        related, path, to_many = model, prefix, many
+        for attribute in attributes:
+            relation = get_relation(related, attribute)
+            if relation is None:
+                break
+            related = relation.related_model
+            path = f"{path}__{relation.name}" if path else relation.name
+            to_many = to_many or relation.one_to_many or relation.many_to_many
+            if any(f.name == "updated_at" for f in related._meta.concrete_fields):
+                lookups[path] = to_many
+        else:
+            if nested is not None and path:
+                lookups.update(get_modified_lookups(nested, related, path, to_many))
+    return lookups
+
+
+def parse_field_paths(value: str | None) -> dict | None:
+    """
+    Parse a comma separated list of dotted field paths into a tree.
+
+    ``id,product_lines.sku`` becomes ``{"id": {}, "product_lines": {"sku": {}}}``,
+    an empty value becomes ``None``.
+    """
+    tree = {}
+    for path in (value or "").split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree or None
+
+
+def shape_serializer(serializer: BaseSerializer, fields: dict | None, expand: dict):
+    """
+    Prune and expand the fields of a serializer, and of its nested serializers.
+
+    Serializers list the relations that can be added to their output in
+    ``Meta.expandable_fields``, as the dotted path of a serializer class and its
+    arguments. The ``expand`` tree names the relations to add and the ``fields``
+    tree the fields to keep, expanded relations being always kept. Unknown names
+    are ignored.
+
+    params:
+        serializer: Serializer instance, or ``ListSerializer``, to shape in place
+        fields: tree of the fields to keep, ``None`` to keep them all
+        expand: tree of the expandable relations to add
+    """
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    expandable = getattr(getattr(serializer, "Meta", None), "expandable_fields", {})
+    for name in expand:
+        if name in expandable and name not in serializer.fields:
+            path, kwargs = expandable[name]
+            serializer.fields[name] = import_string(path)(read_only=True, **kwargs)
+
+    if fields is not None:
+        for name in list(serializer.fields):
+            if name not in fields and name not in expand:
+                del serializer.fields[name]
+
+    for name, field in serializer.fields.items():
+        if isinstance(field, BaseSerializer):
+            # A relation listed without subfields keeps all of them.
+            nested_fields = fields.get(name) if fields is not None else None
+            shape_serializer(field, nested_fields or None, expand.get(name, {}))
+
+
+class Projection:
+    """
+    Render a flat serializer from ``values()`` rows instead of model instances.
+
+    Every field is read as a ``values()`` lookup, ``category.name`` as
+    ``category__name``, and converted by its own ``to_representation``. The urls
+    are formatted from a template reversed once, so the output is the same as the
+    serializer's, without building a model instance or calling ``reverse()`` for
+    every row. Nested serializers and related fields are not supported.
+    """
+
+    def __init__(self, serializer: BaseSerializer):
+        model = serializer.Meta.model
+        context = serializer.context
+        self.columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.HyperlinkedIdentityField):
+                lookup = field.lookup_field
+                convert = self.get_url_converter(field)
+            elif isinstance(field, (BaseSerializer, serializers.RelatedField)):
+                raise TypeError(f"{name} of {type(serializer).__name__} is related.")
+            elif isinstance(field, serializers.FileField):
+                lookup = field.source
+                convert = self.get_file_converter(field, model, context)
+            else:
+                lookup = "__".join(field.source_attrs)
+                convert = field.to_representation
+            self.columns.append((name, lookup, convert))
+
+    def get_url_converter(self, field):
+        stub = SimpleNamespace(pk=LOOKUP_PLACEHOLDER)
+        setattr(stub, field.lookup_field, LOOKUP_PLACEHOLDER)
+        prefix, suffix = str(field.to_representation(stub)).split(LOOKUP_PLACEHOLDER)
+
+        def convert(value):
+            return f"{prefix}{quote(str(value), safe=URL_SAFE_CHARACTERS)}{suffix}"
+
+        return convert
+
+    def get_file_converter(self, field, model, context):
+        storage = model._meta.get_field(field.source).storage
+        request = context.get("request")
+        use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+
+        def convert(name):
+            # FileField.to_representation renders empty files as None.
+            if not name:
+                return None
+            if not use_url:
+                return name
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return convert
+
+    def values(self, queryset: QuerySet, *extra: str) -> QuerySet:
+        """
+        Return the rows the projection reads, with the ``extra`` lookups, e.g. the
+        keys of the pagination.
+        """
+        lookups = dict.fromkeys([lookup for _, lookup, _ in self.columns] + list(extra))
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def render(self, rows) -> list[dict]:
+        columns = self.columns
+        return [
+            {
+                name: None if row[lookup] is None else convert(row[lookup])
+                for name, lookup, convert in columns
+            }
+            for row in rows
+        ]
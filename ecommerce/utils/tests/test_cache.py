@@ -0,0 +1,131 @@
+import time
+
+import pytest
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from ecommerce.products.models import Brand, Product
+from ecommerce.utils.cache import bump_version, bumped_since, get_versions
+
+pytestmark = [pytest.mark.django_db]
+
+
+def catalog_queries(context: CaptureQueriesContext):
+    """
+    Return the captured queries reading the catalog tables.
+    """
+    return [q for q in context.captured_queries if "products_" in q["sql"]]
+
+
+class TestVersions:
+    def test_get_versions_when_missing(self):
+        versions = get_versions([Brand, Product])
+
+        assert len(versions) == 2
+        assert get_versions([Brand, Product]) == versions
+
+    def test_bump_version(self):
+        brand_version, product_version = get_versions([Brand, Product])
+        bump_version(Brand)
+
+        assert get_versions([Brand, Product]) == [brand_version + 1, product_version]
+
+    def test_bumped_since(self):
+        timestamp = time.time()
+        assert not bumped_since([Brand, Product], timestamp)
+
+        bump_version(Brand)
+        assert bumped_since([Brand, Product], timestamp)
+        assert not bumped_since([Product], timestamp)
+
+    def test_bump_version_on_save(self, brand):
+        version = get_versions([Brand])
+        post_save.send(sender=Brand, instance=brand, created=False)
+
+        assert get_versions([Brand]) != version
+
+    def test_other_models_not_connected(self, user_factory):
+        # Their deletions keep the fast path, a single DELETE without signals.
+        User = user_factory._meta.model
+
+        assert not post_save.has_listeners(User)
+        assert not post_delete.has_listeners(User)
+
+
+class TestCacheResponse:
+    def test_retrieve_when_cached(self, auth_api_client, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response = auth_api_client.get(url)
+
+        with CaptureQueriesContext(connection) as context:
+            cached_response = auth_api_client.get(url)
+
+        assert cached_response.status_code == status.HTTP_200_OK
+        assert cached_response.data == response.data
+        assert catalog_queries(context) == []
+
+    def test_list_when_cached(self, auth_api_client, brand_factory):
+        brand_factory.create_batch(3)
+        url = reverse("api:brand-list")
+        response = auth_api_client.get(url)
+
+        with CaptureQueriesContext(connection) as context:
+            cached_response = auth_api_client.get(url)
+
+        assert cached_response.data == response.data
+        assert catalog_queries(context) == []
+
+    def test_retrieve_when_updated(self, auth_api_client, user, product_factory):
+        product = product_factory(owner=user)
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        auth_api_client.get(url)
+
+        auth_api_client.patch(url, data={"name": "New Name"}, format="json")
+        response = auth_api_client.get(url)
+
+        assert response.data["name"] == "New Name"
+
+    def test_retrieve_when_related_updated(self, auth_api_client, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        auth_api_client.get(url)
+
+        product.brand.name = "New Brand"
+        product.brand.save()
+        response = auth_api_client.get(url)
+
+        assert response.data["brand"]["name"] == "New Brand"
+
+    def test_list_when_bulk_updated(self, admin_client, auth_api_client, brand):
+        url = reverse("api:brand-list")
+        auth_api_client.get(url)
+
+        admin_client.post(
+            reverse("admin:products_brand_changelist"),
+            data={"action": "make_inactive", "_selected_action": [brand.pk]},
+        )
+        response = auth_api_client.get(url)
+
+        assert response.data["results"] == []
+
+    # Outside of a test transaction, which the 404 would mark for rollback.
+    @pytest.mark.django_db(transaction=True)
+    def test_retrieve_when_not_found(self, auth_api_client):
+        url = reverse("api:product-detail", kwargs={"slug": "fake-slug"})
+        auth_api_client.get(url)
+
+        with CaptureQueriesContext(connection) as context:
+            response = auth_api_client.get(url)
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert catalog_queries(context) != []
+
+    def test_retrieve_when_unauthenticated(self, api_client, auth_api_client, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        auth_api_client.get(url)
+
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,192 @@
+import json
+
+import pytest
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+
+from ecommerce.products.api.serializers import (
+    ProductDetailSerializer,
+    ProductSerializer,
+)
+from ecommerce.products.models import ProductLine
+from ecommerce.utils.cdn import (
+    FastlyPurger,
+    LocalPurger,
+    get_surrogate_keys,
+    purge,
+    purge_queryset,
+    purge_worker,
+)
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestSurrogateKeys:
+    def test_keys_when_detail(self, product_factory):
+        product = product_factory(product_lines__size=2, images__size=0)
+        data = ProductDetailSerializer(product, context={"request": None}).data
+
+        keys = get_surrogate_keys(ProductDetailSerializer(), data)
+
+        assert keys == {
+            "product",
+            f"product:{product.id}",
+            "brand",
+            f"brand:{product.brand.id}",
+            "category",
+            f"category:{product.category.id}",
+            "productline",
+            *[f"productline:{line.id}" for line in product.product_lines.all()],
+            "productimage",
+        }
+
+    def test_keys_when_list(self, product_factory):
+        products = product_factory.create_batch(2)
+        data = ProductSerializer(products, many=True, context={"request": None}).data
+
+        keys = get_surrogate_keys(ProductSerializer(), data, listed=True)
+
+        assert keys == {
+            "product",
+            "product:list",
+            "brand",
+            "brand:list",
+            "category",
+            "category:list",
+        }
+
+
+class TestPurge:
+    def test_purge_when_saved(
+        self, purger, product_line, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                product_line.save()
+                product_line.product.save()
+
+        assert purger.batches == [
+            sorted(
+                {
+                    f"productline:{product_line.id}",
+                    "productline:list",
+                    f"product:{product_line.product_id}",
+                    "product:list",
+                }
+            )
+        ]
+
+    def test_purge_when_rolled_back(
+        self, purger, product_line, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                purge(["product:list"])
+                transaction.set_rollback(True)
+
+        assert purger.batches == []
+
+    def test_purge_when_savepoint_rolled_back(
+        self, purger, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                purge(["product:list"])
+                with transaction.atomic():
+                    purge(["brand:list"])
+                    transaction.set_rollback(True)
+                purge(["category:list"])
+
+        assert len(callbacks) == 1
+        assert purger.batches == [["category:list", "product:list"]]
+
+    def test_purge_after_rollback(self, purger, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                purge(["brand:list"])
+                transaction.set_rollback(True)
+            with transaction.atomic():
+                purge(["product:list"])
+
+        assert purger.batches == [["product:list"]]
+
+    def test_purge_in_background(
+        self, purger, mocker, django_capture_on_commit_callbacks
+    ):
+        mocker.patch.object(purger, "background", True)
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                purge(["product:list"])
+
+        assert purge_worker.join(timeout=5)
+        assert purger.batches == [["product:list"]]
+
+    def test_purge_queryset(
+        self, purger, product_line, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                purge_queryset(ProductLine.objects.filter(pk=product_line.pk))
+
+        assert purger.keys == {
+            f"productline:{product_line.id}",
+            "productline:list",
+            f"product:{product_line.product_id}",
+        }
+
+    def test_purge_when_reserved(
+        self, purger, product_line, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            ProductLine.objects.reserve({product_line.sku: 1})
+
+        assert f"productline:{product_line.id}" in purger.keys
+        assert f"product:{product_line.product_id}" in purger.keys
+
+
+class TestPurgers:
+    def test_purge_in_batches(self):
+        purger = LocalPurger()
+        purger.max_keys = 2
+
+        purger.purge(["a", "b", "c"])
+
+        assert purger.batches == [["a", "b"], ["c"]]
+
+    def test_fastly_purger(self, mocker):
+        urlopen = mocker.patch("urllib.request.urlopen")
+        purger = FastlyPurger(service_id="service", token="token")
+
+        purger.purge(["product:list"])
+
+        request = urlopen.call_args.args[0]
+        assert request.full_url == "https://api.fastly.com/service/service/purge"
+        assert request.get_header("Fastly-key") == "token"
+        assert request.get_header("Fastly-soft-purge") == "1"
+        assert json.loads(request.data) == {"surrogate_keys": ["product:list"]}
+
+
+class TestSurrogateKeyResponse:
+    def test_retrieve_headers(self, auth_api_client, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response = auth_api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert f"product:{product.id}" in response["Surrogate-Key"].split()
+        assert response["Surrogate-Control"] == "max-age=86400"
+        assert response["Cache-Control"] == "max-age=0, must-revalidate"
+
+    def test_list_headers_when_cached(self, auth_api_client, brand):
+        url = reverse("api:brand-list")
+        auth_api_client.get(url)
+        response = auth_api_client.get(url)
+
+        assert response["Surrogate-Key"] == "brand brand:list"
+
+    def test_write_not_tagged(self, admin_api_client, brand):
+        url = reverse("api:brand-detail", kwargs={"slug": brand.slug})
+        response = admin_api_client.patch(url, {"name": "new name"}, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "Surrogate-Key" not in response
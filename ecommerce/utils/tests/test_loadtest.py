@@ -0,0 +1,67 @@
+import asyncio
+
+from ecommerce.utils.loadtest import HTTPTransport, LoadStats
+
+RESPONSES = [
+    b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}",
+    b"HTTP/1.1 201 Created\r\nTransfer-Encoding: chunked\r\n\r\n"
+    b"3\r\n[1,\r\n3\r\n 2]\r\n0\r\n\r\n",
+    b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n",
+]
+
+
+async def request_stub(count: int):
+    """
+    Send ``count`` requests to a server answering the canned responses in turn,
+    and return the responses and the number of connections opened.
+    """
+    connections = 0
+    responses = iter(RESPONSES * count)
+
+    async def handle(reader, writer):
+        nonlocal connections
+        connections += 1
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(next(responses))
+            await writer.drain()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    transport = HTTPTransport("127.0.0.1", port)
+    try:
+        results = [await transport.request("GET", "/") for _ in range(count)]
+    finally:
+        await transport.close()
+        server.close()
+    return results, connections
+
+
+class TestHTTPTransport:
+    def test_request(self):
+        responses, connections = asyncio.run(request_stub(4))
+
+        assert [response.status for response in responses] == [200, 201, 404, 200]
+        assert responses[0].json() == {}
+        assert responses[1].json() == [1, 2]
+        assert responses[2].body == b""
+        # The connection is kept alive until the server closes it.
+        assert connections == 2
+
+
+class TestLoadStats:
+    def test_summary(self):
+        stats = LoadStats()
+        for latency in (0.01, 0.02, 0.03, 0.04):
+            stats.record("read", latency, 200, False)
+        stats.record("write", 0.1, 500, True)
+
+        rows = stats.summary(duration=2)
+
+        assert [row["name"] for row in rows] == ["read", "write", "total"]
+        assert rows[0]["throughput"] == 2
+        assert rows[0]["p50_ms"] == 25
+        assert rows[0]["max_ms"] == 40
+        assert rows[1]["error_rate"] == 1
+        assert rows[2]["requests"] == 5
+        assert rows[2]["error_rate"] == 0.2
+        assert rows[2]["statuses"] == {"200": 4, "500": 1}
@@ -0,0 +1,98 @@
+import logging
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from ecommerce.utils.metrics import (
+    HISTOGRAMS,
+    REQUEST_QUERIES,
+    REQUEST_SERIALIZER_DURATION,
+    Histogram,
+)
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def clear_histograms():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def get_series(histogram, endpoint, method="GET"):
+    return histogram.series[(endpoint, method)]
+
+
+class TestHistogram:
+    def test_collect(self):
+        histogram = Histogram("latency", "Latency.", ["endpoint"], [0.1, 1])
+        histogram.observe(0.05, "a")
+        histogram.observe(0.1, "a")
+        histogram.observe(5, "a")
+        histogram.observe(0.5, 'b"')
+
+        assert histogram.collect() == [
+            "# HELP latency Latency.",
+            "# TYPE latency histogram",
+            'latency_bucket{endpoint="a",le="0.1"} 2',
+            'latency_bucket{endpoint="a",le="1.0"} 2',
+            'latency_bucket{endpoint="a",le="+Inf"} 3',
+            'latency_sum{endpoint="a"} 5.15',
+            'latency_count{endpoint="a"} 3',
+            'latency_bucket{endpoint="b\\"",le="0.1"} 0',
+            'latency_bucket{endpoint="b\\"",le="1.0"} 1',
+            'latency_bucket{endpoint="b\\"",le="+Inf"} 1',
+            'latency_sum{endpoint="b\\""} 0.5',
+            'latency_count{endpoint="b\\""} 1',
+        ]
+
+
+class TestMetricsMiddleware:
+    def test_request_recorded(self, auth_api_client, product_factory):
+        product_factory.create_batch(2)
+        response = auth_api_client.get(reverse("api:product-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        queries = get_series(REQUEST_QUERIES, "api:product-list")
+        assert sum(queries[:-1]) == 1
+        assert queries[-1] > 0
+        assert get_series(REQUEST_SERIALIZER_DURATION, "api:product-list")[-1] > 0
+
+    def test_request_when_unresolved(self, api_client):
+        api_client.get("/unknown/")
+        assert get_series(REQUEST_QUERIES, "<unresolved>")
+
+    def test_query_threshold(self, auth_api_client, product, settings, caplog):
+        settings.METRICS_QUERY_THRESHOLD = 1
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+
+        with caplog.at_level(logging.WARNING, logger="ecommerce.utils.middleware"):
+            auth_api_client.get(url)
+
+        assert len(caplog.records) == 1
+        assert caplog.records[0].getMessage().startswith("GET api:product-detail ran")
+        assert "products_product" in caplog.records[0].getMessage()
+
+
+class TestMetricsEndpoint:
+    def test_metrics(self, client):
+        client.get("/unknown/")
+        response = client.get(reverse("metrics"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        content = response.content.decode()
+        assert "# TYPE http_request_duration_seconds histogram" in content
+        assert (
+            'http_request_db_queries_count{endpoint="<unresolved>",method="GET"} 1'
+            in content
+        )
+
+    def test_metrics_when_token(self, client, settings):
+        settings.METRICS_TOKEN = "secret"
+        url = reverse("metrics")
+
+        assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+        response = client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        assert response.status_code == status.HTTP_200_OK
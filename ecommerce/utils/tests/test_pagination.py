@@ -0,0 +1,116 @@
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from ecommerce.products.models import Brand
+from ecommerce.utils.pagination import KeysetCursorPagination
+
+pytestmark = [pytest.mark.django_db]
+
+
+def walk(client, url, link="next"):
+    """
+    Follow the pagination links from ``url`` and return the ids of every page.
+    """
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        pages.append([item["id"] for item in response.data["results"]])
+        url = response.data[link]
+    return pages
+
+
+class TestKeysetCursorPagination:
+    def test_first_page(self, auth_api_client, brand_factory):
+        brand_factory.create_batch(5)
+        url = reverse("api:brand-list")
+        response = auth_api_client.get(url, data={"limit": 2})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+        assert response.data["previous"] is None
+        assert response.data["next"] is not None
+        assert len(response.data["results"]) == 2
+
+    def test_walk_forward(self, auth_api_client, brand_factory):
+        brand_factory.create_batch(5)
+        expected = [
+            str(pk)
+            for pk in Brand.objects.order_by("-created_at", "-id").values_list(
+                "pk", flat=True
+            )
+        ]
+        url = reverse("api:brand-list") + "?limit=2"
+        pages = walk(auth_api_client, url)
+
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert sum(pages, []) == expected
+
+    def test_walk_backward(self, auth_api_client, brand_factory):
+        brand_factory.create_batch(5)
+        url = reverse("api:brand-list") + "?limit=2"
+        last_url = None
+        while url:
+            last_url = url
+            url = auth_api_client.get(url).data["next"]
+
+        forward = walk(auth_api_client, reverse("api:brand-list") + "?limit=2")
+        backward = walk(auth_api_client, last_url, link="previous")
+
+        assert sum(reversed(backward), []) == sum(forward, [])
+
+    def test_walk_when_inserted_concurrently(self, auth_api_client, brand_factory):
+        brands = brand_factory.create_batch(4)
+        url = reverse("api:brand-list") + "?limit=2"
+        response = auth_api_client.get(url)
+        first_page = [item["id"] for item in response.data["results"]]
+
+        brand_factory()
+        pages = walk(auth_api_client, response.data["next"])
+
+        seen = first_page + sum(pages, [])
+        assert sorted(seen) == sorted(str(brand.id) for brand in brands)
+
+    def test_walk_when_created_at_ties(self, auth_api_client, brand_factory):
+        brand_factory.create_batch(5)
+        Brand.objects.update(created_at=Brand.objects.first().created_at)
+        url = reverse("api:brand-list") + "?limit=2"
+        pages = walk(auth_api_client, url)
+
+        seen = sum(pages, [])
+        assert len(seen) == len(set(seen)) == 5
+
+    def test_keyset_filter(self, brand):
+        pagination = KeysetCursorPagination()
+        position = json.dumps([str(brand.created_at), str(brand.id)])
+        queryset = Brand.objects.order_by("-created_at", "-id")
+
+        sql = str(
+            queryset.filter(pagination._get_keyset_filter(queryset, position)).query
+        )
+
+        assert '("products_brand"."created_at", "products_brand"."id") <' in sql
+        assert not queryset.filter(pagination._get_keyset_filter(queryset, position))
+
+    def test_keyset_filter_when_mixed_directions(self, brand_factory):
+        first, second = brand_factory.create_batch(2)
+        Brand.objects.update(created_at=first.created_at)
+        pagination = KeysetCursorPagination()
+        position = json.dumps([str(first.created_at), str(min(first.id, second.id))])
+        queryset = Brand.objects.order_by("-created_at", "id")
+
+        keyset_filter = pagination._get_keyset_filter(queryset, position)
+
+        assert "created_at__lte" in str(keyset_filter)
+        assert [brand.id for brand in queryset.filter(keyset_filter)] == [
+            max(first.id, second.id)
+        ]
+
+    def test_invalid_cursor(self, auth_api_client):
+        url = reverse("api:brand-list")
+        response = auth_api_client.get(url, data={"cursor": "invalid"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
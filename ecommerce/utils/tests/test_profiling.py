@@ -0,0 +1,122 @@
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ecommerce.utils.profiling import Profiler
+
+pytestmark = [pytest.mark.django_db]
+
+PHASES = ["authentication", "permissions", "queryset", "serialization", "rendering"]
+
+
+def inner():
+    return sum(range(1000))
+
+
+def outer():
+    return inner() + inner()
+
+
+@pytest.fixture(autouse=True)
+def profiling(settings):
+    settings.PROFILING_ENABLED = True
+
+
+@pytest.fixture
+def staff_client(admin_user) -> APIClient:
+    """
+    A client logged in as a staff user with a session, seen by the middleware.
+    """
+    client = APIClient()
+    client.force_login(admin_user)
+    return client
+
+
+class TestProfiler:
+    def test_collapsed(self):
+        with Profiler("test") as profiler:
+            outer()
+
+        stacks = [line.rsplit(" ", 1)[0] for line in profiler.collapsed().splitlines()]
+        name = f"{__name__}.outer"
+        assert f"test;{name}" in stacks
+        assert f"test;{name};{__name__}.inner" in stacks
+
+    def test_speedscope(self):
+        with Profiler("test") as profiler:
+            outer()
+
+        profile = profiler.speedscope()
+        frames = [frame["name"] for frame in profile["shared"]["frames"]]
+        events = profile["profiles"][0]["events"]
+        opened = [frames[event["frame"]] for event in events if event["type"] == "O"]
+        closed = [frames[event["frame"]] for event in events if event["type"] == "C"]
+        assert sorted(opened) == sorted(closed)
+        assert opened.count(f"{__name__}.inner") == 2
+        times = [event["at"] for event in events]
+        assert times == sorted(times)
+        assert times[-1] <= profile["profiles"][0]["endValue"]
+
+
+class TestProfilingMiddleware:
+    def test_collapsed(self, staff_client, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response = staff_client.get(url, {"profile": "collapsed"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/plain")
+        assert response["X-Profile-Status"] == "200"
+        stacks = response.content.decode()
+        for phase in PHASES:
+            assert f";[{phase}];" in stacks
+        assert ";[permissions];rest_framework.views.APIView.check_object_perm" in stacks
+        timings = [
+            timing.split(";")[0] for timing in response["Server-Timing"].split(", ")
+        ]
+        assert timings == sorted(PHASES) + ["other"]
+
+    def test_speedscope_when_jwt(self, admin_user, product):
+        client = APIClient()
+        token = AccessToken.for_user(admin_user)
+        response = client.get(
+            reverse("api:product-list"),
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+            HTTP_X_PROFILE="speedscope",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        profile = json.loads(response.content)
+        assert profile["name"] == "GET /api/products/"
+        frames = [frame["name"] for frame in profile["shared"]["frames"]]
+        assert "[serialization]" in frames
+        assert profile["profiles"][0]["type"] == "evented"
+
+    def test_not_staff(self, user, product):
+        client = APIClient()
+        client.force_login(user)
+        response = client.get(reverse("api:product-list"), {"profile": "collapsed"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["results"][0]["slug"] == product.slug
+        assert "Server-Timing" not in response
+
+    def test_not_enabled(self, staff_client, product, settings):
+        settings.PROFILING_ENABLED = False
+        response = staff_client.get(reverse("api:product-list"), {"profile": ""})
+
+        assert response.json()["results"][0]["slug"] == product.slug
+        assert "Server-Timing" not in response
+
+    def test_profiling_dir(self, staff_client, product, settings, tmp_path):
+        settings.PROFILING_DIR = str(tmp_path / "profiles")
+        response = staff_client.get(reverse("api:product-list"), {"profile": "1"})
+
+        assert response.json()["results"][0]["slug"] == product.slug
+        assert response["X-Profile"].endswith("-get-api-products.speedscope.json")
+        path = tmp_path / "profiles" / response["X-Profile"]
+        assert json.loads(path.read_text())["name"] == "GET /api/products/"
+        assert "serialization;dur=" in response["Server-Timing"]
@@ -0,0 +1,109 @@
+import logging
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from ecommerce.products.api.serializers import ProductSerializer
+from ecommerce.products.models import Product
+from ecommerce.utils.queries import RepeatedQueriesError, fingerprint
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestFingerprint:
+    @pytest.mark.parametrize(
+        "sql",
+        [
+            "SELECT * FROM t WHERE id = 1 AND name = 'a'",
+            "SELECT * FROM t WHERE id = 25 AND name = 'it''s'",
+            "SELECT * FROM t WHERE id = %s AND name = %s",
+            "SELECT *   FROM t\n WHERE id = -3.5 AND name = ''",
+        ],
+    )
+    def test_fingerprint(self, sql):
+        assert fingerprint(sql) == "SELECT * FROM t WHERE id = ? AND name = ?"
+
+    def test_fingerprint_when_list(self):
+        assert fingerprint("SELECT * FROM t1 WHERE id IN (1, 2, %s)") == (
+            "SELECT * FROM t1 WHERE id IN (...)"
+        )
+
+
+class TestAssertNoRepeatedQueries:
+    def test_when_n_plus_one(self, product_factory, assert_no_repeated_queries):
+        product_factory.create_batch(5)
+
+        with pytest.raises(RepeatedQueriesError) as exc_info:
+            with assert_no_repeated_queries():
+                ProductSerializer(
+                    Product.objects.select_related("brand"),
+                    many=True,
+                    context={"request": None},
+                ).data
+
+        [repeated] = exc_info.value.report.repeated
+        assert repeated.count == 5
+        assert '"products_category"' in repeated.fingerprint
+        assert repeated.field == "ProductSerializer.category"
+        assert "rest_framework/fields.py" in repeated.caller
+        assert repeated.caller.endswith("in test_when_n_plus_one")
+
+    def test_when_joined(self, product_factory, assert_no_repeated_queries):
+        product_factory.create_batch(5)
+
+        with assert_no_repeated_queries():
+            ProductSerializer(
+                Product.objects.select_related("brand", "category"),
+                many=True,
+                context={"request": None},
+            ).data
+
+
+class TestQueryInspectionMiddleware:
+    def test_repeated_queries(self, auth_api_client, product_factory, settings):
+        settings.REPEATED_QUERY_THRESHOLD = 0
+        product_factory.create_batch(2)
+
+        with pytest.raises(RepeatedQueriesError) as exc_info:
+            auth_api_client.get(reverse("api:product-list"))
+
+        assert str(exc_info.value).startswith("Queries of GET /api/products/:")
+
+    def test_repeated_queries_when_logged(
+        self, auth_api_client, product_factory, settings, caplog
+    ):
+        settings.REPEATED_QUERY_THRESHOLD = 0
+        settings.QUERY_INSPECTION_RAISE = False
+        product_factory.create_batch(2)
+
+        with caplog.at_level(logging.WARNING, logger="ecommerce.utils.middleware"):
+            response = auth_api_client.get(reverse("api:product-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        [record] = caplog.records
+        assert "Repeated queries" in record.getMessage()
+
+    def test_slow_queries(self, auth_api_client, settings, caplog):
+        settings.SLOW_QUERY_THRESHOLD = 0
+
+        with caplog.at_level(logging.WARNING, logger="ecommerce.utils.middleware"):
+            response = auth_api_client.get(reverse("api:product-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        [record] = caplog.records
+        message = record.getMessage()
+        assert "Slow queries:" in message
+        assert "Repeated queries" not in message
+        assert "products_product" in message
+
+
+class TestAllowRepeatedQueries:
+    @pytest.mark.allow_repeated_queries
+    def test_marker(self, settings):
+        assert settings.QUERY_INSPECTION_RAISE is False
+
+    @pytest.mark.allow_repeated_queries(10)
+    def test_marker_when_threshold(self, settings):
+        assert settings.QUERY_INSPECTION_RAISE is True
+        assert settings.REPEATED_QUERY_THRESHOLD == 10
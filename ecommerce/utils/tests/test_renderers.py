@@ -0,0 +1,61 @@
+import io
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from ecommerce.utils.parsers import ORJSONParser
+from ecommerce.utils.renderers import NDJSONRenderer, ORJSONRenderer
+
+DATA = {
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "price": Decimal("9.99"),
+    "created_at": datetime(2023, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc),
+    "name": "Caf\u00e9\u2028",
+    "label": gettext_lazy("Name"),
+    "counts": {1: "one"},
+    "items": ({"a": None}, [True, 1.5]),
+}
+
+
+class TestORJSONRenderer:
+    def test_render_matches_json_renderer(self):
+        content = ORJSONRenderer().render(DATA)
+
+        assert json.loads(content) == json.loads(JSONRenderer().render(DATA))
+        assert b"\\u2028" in content
+
+    def test_render_when_none(self):
+        assert ORJSONRenderer().render(None) == b""
+
+    def test_render_when_indented(self):
+        content = ORJSONRenderer().render({"a": 1}, "application/json; indent=4")
+        assert content == b'{\n  "a": 1\n}'
+
+    def test_render_ndjson(self):
+        content = NDJSONRenderer().render([DATA, DATA])
+        lines = content.decode().split("\n")[:-1]
+
+        assert len(lines) == 2
+        assert json.loads(lines[0])["created_at"] == "2023-01-02T03:04:05.678000Z"
+
+
+class TestORJSONParser:
+    def test_parse(self):
+        data = ORJSONParser().parse(io.BytesIO('{"name": "Café"}'.encode()))
+        assert data == {"name": "Café"}
+
+    def test_parse_when_other_encoding(self):
+        stream = io.BytesIO('{"name": "Café"}'.encode("latin-1"))
+        data = ORJSONParser().parse(stream, parser_context={"encoding": "latin-1"})
+        assert data == {"name": "Café"}
+
+    @pytest.mark.parametrize("content", [b"{", b'{"a": NaN}', b"\xff"])
+    def test_parse_when_invalid(self, content):
+        with pytest.raises(ParseError):
+            ORJSONParser().parse(io.BytesIO(content))
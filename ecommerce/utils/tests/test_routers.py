@@ -0,0 +1,149 @@
+import pytest
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ecommerce.products.models import Product
+from ecommerce.utils.middleware import PRIMARY_PIN_COOKIE
+from ecommerce.utils.routers import ReplicaRouter, current_replica, use_replica
+
+
+@pytest.fixture
+def replica(settings):
+    settings.REPLICA_DATABASES = ["replica"]
+
+
+def get_client(user) -> APIClient:
+    """
+    A client sending a JWT access token, which the middleware reads.
+    """
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return client
+
+
+def count_queries(client, method, url, **kwargs):
+    """
+    Send a request, and return the response and the queries run on the replica.
+    """
+    with CaptureQueriesContext(connections["replica"]) as queries:
+        response = getattr(client, method)(url, **kwargs)
+    return response, len(queries)
+
+
+class TestReplicaRouter:
+    def test_db_for_read(self):
+        router = ReplicaRouter()
+
+        assert router.db_for_read(Product) is None
+        with use_replica("replica"):
+            assert router.db_for_read(Product) == "replica"
+        assert router.db_for_read(Product) is None
+
+    def test_db_for_write(self):
+        router = ReplicaRouter()
+
+        with use_replica("replica"):
+            assert router.db_for_write(Product) == "default"
+            # The rest of the request reads its write.
+            assert current_replica.get() is None
+            assert router.db_for_read(Product) is None
+
+    @pytest.mark.django_db
+    def test_db_for_read_when_atomic(self):
+        with use_replica("replica"), transaction.atomic():
+            assert ReplicaRouter().db_for_read(Product) is None
+
+    def test_allow_migrate(self, replica):
+        router = ReplicaRouter()
+
+        assert router.allow_migrate("replica", "products") is False
+        assert router.allow_migrate("default", "products") is None
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+class TestReplicaMiddleware:
+    def test_read(self, replica, user, product_line):
+        url = reverse("api:productline-detail", kwargs={"sku": product_line.sku})
+        response, queries = count_queries(get_client(user), "get", url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["sku"] == product_line.sku
+        assert queries > 0
+        # The replica may lag behind, its payloads are kept out of shared caches.
+        assert "private" in response["Cache-Control"]
+
+    def test_read_when_cached(self, settings, replica, user, product):
+        settings.PRIMARY_PIN_TIMEOUT = 0
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response, queries = count_queries(get_client(user), "get", url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries > 0
+        assert "private" in response["Cache-Control"]
+
+        # Filled from the replica, the cache entry is served to every client.
+        with CaptureQueriesContext(connections["replica"]) as queries:
+            response = get_client(user).get(url)
+        assert not any("products_" in query["sql"] for query in queries)
+        assert "private" not in response["Cache-Control"]
+        assert "Surrogate-Control" in response
+
+    def test_read_when_recently_written(self, replica, user, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        count_queries(get_client(user), "get", url)
+
+        # The replica may not hold the write yet, the cache is not filled.
+        with CaptureQueriesContext(connections["replica"]) as queries:
+            response = get_client(user).get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert any("products_" in query["sql"] for query in queries)
+        assert "private" in response["Cache-Control"]
+
+    def test_not_enabled(self, user, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response, queries = count_queries(get_client(user), "get", url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries == 0
+
+    def test_read_your_writes(self, replica, product):
+        client = get_client(product.owner)
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response, queries = count_queries(
+            client, "patch", url, data={"description": "New"}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert queries == 0
+        assert response.cookies[PRIMARY_PIN_COOKIE]["max-age"] == 10
+
+        response, queries = count_queries(client, "get", url)
+        assert response.json()["description"] == "New"
+        assert queries == 0
+
+        # Without the cookie, e.g. from another device, the user is still pinned.
+        response, queries = count_queries(get_client(product.owner), "get", url)
+        assert queries == 0
+
+    def test_pin_of_other_user(self, replica, user_factory, product):
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        get_client(product.owner).patch(url, {"description": "New"}, format="json")
+
+        _, queries = count_queries(
+            get_client(user_factory(username="other")), "get", url
+        )
+        assert queries > 0
+
+    def test_failed_write(self, replica, user_factory, product):
+        client = get_client(user_factory(username="other"))
+        url = reverse("api:product-detail", kwargs={"slug": product.slug})
+        response = client.patch(url, {"description": "New"}, format="json")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert PRIMARY_PIN_COOKIE not in response.cookies
+        _, queries = count_queries(client, "get", url)
+        assert queries > 0
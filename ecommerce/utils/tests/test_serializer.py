@@ -0,0 +1,141 @@
+import pytest
+from django.db.models import Prefetch
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ecommerce.products.api.serializers import (
+    AttributeSerializer,
+    BrandSerializer,
+    CategorySerializer,
+    ProductDetailSerializer,
+    ProductImageSerializer,
+    ProductLineDetailSerializer,
+    ProductLineSerializer,
+    ProductSerializer,
+)
+from ecommerce.utils.renderers import ORJSONRenderer
+from ecommerce.utils.serializer import (
+    Projection,
+    get_query_plan,
+    parse_field_paths,
+    shape_serializer,
+)
+
+
+class TestQueryPlan:
+    def test_query_plan_when_flat(self):
+        select_related, prefetch_related = get_query_plan(ProductSerializer)
+
+        assert select_related == ["category", "brand"]
+        assert prefetch_related == []
+
+    def test_query_plan_when_nested_many(self):
+        select_related, prefetch_related = get_query_plan(ProductDetailSerializer)
+
+        assert set(select_related) == {
+            "owner",
+            "created_by",
+            "updated_by",
+            "category",
+            "brand",
+        }
+        assert [p.prefetch_through for p in prefetch_related] == [
+            "product_lines",
+            "images",
+        ]
+
+    def test_query_plan_when_nested_one(self):
+        select_related, prefetch_related = get_query_plan(ProductLineDetailSerializer)
+
+        assert set(select_related) == {
+            "created_by",
+            "updated_by",
+            "product",
+            "product__category",
+            "product__brand",
+        }
+        assert len(prefetch_related) == 1
+        assert isinstance(prefetch_related[0], Prefetch)
+        assert prefetch_related[0].prefetch_through == "productattribute_set"
+        assert prefetch_related[0].queryset.query.select_related == {"attribute": {}}
+
+    def test_query_plan_when_shaped(self):
+        serializer = ProductDetailSerializer()
+        shape_serializer(serializer, {"name": {}, "product_lines": {}}, {})
+
+        select_related, prefetch_related = get_query_plan(serializer)
+
+        assert select_related == []
+        assert [p.prefetch_through for p in prefetch_related] == ["product_lines"]
+
+    def test_query_plan_when_expanded(self):
+        serializer = ProductLineSerializer()
+        shape_serializer(serializer, None, {"product": {}, "product_attributes": {}})
+
+        select_related, prefetch_related = get_query_plan(serializer)
+
+        assert select_related == ["product", "product__category", "product__brand"]
+        assert [p.prefetch_through for p in prefetch_related] == [
+            "productattribute_set"
+        ]
+
+
+class TestShapeSerializer:
+    def test_parse_field_paths(self):
+        assert parse_field_paths("id, lines.sku,lines.price,,") == {
+            "id": {},
+            "lines": {"sku": {}, "price": {}},
+        }
+        assert parse_field_paths("") is None
+        assert parse_field_paths(None) is None
+
+    def test_shape_serializer_when_nested(self):
+        serializer = ProductDetailSerializer(many=True)
+        shape_serializer(serializer, {"brand": {"slug": {}}, "images": {}}, {})
+
+        fields = serializer.child.fields
+        assert list(fields) == ["brand", "images"]
+        assert list(fields["brand"].fields) == ["slug"]
+        assert list(fields["images"].child.fields) == ["id", "image", "url"]
+
+    def test_shape_serializer_when_expanded(self):
+        serializer = ProductSerializer()
+        shape_serializer(serializer, {"id": {}}, {"images": {}, "unknown": {}})
+
+        assert list(serializer.fields) == ["id", "images"]
+        assert serializer.fields["images"].read_only
+
+
+@pytest.mark.django_db
+class TestProjection:
+    @pytest.mark.parametrize(
+        "serializer_class",
+        [
+            AttributeSerializer,
+            BrandSerializer,
+            CategorySerializer,
+            ProductSerializer,
+            ProductLineSerializer,
+            ProductImageSerializer,
+        ],
+    )
+    def test_render_matches_serializer(
+        self, serializer_class, product_factory, product_image_factory
+    ):
+        product_factory.create_batch(2, product_lines__size=2, images__size=1)
+        product_factory(category=None, product_lines__size=0, images__size=0)
+        product_image_factory(image="")
+        model = serializer_class.Meta.model
+        queryset = model.objects.order_by("id")
+        request = Request(APIRequestFactory().get("/api/", format="json"))
+        context = {"request": request}
+        projection = Projection(serializer_class(context=context))
+
+        rows = projection.render(projection.values(queryset))
+        data = serializer_class(queryset, many=True, context=context).data
+        assert len(rows) > 1
+        assert ORJSONRenderer().render(rows) == ORJSONRenderer().render(data)
+
+    def test_projection_when_related(self):
+        with pytest.raises(TypeError):
+            Projection(ProductDetailSerializer(context={"request": None}))
@@ -0,0 +1,354 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from ecommerce.utils.cache import bumped_since, get_response_cache_key, get_versions
+from ecommerce.utils.cdn import (
+    SURROGATE_CONTROL_HEADER,
+    SURROGATE_KEY_HEADER,
+    get_surrogate_keys,
+)
+from ecommerce.utils.metrics import serializer_timer
+from ecommerce.utils.routers import replica_read
+from ecommerce.utils.serializer import (
+    Projection,
+    get_modified_lookups,
+    get_query_plan,
+    parse_field_paths,
+    shape_serializer,
+)
+
+
+def get_keyset_fields(view, queryset) -> list[str]:
+    """
+    Return the fields the pagination of a view reads its keyset from.
+    """
+    paginator = view.paginator
+    if paginator is None or not hasattr(paginator, "get_ordering"):
+        return []
+    ordering = paginator.get_ordering(view.request, queryset, view)
+    return [order.lstrip("-") for order in ordering]
+
+
+def is_shareable(models) -> bool:
+    """
+    Return whether the payload built by the current request, from the given
+    models, may fill the caches shared by every client.
+
+    Payloads read from a replica are not when one of the models was written in
+    the last ``PRIMARY_PIN_TIMEOUT`` seconds, which the replica may lag behind.
+    """
+    if not replica_read.get():
+        return True
+    return not bumped_since(models, time.time() - settings.PRIMARY_PIN_TIMEOUT)
+
+
+class AtomicWritesMixin:
+    """
+    Run the unsafe requests of a viewset in a transaction, in place of the
+    ``ATOMIC_REQUESTS`` of the database, which wraps the safe ones too, so that
+    the reads are not held on the primary and can go to a replica.
+    """
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        return transaction.non_atomic_requests(super().as_view(*args, **kwargs))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Reading the user and checking the permissions on a replica leaves the
+        # payload shareable, only the reads of the action itself count.
+        replica_read.set(False)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            with transaction.atomic():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class QueryPlanMixin:
+    """
+    Load the relations declared by the action serializer along with the queryset,
+    so rendering a page does not issue one query per row.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related, prefetch_related = get_query_plan(
+            self.get_query_plan_serializer()
+        )
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def get_query_plan_serializer(self):
+        """
+        Return the serializer, class or instance, the query plan is built for.
+        """
+        return self.get_serializer_class()
+
+
+class ProjectionMixin:
+    """
+    Serve the list action from ``values()`` rows, rendered by a ``Projection`` of
+    the list serializer. Lists with nested serializers, e.g. expanded relations,
+    are rendered from model instances.
+    """
+
+    def list(self, request, *args, **kwargs):
+        try:
+            projection = Projection(self.get_serializer())
+        except TypeError:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # The pagination reads its keyset, e.g. the creation date, from the rows.
+        queryset = projection.values(queryset, *get_keyset_fields(self, queryset))
+
+        page = self.paginate_queryset(queryset)
+        with serializer_timer():
+            data = projection.render(page if page is not None else queryset)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class SparseFieldsMixin:
+    """
+    Shape the payloads of the read actions with the ``fields`` and ``expand``
+    query parameters, comma separated lists of dotted field paths.
+
+    ``fields`` keeps the fields listed, ``expand`` adds the relations listed in
+    the ``Meta.expandable_fields`` of the serializer. Paired with the
+    ``QueryPlanMixin``, the relations of the fields left out are not loaded.
+    """
+
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        self.shape_serializer(serializer)
+        return serializer
+
+    def get_query_plan_serializer(self):
+        serializer = self.get_serializer_class()()
+        self.shape_serializer(serializer)
+        return serializer
+
+    def shape_serializer(self, serializer):
+        if self.request.method not in SAFE_METHODS:
+            return
+        params = self.request.GET
+        shape_serializer(
+            serializer,
+            parse_field_paths(params.get(self.fields_query_param)),
+            parse_field_paths(params.get(self.expand_query_param)) or {},
+        )
+
+
+class CacheResponseMixin:
+    """
+    Serve the list and retrieve payloads from the cache.
+
+    Entries are keyed on the request url and on the cache version of every model
+    in ``cache_models``, which is bumped whenever one of those models is written.
+    View permissions are checked before the cache is read, object permissions are
+    not, so the mixin only fits viewsets where every reader may see every object.
+    """
+
+    cache_models: list = []
+
+    def get_cache_models(self):
+        return self.cache_models or [self.queryset.model]
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        # Keyed on the versions read before the payload, so the entry built
+        # while a write commits is orphaned by its bump.
+        key = get_response_cache_key(request, self.get_cache_models())
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and is_shareable(
+            self.get_cache_models()
+        ):
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Send an ``ETag`` and a ``Last-Modified`` with the list and retrieve payloads,
+    and answer ``304 Not Modified`` when the client already holds them.
+
+    The validators are aggregated, without loading or serializing any instance,
+    from the ``updated_at`` of the rows the payload reads and from the number of
+    rows of its to-many relations, so deletions change them too. Writes not going
+    through ``save``, e.g. ``QuerySet.update``, must set the ``updated_at`` too.
+    Lists are validated on the rows of the page, whose keys are read through the
+    pagination index, the url being part of the ``ETag``. Object permissions are
+    not checked before answering ``304``.
+    """
+
+    etag_models: list = []
+
+    def get_etag_models(self):
+        """
+        Return the models whose cache version is part of the ``ETag``, for the
+        payloads read from rows without an ``updated_at``.
+        """
+        return self.etag_models
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = None
+        if etag is not None:
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if etag is not None and response.status_code in [
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ]:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def get_validators(self, request) -> tuple[str | None, int | None]:
+        """
+        Return the ``ETag`` and the ``Last-Modified`` timestamp of the payload,
+        ``None`` when the object retrieved does not exist.
+        """
+        if isinstance(self, CacheResponseMixin):
+            # Cached payloads are served without a query, and so are their
+            # validators, keyed on the same model versions.
+            key = get_response_cache_key(
+                request, self.get_cache_models(), prefix="validators"
+            )
+            values = cache.get(key)
+            if values is None:
+                values = self.aggregate_validators()
+                if is_shareable(self.get_cache_models()):
+                    cache.set(key, values, settings.CATALOG_CACHE_TIMEOUT)
+        else:
+            values = self.aggregate_validators()
+
+        timestamps, count = values[0], values[1]
+        if self.action != "list" and not count:
+            return None, None
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        versions = get_versions(self.get_etag_models())
+        digest = hashlib.md5(
+            f"{request.get_full_path()}:{request.accepted_renderer.media_type}:"
+            f"{values}:{versions}".encode(),
+            usedforsecurity=False,
+        )
+        return quote_etag(digest.hexdigest()), last_modified
+
+    def aggregate_validators(self) -> tuple[list, int, list]:
+        """
+        Return the latest ``updated_at`` of the rows the payload reads, the
+        number of objects, and the number of rows of its to-many relations,
+        followed by whether the page has links.
+        """
+        lookups = get_modified_lookups(self.get_serializer())
+        # The to-many relations repeat the rows, which are then counted once.
+        aggregates = {
+            "count": Count("pk", distinct=any(lookups.values())),
+            "updated_at": Max("updated_at"),
+        }
+        for index, (lookup, many) in enumerate(lookups.items()):
+            aggregates[f"updated_at_{index}"] = Max(f"{lookup}__updated_at")
+            if many:
+                aggregates[f"count_{index}"] = Count(lookup, distinct=True)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = []
+        if self.action == "list":
+            # Only the keys of the page rows are read, through the pagination
+            # index, and the rows are validated along with the page links.
+            keys = self.paginate_queryset(
+                queryset.values("pk", *get_keyset_fields(self, queryset))
+            )
+            if keys is not None:
+                queryset = self.get_queryset().filter(pk__in=[k["pk"] for k in keys])
+                page = [
+                    getattr(self.paginator, "has_next", None),
+                    getattr(self.paginator, "has_previous", None),
+                ]
+
+        try:
+            if self.action != "list":
+                lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+                queryset = queryset.filter(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                )
+            values = queryset.order_by().aggregate(**aggregates)
+        except (TypeError, ValueError, ValidationError):
+            # A malformed lookup value, which the handler answers with a 404.
+            return [], 0, []
+
+        count = values.pop("count")
+        timestamps = [values.pop(key) for key in list(values) if "updated_at" in key]
+        return timestamps, count, list(values.values()) + page
+
+
+class SurrogateKeyMixin:
+    """
+    Tag the list and retrieve payloads with the surrogate keys of the rows they
+    render, which the writes of those rows purge from the CDN, and let the CDN
+    keep them for ``CDN_MAX_AGE`` seconds. Clients revalidate them on every use.
+    """
+
+    def get_surrogate_keys(self, data) -> set[str]:
+        serializer = self.get_serializer()
+        if self.action == "list":
+            rows = data["results"] if isinstance(data, dict) else data
+            return get_surrogate_keys(serializer, rows, listed=True)
+        return get_surrogate_keys(serializer, data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "action", None) in ["list", "retrieve"] and (
+            response.status_code in [status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED]
+        ):
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+            response[SURROGATE_CONTROL_HEADER] = f"max-age={settings.CDN_MAX_AGE}"
+            # Not modified responses keep the keys of the entry they revalidate.
+            data = getattr(response, "data", None)
+            if data is not None:
+                keys = sorted(self.get_surrogate_keys(data))
+                response[SURROGATE_KEY_HEADER] = " ".join(keys)
+        return response